@@ -0,0 +1,94 @@
+"""
+Compare loading an FCS1 file with eval() (previous reader), with FCSFile.read_fcs1
+and with FCSFile.open followed by the mean G(τ) of a single pair (read mode).
+
+Usage:
+    python benchmarks/fcs1_loading_benchmark.py [--pairs 64] [--acquisitions 10] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from components.fcs_file import FCSFile
+from components.general_utilities import calculate_lag_index
+
+
+def write_fcs1_file(file_path, pairs, acquisitions):
+    rng = np.random.default_rng(0)
+    lag_index = calculate_lag_index(1, tau_high_density=True)
+    correlations = [[ch1, ch2] for ch1 in range(8) for ch2 in range(8)][:pairs]
+    g2_correlations = [
+        [pair, [rng.random(len(lag_index)).tolist() for _ in range(acquisitions + 1)]]
+        for pair in correlations
+    ]
+    metadata = json.dumps(
+        {"enabled_channels": list(range(8)), "bin_width": 1, "correlations": correlations,
+         "num_acquisitions": acquisitions, "acquisition_time": 10000, "notes": ""}
+    ).encode("utf-8")
+    g2_json = json.dumps({"lag_index": lag_index, "g2_correlations": g2_correlations}).encode("utf-8")
+    with open(file_path, "wb") as f:
+        f.write(b"FCS1")
+        f.write(struct.pack("I", len(metadata)))
+        f.write(metadata)
+        f.write(struct.pack("I", len(g2_json)))
+        f.write(g2_json)
+
+
+def read_with_eval(file_path):
+    with open(file_path, "rb") as f:
+        f.read(4)
+        (json_length,) = struct.unpack("I", f.read(4))
+        metadata = json.loads(f.read(json_length).decode("utf-8"))
+        (g2_json_length,) = struct.unpack("I", f.read(4))
+        g2_json = eval(f.read(g2_json_length).decode("utf-8"))
+    return metadata, g2_json["lag_index"], g2_json["g2_correlations"]
+
+
+def open_single_pair(file_path):
+    _, _, g2_correlations = FCSFile.open(file_path)
+    return g2_correlations[0][1][0]
+
+
+def measure(reader, file_path, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        reader(file_path)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    reader(file_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=64)
+    parser.add_argument("--acquisitions", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as folder:
+        file_path = os.path.join(folder, "fcs_benchmark.bin")
+        write_fcs1_file(file_path, args.pairs, args.acquisitions)
+        print(f"File size: {os.path.getsize(file_path) / 1e6:.1f} MB")
+        readers = [
+            ("eval", read_with_eval),
+            ("FCSFile.read_fcs1", FCSFile.read_fcs1),
+            ("FCSFile.open (1 pair)", open_single_pair),
+        ]
+        for name, reader in readers:
+            seconds, peak = measure(reader, file_path, args.repeat)
+            print(f"{name:<22} {seconds * 1000:8.1f} ms   peak memory {peak / 1e6:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
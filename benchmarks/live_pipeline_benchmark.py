@@ -0,0 +1,257 @@
+"""
+Drive FCSWindow (offscreen Qt platform) with the simulated flim_labs card and measure how the
+live pipeline (queue consumer, render timer, CPS labels and intensity plots) keeps up, for each
+combination of number of enabled channels, bin width and time span:
+- sustained bins/s and samples/s (bins × channels) rendered, against the acquisition bin rate
+- render frame time percentiles (IntensityTracing.pull_from_queue ticks with new bins, the
+  stop of the acquisition excluded) and frame intervals
+- queue lag (AcquisitionConsumer max latency)
+- CPU time (all threads, simulator included) and RSS of the process
+The FCS post-processing started at the end of each acquisition is aborted, it is not measured.
+Results are written as JSON, to compare releases.
+
+Usage:
+    python benchmarks/live_pipeline_benchmark.py [--channels 1,4,8] [--bin-widths 1,10,100,1000]
+        [--time-spans 5,60] [--duration 5] [--speed 1] [--replay FILE] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+
+REPOSITORY = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPOSITORY)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def parse_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def rss_mb():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1e6
+    if resource is not None:
+        # Peak RSS (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+    return None
+
+
+def percentiles(values):
+    if len(values) == 0:
+        return None
+    values = np.asarray(values)
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+class PipelineProbe:
+    """
+    Wraps IntensityTracing.pull_from_queue (render tick) and stop_queue_consumer to record the
+    frames and the consumer statistics of the acquisition in progress.
+    """
+
+    def __init__(self, intensity_tracing):
+        self.intensity_tracing = intensity_tracing
+        self.pull_from_queue = intensity_tracing.pull_from_queue
+        self.stop_queue_consumer = intensity_tracing.stop_queue_consumer
+        self.reset()
+        # The render timer of the window binds the function when the window is created
+        intensity_tracing.pull_from_queue = staticmethod(self.timed_pull_from_queue)
+        intensity_tracing.stop_queue_consumer = staticmethod(self.recorded_stop_queue_consumer)
+
+    def reset(self):
+        self.frame_times_ms = []
+        self.frame_starts = []
+        self.consumer_stats = None
+        self.stream_end_ns = 0
+        self.end_time = None
+        self.ended = False
+
+    def timed_pull_from_queue(self, app):
+        start = time.perf_counter()
+        previous_ns = app.last_acquisition_ns
+        self.pull_from_queue(app)
+        if self.ended:
+            # Last tick: stop of the acquisition and start of the post-processing
+            self.end_time = start
+            return
+        if app.last_acquisition_ns != previous_ns:
+            # Only the ticks which rendered new bins
+            self.frame_starts.append(start)
+            self.frame_times_ms.append((time.perf_counter() - start) * 1000)
+            self.stream_end_ns = app.last_acquisition_ns
+
+    def recorded_stop_queue_consumer(self, app):
+        consumer = app.acquisition_consumer
+        self.stop_queue_consumer(app)
+        if consumer is not None:
+            self.consumer_stats = consumer.stats()
+            self.ended = True
+
+    def restore(self):
+        self.intensity_tracing.pull_from_queue = staticmethod(self.pull_from_queue)
+        self.intensity_tracing.stop_queue_consumer = staticmethod(self.stop_queue_consumer)
+
+
+def seed_settings(num_channels, bin_width_micros, time_span, duration_seconds):
+    from PyQt6.QtCore import QSettings
+    from components import settings as s
+
+    channels = list(range(num_channels))
+    settings = QSettings("settings.ini", QSettings.Format.IniFormat)
+    settings.setValue(s.SETTINGS_ENABLED_CHANNELS, json.dumps(channels))
+    settings.setValue(s.SETTINGS_INTENSITY_PLOTS_TO_SHOW, json.dumps(channels[:4]))
+    settings.setValue(s.SETTINGS_CH_CORRELATIONS, json.dumps([]))
+    settings.setValue(s.SETTINGS_BIN_WIDTH_MICROS, bin_width_micros)
+    settings.setValue(s.SETTINGS_TIME_SPAN, time_span)
+    settings.setValue(s.SETTINGS_ACQUISITION_TIME_MILLIS, int(duration_seconds * 1000))
+    settings.setValue(s.SETTINGS_FREE_RUNNING_MODE, False)
+    settings.setValue(s.SETTINGS_AVERAGES, 1)
+    settings.setValue(s.SETTINGS_WRITE_DATA, False)
+    settings.sync()
+
+
+def run_case(qt_app, probe, num_channels, bin_width_micros, time_span, args):
+    from fcs import FCSWindow
+    from components.fcs_controller import FCSPostProcessing
+    from components.intensity_tracing_controller import IntensityTracingButtonsActions
+
+    seed_settings(num_channels, bin_width_micros, time_span, args.duration)
+    window = FCSWindow()
+    window.resize(args.width, args.height)
+    window.show()
+    qt_app.processEvents()
+    probe.reset()
+    rss_before = rss_mb()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    IntensityTracingButtonsActions.start_button_pressed(window)
+    timeout = wall_start + args.duration * 3 + 30
+    while not probe.ended and time.perf_counter() < timeout:
+        qt_app.processEvents()
+        time.sleep(0.001)
+    end_time = probe.end_time or time.perf_counter()
+    wall_seconds = end_time - wall_start
+    cpu_seconds = time.process_time() - cpu_start
+    rss_after = rss_mb()
+    FCSPostProcessing.abort(window)
+    window.close()
+    window.deleteLater()
+    qt_app.processEvents()
+
+    stream_seconds = probe.stream_end_ns / 1e9
+    rendered_bins = stream_seconds * 1e6 / bin_width_micros
+    stats = probe.consumer_stats or {}
+    return {
+        "enabled_channels": num_channels,
+        "bin_width_micros": bin_width_micros,
+        "time_span_seconds": time_span,
+        "completed": probe.ended,
+        "wall_seconds": wall_seconds,
+        "stream_seconds": stream_seconds,
+        "acquisition_bins_per_second": 1e6 / bin_width_micros,
+        "bins_per_second": rendered_bins / wall_seconds,
+        "samples_per_second": rendered_bins * num_channels / wall_seconds,
+        "frames": len(probe.frame_times_ms),
+        "frame_ms": percentiles(probe.frame_times_ms),
+        "frame_interval_ms": percentiles(np.diff(probe.frame_starts) * 1000),
+        "queue_items_drained": stats.get("items_drained"),
+        "queue_max_latency_seconds": stats.get("max_queue_latency_s"),
+        "cpu_percent": 100 * cpu_seconds / wall_seconds,
+        "rss_mb": rss_after,
+        "rss_growth_mb": None if rss_after is None or rss_before is None else rss_after - rss_before,
+    }
+
+
+def main():
+    from components.settings import BIN_WIDTH_INPUTS
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=parse_list, default=[1, 4, 8])
+    parser.add_argument("--bin-widths", type=parse_list, default=BIN_WIDTH_INPUTS)
+    parser.add_argument("--time-spans", type=parse_list, default=[5, 60])
+    parser.add_argument("--duration", type=float, default=5, help="acquisition time of each run (s)")
+    parser.add_argument("--speed", type=float, default=1, help="simulator speed (1 = real time, 0 = as fast as possible)")
+    parser.add_argument("--replay", help="intensity tracing .bin file replayed instead of simulated counts")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--output", default="live_pipeline_benchmark.json")
+    args = parser.parse_args()
+    output_path = os.path.abspath(args.output)
+    replay_file = os.path.abspath(args.replay) if args.replay else None
+
+    # Settings, data files and the export queue stay in a throwaway folder; resource_path
+    # resolves the assets from the repository (as for a frozen build) while the work
+    # directory, where settings.ini is read, is the throwaway folder
+    work_dir = tempfile.mkdtemp(prefix="fcs-live-benchmark-")
+    os.chdir(work_dir)
+    sys._MEIPASS = REPOSITORY
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ["USERPROFILE"] = work_dir
+    os.environ["FLIM_LABS_BACKEND"] = "simulated"
+    os.environ["FLIM_LABS_SIMULATOR"] = json.dumps(
+        {"num_channels": 8, "speed": args.speed, "seed": 0, "replay_file": replay_file}
+    )
+
+    from PyQt6.QtWidgets import QApplication
+    from components.intensity_tracing_controller import IntensityTracing
+    from components.settings import APP_VERSION
+
+    qt_app = QApplication(sys.argv)
+    probe = PipelineProbe(IntensityTracing)
+    results = []
+    try:
+        for num_channels in args.channels:
+            for bin_width_micros in args.bin_widths:
+                for time_span in args.time_spans:
+                    result = run_case(qt_app, probe, num_channels, bin_width_micros, time_span, args)
+                    results.append(result)
+                    frame_ms = result["frame_ms"] or {"p50": 0, "p99": 0}
+                    print(
+                        f"{num_channels} ch, {bin_width_micros} µs, {time_span} s span: "
+                        f"{result['samples_per_second']:,.0f} samples/s, "
+                        f"frame p50 {frame_ms['p50']:.2f} ms p99 {frame_ms['p99']:.2f} ms, "
+                        f"lag {result['queue_max_latency_seconds'] or 0:.3f} s, "
+                        f"{result['cpu_percent']:.0f}% CPU"
+                    )
+    finally:
+        probe.restore()
+
+    report = {
+        "meta": {
+            "app_version": APP_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "args": {key: value for key, value in vars(args).items() if key != "output"},
+        },
+        "results": results,
+    }
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
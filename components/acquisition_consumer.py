@@ -0,0 +1,104 @@
+import threading
+import time
+import numpy as np
+from components.flim_labs_backend import flim_labs
+from PyQt6.QtCore import QThread
+
+from components.diagnostics import Diagnostics
+
+
+def queue_items_to_arrays(items):
+    # Each queue item is ((time_ns,), (counts per channel...))
+    times_ns = np.fromiter((v[0][0] for v in items), dtype=np.float64, count=len(items))
+    counts = np.array([v[1] for v in items], dtype=np.float64, ndmin=2)
+    return times_ns, counts
+
+
+class AcquisitionStore:
+    """
+    Double-buffered store shared by the queue consumer thread (writer) and the
+    GUI render timer (reader). The writer appends batches to the back buffer,
+    the reader swaps it out in O(1) and gets everything drained since the last frame:
+    CPS and the realtime correlator need every item, the plots keep their time span only
+    (IntensityRingBuffer).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._batches = []
+        self._ended = False
+
+    def push(self, times_ns, counts):
+        with self._lock:
+            self._batches.append((times_ns, counts))
+
+    def push_end(self):
+        with self._lock:
+            self._ended = True
+
+    def swap(self):
+        with self._lock:
+            batches, ended = self._batches, self._ended
+            self._batches = []
+            self._ended = False
+        if len(batches) == 0:
+            return None, None, ended
+        if len(batches) == 1:
+            return batches[0][0], batches[0][1], ended
+        times_ns = np.concatenate([b[0] for b in batches])
+        counts = np.concatenate([b[1] for b in batches])
+        return times_ns, counts, ended
+
+
+class AcquisitionConsumer(QThread):
+    """
+    Drains flim_labs.pull_from_queue continuously, off the GUI thread, so that
+    slow widget work never stalls the device queue.
+    """
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.is_running = True
+        self.items_drained = 0
+        self.max_queue_latency_s = 0.0
+        self._first_wall_time = None
+        self._first_time_ns = None
+
+    def run(self):
+        while self.is_running:
+            with Diagnostics.probe("pull_from_queue"):
+                val = flim_labs.pull_from_queue()
+            if len(val) == 0:
+                self.msleep(1)
+                continue
+            end_index = next((i for i, v in enumerate(val) if v == ('end',)), None)
+            items = val if end_index is None else val[:end_index]
+            if len(items) > 0:
+                times_ns, counts = queue_items_to_arrays(items)
+                self.items_drained += len(items)
+                self.update_latency(times_ns[-1])
+                self.store.push(times_ns, counts)
+            if end_index is not None:
+                self.store.push_end()
+                break
+
+    def update_latency(self, last_time_ns):
+        # How far the drained stream lags behind the acquisition clock
+        now = time.perf_counter()
+        if self._first_wall_time is None:
+            self._first_wall_time = now
+            self._first_time_ns = last_time_ns
+            return
+        wall_elapsed = now - self._first_wall_time
+        stream_elapsed = (last_time_ns - self._first_time_ns) / 1_000_000_000
+        self.max_queue_latency_s = max(self.max_queue_latency_s, wall_elapsed - stream_elapsed)
+
+    def stats(self):
+        return {
+            "items_drained": self.items_drained,
+            "max_queue_latency_s": self.max_queue_latency_s,
+        }
+
+    def stop(self):
+        self.is_running = False
@@ -146,16 +146,14 @@ class GTModeButtons(QWidget):
     def realtime_button_pressed(self, checked):
         self.app.control_inputs[REALTIME_BUTTON].setChecked(checked)
         self.app.control_inputs[POST_PROCESSING_BUTTON].setChecked(not checked)
-        self.app.settings.setValue(
-            SETTINGS_GT_CALC_MODE, "realtime" if checked else "post-processing"
-        )
+        self.app.selected_gt_calc_mode = "realtime" if checked else "post-processing"
+        self.app.settings.setValue(SETTINGS_GT_CALC_MODE, self.app.selected_gt_calc_mode)
 
     def post_processing_button_pressed(self, checked):
         self.app.control_inputs[REALTIME_BUTTON].setChecked(not checked)
         self.app.control_inputs[POST_PROCESSING_BUTTON].setChecked(checked)
-        self.app.settings.setValue(
-            SETTINGS_GT_CALC_MODE, "post-processing" if checked else "realtime"
-        )
+        self.app.selected_gt_calc_mode = "post-processing" if checked else "realtime"
+        self.app.settings.setValue(SETTINGS_GT_CALC_MODE, self.app.selected_gt_calc_mode)
 
 
 class ReadAcquireModeButton(QWidget):
@@ -11,7 +11,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtGui import QIcon, QPixmap, QTransform
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
-import flim_labs
+from components.flim_labs_backend import flim_labs
 
 
 from components.check_card import CheckCard
@@ -3,7 +3,7 @@ import os
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QWidget, QHBoxLayout, QPushButton, QLabel, QVBoxLayout
 from PyQt6.QtGui import QIcon
-import flim_labs
+from components.flim_labs_backend import flim_labs
 
 from components.gui_styles import GUIStyles
 from components.resource_path import resource_path
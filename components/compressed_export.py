@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import struct
+import zlib
+import numpy as np
+
+from components.intensity_tracing_file import IntensityTracingFile
+from components.settings import EXPORT_COMPRESSION_BLOCK_RECORDS, EXPORT_COMPRESSION_LEVEL
+from components.time_tagger_file import TimeTaggerFile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Magic bytes of the compressed files, by source format
+COMPRESSED_MAGIC = {"intensity_tracing": b"ITZ1", "time_tagger": b"TTZ1"}
+BLOCK_HEADER = struct.Struct("<III")
+
+
+class CompressedExport:
+    """
+    Lossless compressed copies of the intensity tracing (IT02) and time tagger (ITT1) files.
+    The file is magic bytes (ITZ1 / TTZ1), the JSON header of the source file (plus "codec")
+    and blocks of records, each made of (number of records, raw size, compressed size) as u32
+    and the compressed payload:
+    - intensity tracing: the times as deltas of their f64 bit patterns (i64), then the counts
+      as zigzag encoded deltas (u32) along the time of each channel
+    - time tagger: the event codes (u8), then the times as deltas of their f64 bit patterns
+      (i64) from the previous event with the same code in the block (the first one is raw)
+    Each array is byte-shuffled (all the first bytes, then all the second bytes...) before
+    compression, so the zeros of the small deltas end up together.
+    Blocks are encoded and compressed on a thread pool (zstd and zlib release the GIL).
+    """
+
+    @staticmethod
+    def codec():
+        return "zstd" if zstandard is not None else "zlib"
+
+    @staticmethod
+    def write(file_format, source_path, destination_path, progress_callback=None):
+        """
+        Args:
+            file_format: "intensity_tracing" or "time_tagger"
+            source_path: IT02 or ITT1 .bin file
+            destination_path: compressed file to write
+            progress_callback: called with (bytes read, total bytes) after each block
+
+        Returns:
+            int: size of the compressed file
+        """
+        if file_format == "intensity_tracing":
+            source = IntensityTracingFile(source_path)
+            encode = CompressedExport.encode_intensity_block
+        else:
+            source = TimeTaggerFile(source_path)
+            encode = CompressedExport.encode_time_tagger_block
+        codec = CompressedExport.codec()
+        header = json.dumps(dict(source.header, codec=codec)).encode("utf-8")
+        total = os.path.getsize(source_path)
+        data_offset = total - len(source.records) * source.records.dtype.itemsize
+        workers = os.cpu_count() or 1
+
+        def compress_block(start):
+            records = np.asarray(source.records[start:start + EXPORT_COMPRESSION_BLOCK_RECORDS])
+            payload = encode(records)
+            return len(records), len(payload), CompressedExport.compress(payload, codec)
+
+        starts = range(0, len(source.records), EXPORT_COMPRESSION_BLOCK_RECORDS)
+        with open(destination_path, "wb") as f, ThreadPoolExecutor(max_workers=workers) as executor:
+            f.write(COMPRESSED_MAGIC[file_format])
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            # At most two blocks per worker in memory
+            for window_start in range(0, len(starts), 2 * workers):
+                window = starts[window_start:window_start + 2 * workers]
+                for num_records, raw_size, compressed in executor.map(compress_block, window):
+                    f.write(BLOCK_HEADER.pack(num_records, raw_size, len(compressed)))
+                    f.write(compressed)
+                if progress_callback is not None:
+                    read = min(window[-1] + EXPORT_COMPRESSION_BLOCK_RECORDS, len(source.records))
+                    progress_callback(data_offset + read * source.records.dtype.itemsize, total)
+            return f.tell()
+
+    @staticmethod
+    def compress(payload, codec):
+        if codec == "zstd":
+            return zstandard.ZstdCompressor(level=EXPORT_COMPRESSION_LEVEL).compress(payload)
+        return zlib.compress(payload, min(EXPORT_COMPRESSION_LEVEL, 9))
+
+    @staticmethod
+    def encode_intensity_block(records):
+        time_bits = np.ascontiguousarray(records["time"]).view(np.int64)
+        counts = np.ascontiguousarray(records["counts"])
+        # Wrapping u32 deltas, zigzag encoded so that small negative deltas stay small
+        count_deltas = np.diff(counts, axis=0, prepend=np.zeros((1, counts.shape[1]), np.uint32))
+        count_deltas = count_deltas.view(np.int32)
+        zigzag = ((count_deltas << 1) ^ (count_deltas >> 31)).view(np.uint32)
+        return shuffle(np.diff(time_bits, prepend=np.int64(0))) + shuffle(zigzag)
+
+    @staticmethod
+    def encode_time_tagger_block(records):
+        events = np.ascontiguousarray(records["event"])
+        time_bits = np.ascontiguousarray(records["time"]).view(np.int64)
+        order = np.argsort(events, kind="stable")
+        sorted_bits = time_bits[order]
+        deltas_sorted = np.diff(sorted_bits, prepend=np.int64(0))
+        # The first time of each event code is stored raw
+        starts = group_starts(events[order])
+        deltas_sorted[starts] = sorted_bits[starts]
+        deltas = np.empty_like(deltas_sorted)
+        deltas[order] = deltas_sorted
+        return events.tobytes() + shuffle(deltas)
+
+
+def shuffle(array):
+    """Bytes of the array grouped by position within the items (byte 0 of all items first...)."""
+    return array.reshape(-1).view(np.uint8).reshape(-1, array.dtype.itemsize).T.tobytes()
+
+
+def group_starts(sorted_values):
+    return np.flatnonzero(np.concatenate(([True], sorted_values[1:] != sorted_values[:-1])))
@@ -1,10 +1,12 @@
 import os
+from functools import partial
 from PyQt6.QtCore import Qt, QSize
 from PyQt6.QtGui import QIcon
 
+from components.export_jobs import ExportQueue
 from components.progress_bar import ProgressBar
 from components.resource_path import resource_path
-from components.settings import TIME_TAGGER_PROGRESS_BAR
+from components.settings import EXPORT_CANCEL_BUTTON, EXPORT_PROGRESS_BAR, TIME_TAGGER_PROGRESS_BAR
 
 current_path = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_path, ".."))
@@ -54,6 +56,19 @@ class ControlsBarBuilder:
         )
         app.widgets[TIME_TAGGER_PROGRESS_BAR] = time_tagger_progress_bar
         layout_container.addWidget(time_tagger_progress_bar)
+        # Export jobs progress bar
+        export_progress_bar = ProgressBar(visible=False, label_text="Exporting...")
+        export_cancel_button = QPushButton("CANCEL")
+        export_cancel_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        GUIStyles.set_stop_btn_style(export_cancel_button)
+        export_cancel_button.setFlat(True)
+        export_cancel_button.setFixedWidth(80)
+        export_cancel_button.clicked.connect(partial(ExportQueue.cancel, app))
+        export_progress_bar.label_layout.addStretch(1)
+        export_progress_bar.label_layout.addWidget(export_cancel_button)
+        app.widgets[EXPORT_PROGRESS_BAR] = export_progress_bar
+        app.control_inputs[EXPORT_CANCEL_BUTTON] = export_cancel_button
+        layout_container.addWidget(export_progress_bar)
         layout_container.addSpacing(5)
         return blank_space, layout_container
 
@@ -272,15 +287,15 @@ class ControlsBarBuilder:
         realtime_button.setChecked(selected_calc_mode == "realtime")
         realtime_button.setObjectName("realtime_btn")
         realtime_button.setStyleSheet(GUIStyles.gt_calc_mode_btn_style())
-        # buttons_row_layout.addWidget(realtime_button)
+        buttons_row_layout.addWidget(realtime_button)
 
         # post-processing button
         post_processing_button = QPushButton("POST-PROCESSING")
-        # post_processing_button.setCheckable(True)
-        # post_processing_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        post_processing_button.setCheckable(True)
+        post_processing_button.setCursor(Qt.CursorShape.PointingHandCursor)
 
-        # post_processing_button.clicked.connect(post_processing_btn_pressed_cb)
-        # post_processing_button.setChecked(selected_calc_mode != "realtime")
+        post_processing_button.clicked.connect(post_processing_btn_pressed_cb)
+        post_processing_button.setChecked(selected_calc_mode != "realtime")
         post_processing_button.setObjectName("post_processing_btn")
         post_processing_button.setStyleSheet(GUIStyles.gt_calc_mode_btn_style())
         buttons_row_layout.addWidget(post_processing_button)
@@ -300,6 +315,18 @@ class ControlsBarBuilder:
         inp.setStyleSheet(GUIStyles.set_input_select_style())
         return inp
 
+    @staticmethod
+    def create_fcs_engine_control(controls_row, value, change_cb, options):
+        _, inp = SelectControl.setup(
+            "FCS Engine:",
+            value,
+            controls_row,
+            options,
+            change_cb,
+        )
+        inp.setStyleSheet(GUIStyles.set_input_select_style())
+        return inp
+
     @staticmethod
     def create_fcs_algorithm_control(controls_row, value, change_cb, options):
         # Tau scale control
@@ -0,0 +1,352 @@
+import numpy as np
+
+from components.general_utilities import calculate_lag_index
+from components.settings import FCS_CHUNK_BINS
+
+# Lags per multi-tau level before the data is coarse-grained by 2
+MULTI_TAU_POINTS_PER_LEVEL = 16
+
+
+class CorrelationResult:
+    """
+    Same shape as the flim_labs FCS result: lag_index plus [((ch1, ch2), [mean, G1, G2...]), ...].
+    standard_errors optionally maps each pair to the per-lag standard error of the mean,
+    file_paths lists the FCS files written for the result.
+    """
+
+    def __init__(self, lag_index, g2_correlations, standard_errors=None, file_paths=None):
+        self.lag_index = lag_index
+        self.g2_correlations = g2_correlations
+        self.standard_errors = standard_errors if standard_errors is not None else {}
+        self.file_paths = file_paths if file_paths is not None else []
+
+
+class RunningG2Average:
+    """
+    Running mean and variance (Welford) of the G(τ) curves of each channel pair,
+    updated as soon as an acquisition has been correlated.
+    """
+
+    def __init__(self, correlations):
+        self.correlations = [tuple(pair) for pair in correlations]
+        self.count = {pair: 0 for pair in self.correlations}
+        self._mean = {}
+        self._m2 = {}
+        self._curves = {pair: {} for pair in self.correlations}
+
+    def update(self, pair, acquisition, curve):
+        curve = np.asarray(curve, dtype=np.float64)
+        self._curves[pair][acquisition] = curve
+        self.count[pair] += 1
+        if self.count[pair] == 1:
+            self._mean[pair] = curve.copy()
+            self._m2[pair] = np.zeros_like(curve)
+            return
+        delta = curve - self._mean[pair]
+        self._mean[pair] += delta / self.count[pair]
+        self._m2[pair] += delta * (curve - self._mean[pair])
+
+    def mean(self, pair):
+        return self._mean[pair]
+
+    def curves(self, pair):
+        return [curve for _, curve in sorted(self._curves[pair].items())]
+
+    def standard_error(self, pair):
+        count = self.count[pair]
+        if count < 2:
+            return np.zeros_like(self._mean[pair])
+        return np.sqrt(self._m2[pair] / (count - 1) / count)
+
+    def result(self, lag_index):
+        """
+        Returns:
+            CorrelationResult: current mean and curves of the pairs with at least one acquisition
+        """
+        pairs = [pair for pair in self.correlations if self.count[pair] > 0]
+        g2_correlations = [(pair, [self.mean(pair)] + self.curves(pair)) for pair in pairs]
+        standard_errors = {pair: self.standard_error(pair) for pair in pairs}
+        return CorrelationResult(lag_index, g2_correlations, standard_errors)
+
+    @staticmethod
+    def of_result(result):
+        """
+        Feed the curves of each acquisition of an averaged result (e.g. from the flim_labs engine)
+        through a running average, so it carries the standard errors as the NumPy engine result.
+
+        Returns:
+            CorrelationResult: same lag index and curves, with the running mean and standard errors
+        """
+        if any(len(curves) < 2 for _, curves in result.g2_correlations):
+            # Only the mean: nothing to average
+            return result
+        running_average = RunningG2Average([pair for pair, _ in result.g2_correlations])
+        for pair, curves in result.g2_correlations:
+            for acquisition, curve in enumerate(curves[1:]):
+                running_average.update(tuple(pair), acquisition, curve)
+        g2_result = running_average.result(result.lag_index)
+        g2_result.file_paths = list(getattr(result, "file_paths", None) or [])
+        return g2_result
+
+
+def fluorescence_correlation_spectroscopy(
+    intensities,
+    correlations,
+    bin_width,
+    tau_high_density=False,
+    use_fft_correlation=False,
+):
+    """
+    Compute G(τ) for every channel pair of every acquisition, without the flim_labs extension.
+
+    Args:
+        intensities: list (one entry per acquisition) of {channel: 1D photon counts array}
+        correlations: list of (ch1, ch2) pairs to correlate
+        bin_width: the bin width in microseconds
+        tau_high_density: True for the high density lag index, False for low density
+        use_fft_correlation: True for FFT-based correlation, False for multiple-τ
+
+    Returns:
+        CorrelationResult: lag index (μs) and, for each pair, the mean G(τ) followed by
+        the G(τ) of each acquisition. Lags longer than the shortest acquisition are dropped.
+    """
+    data_length = min(
+        len(counts) for acquisition in intensities for counts in acquisition.values()
+    )
+    lag_index, lags = lag_index_bins(bin_width, tau_high_density, data_length)
+    g2_correlations = []
+    for ch1, ch2 in correlations:
+        curves = [
+            correlate_pair(acquisition[ch1], acquisition[ch2], lags, use_fft_correlation)
+            for acquisition in intensities
+        ]
+        mean = np.mean(curves, axis=0)
+        g2_correlations.append(((ch1, ch2), [mean] + curves))
+    return CorrelationResult(lag_index, g2_correlations)
+
+
+def lag_index_bins(bin_width, tau_high_density, data_length=None):
+    """
+    Map the flim_labs lag index schedule (μs) to integer lags in bins.
+
+    Returns:
+        tuple: (lag index in μs, lags in bins), limited to lags shorter than data_length
+    """
+    bin_width = max(int(bin_width), 1)
+    lag_index = np.asarray(calculate_lag_index(bin_width, tau_high_density), dtype=np.int64)
+    lags = lag_index // bin_width
+    if data_length is not None:
+        keep = lags < data_length
+        lag_index, lags = lag_index[keep], lags[keep]
+    return lag_index.tolist(), lags
+
+
+def correlate_pair(intensity_a, intensity_b, lags, use_fft_correlation=False):
+    if use_fft_correlation:
+        return fft_correlation(intensity_a, intensity_b, lags)
+    return multi_tau_correlation(intensity_a, intensity_b, lags)
+
+
+def multi_tau_correlation(
+    intensity_a, intensity_b, lags, points_per_level=MULTI_TAU_POINTS_PER_LEVEL, chunk_size=FCS_CHUNK_BINS
+):
+    """
+    Multiple-τ G(τ) = <a(t) b(t+τ)> / (<a><b>) - 1, with symmetric normalization.
+    Long lags are computed on data coarse-grained by 2 per level, so that each level
+    holds about points_per_level lags.
+    The counts (e.g. memory-mapped columns) are read chunk_size bins at a time and streamed
+    through a StreamingMultiTauCorrelator, so memory does not grow with the acquisition length.
+    """
+    lags = np.asarray(lags, dtype=np.int64)
+    if len(lags) == 0:
+        return np.zeros(0)
+    levels = np.zeros(len(lags), dtype=np.int64)
+    long_lags = lags >= points_per_level
+    levels[long_lags] = np.floor(np.log2(lags[long_lags] / points_per_level)).astype(np.int64)
+    coarse_lags = np.rint(lags / 2.0**levels).astype(np.int64)
+    level_lags = [np.unique(coarse_lags[levels == level]) for level in range(levels.max() + 1)]
+    correlator = StreamingMultiTauCorrelator([(0, 1)], 1, 0, level_lags=level_lags)
+    for start in range(0, len(intensity_a), chunk_size):
+        a = np.asarray(intensity_a[start:start + chunk_size], dtype=np.float64)
+        b = np.asarray(intensity_b[start:start + chunk_size], dtype=np.float64)
+        correlator.update(np.column_stack((a, b)))
+    return correlator.g_values()[0][levels, coarse_lags]
+
+
+def fft_correlation(intensity_a, intensity_b, lags):
+    """FFT-based G(τ) with the same normalization as multi_tau_correlation, at full resolution."""
+    a = np.asarray(intensity_a, dtype=np.float64)
+    b = np.asarray(intensity_b, dtype=np.float64)
+    lags = np.asarray(lags, dtype=np.int64)
+    n = len(a)
+    size = 1 << int(2 * n - 1).bit_length()
+    # products[k] = sum_t a(t) b(t+k)
+    products = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size), size)[:n]
+    return _normalize(products[lags], a, b, lags)
+
+
+def rebin(intensity, factor):
+    """
+    Sum each group of factor adjacent bins (vectorized reshape-sum), dropping an incomplete
+    trailing group. Works on memory-mapped columns without loading them first.
+
+    Returns:
+        np.ndarray: float64 photon counts with a bin width factor times larger
+    """
+    factor = max(int(factor), 1)
+    length = len(intensity) // factor * factor
+    return np.asarray(intensity[:length]).reshape(-1, factor).sum(axis=1, dtype=np.float64)
+
+
+class RebinnedCounts:
+    """
+    Photon counts (e.g. a memory-mapped column) with factor adjacent bins summed, computed only
+    for the slices read: multi_tau_correlation streams them chunk by chunk without loading the
+    whole acquisition, the FFT correlation converts them as a whole (np.asarray).
+    """
+
+    def __init__(self, counts, factor):
+        self.counts = counts
+        self.factor = max(int(factor), 1)
+
+    def __len__(self):
+        return len(self.counts) // self.factor
+
+    def __getitem__(self, index):
+        start, stop, _ = index.indices(len(self))
+        return rebin(self.counts[start * self.factor:stop * self.factor], self.factor)
+
+    def __array__(self, dtype=None, copy=None):
+        counts = rebin(self.counts, self.factor)
+        return counts if dtype is None else counts.astype(dtype, copy=False)
+
+
+def _normalize(products, a, b, lags):
+    n = len(a)
+    valid = lags < n
+    lags = np.where(valid, lags, 0)
+    cumulative_a = np.concatenate(([0.0], np.cumsum(a)))
+    cumulative_b = np.concatenate(([0.0], np.cumsum(b)))
+    overlap = n - lags
+    sum_a = cumulative_a[overlap]
+    sum_b = cumulative_b[n] - cumulative_b[lags]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        g = products * overlap / (sum_a * sum_b) - 1
+    g[~valid] = np.nan
+    return g
+
+
+class StreamingMultiTauCorrelator:
+    """
+    Incremental multiple-τ correlator fed with batches of live photon counts.
+    Each level keeps MULTI_TAU_POINTS_PER_LEVEL lags and a short history per channel,
+    then passes pairwise sums to the next level, so memory grows with log(τ max).
+    """
+
+    def __init__(
+        self,
+        correlations,
+        bin_width,
+        max_tau_seconds,
+        points_per_level=MULTI_TAU_POINTS_PER_LEVEL,
+        level_lags=None,
+    ):
+        """
+        Args:
+            level_lags: lags of each level, in bins of the level (2^level bins), instead of the
+                default schedule built from max_tau_seconds and points_per_level
+        """
+        self.correlations = [tuple(pair) for pair in correlations]
+        self.channels = sorted({ch for pair in self.correlations for ch in pair})
+        self.bin_width = bin_width
+        self.points_per_level = points_per_level
+        if level_lags is None:
+            max_lag_bins = max_tau_seconds * 1_000_000 / max(bin_width, 1)
+            num_levels = max(1, int(np.ceil(np.log2(max(max_lag_bins / (points_per_level - 1), 1)))) + 1)
+            # Level 0 holds lags 0..m-1, higher levels m/2..m-1 at 2^level resolution
+            level_lags = [np.arange(points_per_level)] + [
+                np.arange(points_per_level // 2, points_per_level)
+                for _ in range(1, num_levels)
+            ]
+        self.level_lags = [np.asarray(lags, dtype=np.int64) for lags in level_lags]
+        self.num_levels = len(self.level_lags)
+        # Samples kept at each level for the next batch: the longest lag of the level
+        self._history_lengths = [int(lags.max()) if len(lags) else 0 for lags in self.level_lags]
+        shape = (len(self.correlations), self.num_levels, max(self._history_lengths) + 1)
+        self._products = np.zeros(shape)
+        self._sums_a = np.zeros(shape)
+        self._sums_b = np.zeros(shape)
+        self._pairs_count = np.zeros(shape)
+        self._history = [{ch: np.zeros(0) for ch in self.channels} for _ in range(self.num_levels)]
+        self._carry = [{ch: np.zeros(0) for ch in self.channels} for _ in range(self.num_levels)]
+
+    def lag_bins(self):
+        return np.concatenate(
+            [lags * 2**level for level, lags in enumerate(self.level_lags)]
+        )
+
+    def new_segment(self):
+        """Forget the histories (e.g. between acquisitions), keeping the accumulated sums."""
+        for level in range(self.num_levels):
+            for ch in self.channels:
+                self._history[level][ch] = np.zeros(0)
+                self._carry[level][ch] = np.zeros(0)
+
+    def update(self, counts):
+        """counts: 2D array (samples x channels), indexed by channel id."""
+        new = {ch: np.asarray(counts[:, ch], dtype=np.float64) for ch in self.channels}
+        for level in range(self.num_levels):
+            if len(new[self.channels[0]]) == 0:
+                break
+            history = self._history[level]
+            extended = {ch: np.concatenate((history[ch], new[ch])) for ch in self.channels}
+            history_length = len(history[self.channels[0]])
+            for pair_index, (ch1, ch2) in enumerate(self.correlations):
+                self._accumulate(pair_index, level, extended[ch1], extended[ch2], history_length)
+            for ch in self.channels:
+                history[ch] = extended[ch][max(len(extended[ch]) - self._history_lengths[level], 0):]
+                pending = np.concatenate((self._carry[level][ch], new[ch]))
+                even_length = len(pending) // 2 * 2
+                self._carry[level][ch] = pending[even_length:]
+                new[ch] = pending[:even_length].reshape(-1, 2).sum(axis=1)
+
+    def _accumulate(self, pair_index, level, extended_a, extended_b, history_length):
+        total = len(extended_b)
+        cumulative_a = np.concatenate(([0.0], np.cumsum(extended_a)))
+        cumulative_b = np.concatenate(([0.0], np.cumsum(extended_b)))
+        for j in self.level_lags[level]:
+            start = max(history_length, j)
+            if start >= total:
+                continue
+            self._products[pair_index, level, j] += np.dot(extended_a[start - j:total - j], extended_b[start:])
+            self._sums_a[pair_index, level, j] += cumulative_a[total - j] - cumulative_a[start - j]
+            self._sums_b[pair_index, level, j] += cumulative_b[total] - cumulative_b[start]
+            self._pairs_count[pair_index, level, j] += total - start
+
+    def g_values(self):
+        """
+        Returns:
+            np.ndarray: G(τ) indexed by (pair, level, lag in bins of the level), NaN for the lags
+            not seen yet
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._products * self._pairs_count / (self._sums_a * self._sums_b) - 1
+
+    def result(self):
+        """
+        Returns:
+            CorrelationResult: lag index (μs) of the lags seen so far and the current G(τ) per pair.
+        """
+        lag_bins = self.lag_bins()
+        def flat(values):
+            return np.concatenate(
+                [values[:, level, lags] for level, lags in enumerate(self.level_lags)], axis=1
+            )
+        seen = flat(self._pairs_count)[0] > 0
+        order = np.argsort(lag_bins[seen], kind="stable")
+        g = flat(self.g_values())[:, seen][:, order]
+        lag_index = (lag_bins[seen][order] * self.bin_width).tolist()
+        g2_correlations = [
+            (pair, [g[pair_index]]) for pair_index, pair in enumerate(self.correlations)
+        ]
+        return CorrelationResult(lag_index, g2_correlations)
@@ -0,0 +1,103 @@
+import numpy as np
+
+from components.settings import CPS_EWMA_SECONDS, CPS_UI_INTERVAL_SECONDS, CPS_WINDOW_SECONDS
+
+# Batch ends kept for the sliding window (the queue is drained at the plots frame rate)
+CPS_HISTORY_LENGTH = 256
+
+
+class CPSEngine:
+    """
+    Count rates of all the enabled channels at once, from the batches of bins drained from
+    the acquisition queue: a sliding-window rate (counts over the last CPS_WINDOW_SECONDS)
+    and an exponentially weighted moving average (time constant CPS_EWMA_SECONDS).
+    The rates are returned once every CPS_UI_INTERVAL_SECONDS of acquisition, so the labels
+    and threshold animations are updated at a fixed rate whatever the number of batches.
+    """
+
+    def __init__(
+        self,
+        channels,
+        window_seconds=CPS_WINDOW_SECONDS,
+        ewma_seconds=CPS_EWMA_SECONDS,
+        ui_interval_seconds=CPS_UI_INTERVAL_SECONDS,
+    ):
+        self.channels = list(channels)
+        self.window_ns = window_seconds * 1e9
+        self.ewma_ns = ewma_seconds * 1e9
+        self.ui_interval_ns = ui_interval_seconds * 1e9
+        # Cumulative counts of each channel at the end of the last batches
+        self._times = np.zeros(CPS_HISTORY_LENGTH)
+        self._cumulative = np.zeros((CPS_HISTORY_LENGTH, len(self.channels)))
+        self._size = 0
+        self._total = np.zeros(len(self.channels))
+        self._last_time_ns = None
+        self._last_ui_ns = None
+        self.ewma = np.zeros(len(self.channels))
+        self.window_rates = np.zeros(len(self.channels))
+        # Channels above the threshold at the last UI update
+        self.above_threshold = np.zeros(len(self.channels), dtype=bool)
+
+    def update(self, times_ns, counts):
+        """
+        Args:
+            times_ns: end time (ns) of each bin of the batch
+            counts: photon counts of the bins, one column per channel id
+
+        Returns:
+            bool: True if the rates (window_rates, ewma) were updated and should be shown
+        """
+        if len(times_ns) == 0:
+            return False
+        counts = np.asarray(counts)[:, self.channels]
+        if self._last_time_ns is None:
+            # The first bin only sets the start time
+            self._last_time_ns = self._last_ui_ns = float(times_ns[0])
+            self._push(self._last_time_ns)
+            times_ns, counts = times_ns[1:], counts[1:]
+            if len(times_ns) == 0:
+                return False
+        end_ns = float(times_ns[-1])
+        batch_counts = counts.sum(axis=0)
+        self._total += batch_counts
+        self._push(end_ns)
+        duration_ns = end_ns - self._last_time_ns
+        if duration_ns > 0:
+            rates = batch_counts / (duration_ns / 1e9)
+            # Starts from the first rate instead of ramping up from 0
+            alpha = 1 - np.exp(-duration_ns / self.ewma_ns) if self._size > 2 else 1
+            self.ewma += alpha * (rates - self.ewma)
+        self._last_time_ns = end_ns
+        if end_ns - self._last_ui_ns < self.ui_interval_ns:
+            return False
+        self._last_ui_ns = end_ns
+        times = self._times[: self._size]
+        # Last batch end at least one window ago (or the oldest one kept)
+        start = int(np.searchsorted(times, end_ns - self.window_ns, side="right")) - 1
+        start = min(max(start, 0), self._size - 2)
+        elapsed_s = (end_ns - times[start]) / 1e9
+        if elapsed_s > 0:
+            self.window_rates = (self._total - self._cumulative[start]) / elapsed_s
+        return True
+
+    def _push(self, time_ns):
+        if self._size == CPS_HISTORY_LENGTH:
+            # Drop the oldest half, the window only needs the last batches
+            keep = CPS_HISTORY_LENGTH // 2
+            self._times[:keep] = self._times[-keep:]
+            self._cumulative[:keep] = self._cumulative[-keep:]
+            self._size = keep
+        self._times[self._size] = time_ns
+        self._cumulative[self._size] = self._total
+        self._size += 1
+
+    def threshold_changes(self, threshold):
+        """
+        Returns:
+            tuple: (indices of the channels which crossed the threshold, whether each is now above).
+            The smoothed (EWMA) rate is compared, so a single noisy window does not blink the widget.
+        """
+        above = self.ewma > threshold if threshold > 0 else np.zeros(len(self.channels), dtype=bool)
+        changed = np.flatnonzero(above != self.above_threshold)
+        self.above_threshold = above
+        return changed, above[changed]
@@ -1,6 +1,5 @@
 from functools import partial
 import os
-import shutil
 from PyQt6.QtWidgets import (
     QWidget,
     QHBoxLayout,
@@ -12,6 +11,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon, QColor
+from components.export_jobs import ExportQueue
 from components.file_utilities import FileUtils
 from components.format_utilities import FormatUtils
 from components.general_utilities import (
@@ -64,16 +64,18 @@ class ExportDataControl(QWidget):
             0: {'app_attr': 'export_fcs', 'setting_key': SETTINGS_EXPORT_FCS},
            
             1: {'app_attr': 'export_intensity_tracing', 'setting_key': SETTINGS_EXPORT_INTENSITY_TRACING},
-            2: {'app_attr': 'time_tagger', 'setting_key': SETTINGS_TIME_TAGGER}
+            2: {'app_attr': 'time_tagger', 'setting_key': SETTINGS_TIME_TAGGER},
+            3: {'app_attr': 'export_compressed', 'setting_key': SETTINGS_EXPORT_COMPRESSED},
         }
         export_options_widget = MultiSelectDropdown(self.app, settings_config=settings_config)
         export_options_widget.setPlaceholderText("EXPORT OPTIONS")
         export_options_widget.addItems(
-            ["FCS", "Intensity tracing",  "Time Tagger"],
+            ["FCS", "Intensity tracing",  "Time Tagger", "Compressed"],
             itemList=[
                 {"checked": True, "icon": None, "locked": True},
                 {"checked": self.app.export_intensity_tracing, "icon": None},                
-                {"checked": self.app.time_tagger, "icon": "assets/time-tagger-icon.png"}
+                {"checked": self.app.time_tagger, "icon": "assets/time-tagger-icon.png"},
+                {"checked": self.app.export_compressed, "icon": None},
             ]
         )
     
@@ -88,7 +90,7 @@ class ExportDataControl(QWidget):
         Salva il nuovo stato nei settings.
         
         Parameters:
-            index (int): L'indice dell'item (0=FCS, 1=Intensity tracing, 2=Time Tagger)
+            index (int): L'indice dell'item (0=FCS, 1=Intensity tracing, 2=Time Tagger, 3=Compressed)
             checked (bool): Il nuovo stato
         """
         if index == 0:  
@@ -102,6 +104,10 @@ class ExportDataControl(QWidget):
             self.app.time_tagger = checked
             self.app.settings.setValue(SETTINGS_TIME_TAGGER, checked)
 
+        elif index == 3:
+            self.app.export_compressed = checked
+            self.app.settings.setValue(SETTINGS_EXPORT_COMPRESSED, checked)
+
     def create_time_tagger_widget(self):
         from components.buttons import TimeTaggerWidget
 
@@ -300,6 +306,10 @@ class AddNotesToExportedDataPopup(QWidget):
 
 
 class ExportData:
+    """
+    The save dialogs run on the GUI thread, the files and scripts are then written by a
+    background export job (see ExportQueue), so the next acquisition can start right away.
+    """
 
     @staticmethod
     def save_intensity_tracing_data(app):
@@ -313,48 +323,53 @@ class ExportData:
                 else 1
             )
             intensity_files = FileUtils.get_recent_n_intensity_tracing_files(
-                num_acquisitions
+                num_acquisitions, app.acquisition_id
             )
             
             if not intensity_files:
                 return
             
-            
-            dialog = QFileDialog()
-            save_path, _ = dialog.getSaveFileName(
-                app,
-                "Save Intensity Tracing files",
-                "",
-                "All Files (*);;Binary Files (*.bin)",
-                options=QFileDialog.Option.DontUseNativeDialog,
-            )
-            if not save_path:
+            save_dir, save_name = ExportData.ask_save_path(app, "Save Intensity Tracing files")
+            if not save_name:
                 return
-            
-            save_dir = os.path.dirname(save_path)
-            save_name = os.path.basename(save_path)
             file_name = FileUtils.clean_filename(save_name)
             
-            
+            files = []
+            new_intensity_paths = []
             for index, file in enumerate(intensity_files):
                 new_intensity_file_name = (
                     f"{file_name}_{timestamp}_intensity_tracing_{index + 1}.bin"
                 )
                 new_intensity_ref_path = os.path.join(save_dir, new_intensity_file_name)
-                shutil.copyfile(file, new_intensity_ref_path)
+                files.append(ExportData.export_entry(app, file, new_intensity_ref_path, "intensity_tracing"))
+                new_intensity_paths.append(new_intensity_ref_path)
+            scripts = [
+                {
+                    "kind": "intensity_tracing",
+                    "args": {
+                        "intensity_file_paths": new_intensity_paths,
+                        "file_name": f"{file_name}_{timestamp}",
+                        "directory": save_dir,
+                        "channel_names": app.channel_names,
+                    },
+                }
+            ]
             
             if time_tagger:
-                time_tagger_file = FileUtils.get_recent_time_tagger_file()
+                time_tagger_file = FileUtils.get_recent_time_tagger_file(acquisition_id=app.acquisition_id)
                 if time_tagger_file:
-                    new_time_tagger_path = ExportData.copy_file(
-                        time_tagger_file,
-                        save_name,
-                        save_dir,
-                        "time_tagger_intensity",
-                        timestamp,
+                    files.append(
+                        ExportData.export_entry(
+                            app,
+                            time_tagger_file,
+                            ExportData.export_path(save_name, save_dir, "time_tagger_intensity", timestamp),
+                            "time_tagger",
+                        )
                     )
             
-            ScriptFileUtils.show_success_message(file_name)
+            ExportQueue.enqueue(
+                app, ExportQueue.create_job(file_name, files, app.export_strategy, scripts)
+            )
         except Exception as e:
             ScriptFileUtils.show_error_message(e)
 
@@ -363,41 +378,25 @@ class ExportData:
         """Save only time tagger files (without FCS and intensity tracing)"""
         try:
             timestamp = calc_timestamp()
-            num_acquisitions = (
-                app.selected_average
-                if app.free_running_acquisition_time == False
-                else 1
-            )
             
-            time_tagger_file = FileUtils.get_recent_time_tagger_file()
+            time_tagger_file = FileUtils.get_recent_time_tagger_file(acquisition_id=app.acquisition_id)
             if not time_tagger_file:
                 return
             
-            dialog = QFileDialog()
-            save_path, _ = dialog.getSaveFileName(
-                app,
-                "Save Time Tagger files",
-                "",
-                "All Files (*);;Binary Files (*.bin)",
-                options=QFileDialog.Option.DontUseNativeDialog,
-            )
-            if not save_path:
+            save_dir, save_name = ExportData.ask_save_path(app, "Save Time Tagger files")
+            if not save_name:
                 return
             
-            save_dir = os.path.dirname(save_path)
-            save_name = os.path.basename(save_path)
-            
-            new_time_tagger_path = ExportData.copy_file(
-                time_tagger_file,
-                save_name,
-                save_dir,
-                "time_tagger_intensity",
-                timestamp,
-            )
-            
-            # Mostra il messaggio di successo
+            files = [
+                ExportData.export_entry(
+                    app,
+                    time_tagger_file,
+                    ExportData.export_path(save_name, save_dir, "time_tagger_intensity", timestamp),
+                    "time_tagger",
+                )
+            ]
             file_name = FileUtils.clean_filename(save_name)
-            ScriptFileUtils.show_success_message(file_name)
+            ExportQueue.enqueue(app, ExportQueue.create_job(file_name, files, app.export_strategy))
         except Exception as e:
             ScriptFileUtils.show_error_message(e)
 
@@ -412,110 +411,97 @@ class ExportData:
                 else 1
             )
 
-            fcs_file = FileUtils.get_recent_fcs_file()
-            txt_fcs_file = FileUtils.get_recent_fcs_file(extension=".txt")
+            fcs_file = FileUtils.get_recent_fcs_file(acquisition_id=app.acquisition_id)
+            txt_fcs_file = FileUtils.get_recent_fcs_file(extension=".txt", acquisition_id=app.acquisition_id)
             intensity_files = FileUtils.get_recent_n_intensity_tracing_files(
-                  num_acquisitions
+                  num_acquisitions, app.acquisition_id
               )
+            if not fcs_file or not txt_fcs_file:
+                return
 
-                          
-            new_fcs_file_path, save_dir, save_name = ExportData.rename_and_move_file(
-                    fcs_file, "fcs", "Save FCS files", timestamp, app
-                )
-            if not new_fcs_file_path:
-                    return
-            ExportData.copy_file(
-                    txt_fcs_file, save_name, save_dir, "fcs", timestamp, "txt"
-                )
+            save_dir, save_name = ExportData.ask_save_path(app, "Save FCS files")
+            if not save_name:
+                return
+            file_name = FileUtils.clean_filename(save_name)
+            new_fcs_file_path = ExportData.export_path(save_name, save_dir, "fcs", timestamp)
+            files = [
+                (fcs_file, new_fcs_file_path),
+                (txt_fcs_file, ExportData.export_path(save_name, save_dir, "fcs", timestamp, "txt")),
+            ]
+            scripts = []
 
-           
-       
             if app.export_intensity_tracing:
+                new_intensity_paths = []
                 for index, file in enumerate(intensity_files):
-                    file_name = FileUtils.clean_filename(save_name)
                     new_intensity_file_name = (
                         f"{file_name}_{timestamp}_intensity_tracing_{index + 1}.bin"
                     )
                     new_intensity_ref_path = os.path.join(save_dir, new_intensity_file_name)
-                    shutil.copyfile(file, new_intensity_ref_path)
+                    files.append(ExportData.export_entry(app, file, new_intensity_ref_path, "intensity_tracing"))
+                    new_intensity_paths.append(new_intensity_ref_path)
+                # requirements.txt is written with the FCS scripts
+                scripts.append(
+                    {
+                        "kind": "intensity_tracing",
+                        "args": {
+                            "intensity_file_paths": new_intensity_paths,
+                            "file_name": f"{file_name}_{timestamp}",
+                            "directory": save_dir,
+                            "channel_names": app.channel_names,
+                            "write_requirements": False,
+                        },
+                    }
+                )
 
+            new_time_tagger_path = ""
             if time_tagger:
-                time_tagger_file = FileUtils.get_recent_time_tagger_file()
-                new_time_tagger_path = ExportData.copy_file(
-                    time_tagger_file,
-                    save_name,
-                    save_dir,
-                    "time_tagger_fcs",
-                    timestamp,
-                )
-            new_time_tagger_path = (
-                ""
-                if not time_tagger or not new_time_tagger_path
-                else new_time_tagger_path
+                time_tagger_file = FileUtils.get_recent_time_tagger_file(acquisition_id=app.acquisition_id)
+                if time_tagger_file:
+                    new_time_tagger_path = ExportData.export_path(
+                        save_name, save_dir, "time_tagger_fcs", timestamp
+                    )
+                    files.append(
+                        ExportData.export_entry(app, time_tagger_file, new_time_tagger_path, "time_tagger")
+                    )
+            scripts.append(
+                {
+                    "kind": "fcs",
+                    "args": {
+                        "bin_file_paths": {"fcs": new_fcs_file_path},
+                        "file_name": f"{file_name}_{timestamp}",
+                        "directory": save_dir,
+                        "script_type": "fcs",
+                        "channel_names": app.channel_names,
+                        "time_tagger": time_tagger,
+                        "time_tagger_file_path": new_time_tagger_path,
+                    },
+                }
             )
-            file_paths = {
-                "fcs": new_fcs_file_path,
-            }
-            ExportData.download_scripts(
-                file_paths,
-                save_name,
-                save_dir,
-                "fcs",
-                timestamp,
-                channel_names=app.channel_names,
-                time_tagger=time_tagger,
-                time_tagger_file_path=new_time_tagger_path,
+            ExportQueue.enqueue(
+                app, ExportQueue.create_job(file_name, files, app.export_strategy, scripts)
             )
         except Exception as e:
             ScriptFileUtils.show_error_message(e)
 
     @staticmethod
-    def download_scripts(
-        bin_file_paths,
-        file_name,
-        directory,
-        script_type,
-        timestamp,
-        channel_names=None,
-        time_tagger=False,
-        time_tagger_file_path="",
-    ):
-        file_name = FileUtils.clean_filename(file_name)
-        file_name = f"{file_name}_{timestamp}"
-        ScriptFileUtils.export_scripts(
-            bin_file_paths,
-            file_name,
-            directory,
-            script_type,
-            channel_names,
-            time_tagger,
-            time_tagger_file_path,
-        )
-
-    @staticmethod
-    def copy_file(
-        origin_file_path,
-        save_name,
-        save_dir,
-        file_type,
-        timestamp,
-        file_extension="bin",
-    ):
+    def export_path(save_name, save_dir, file_type, timestamp, file_extension="bin"):
         new_filename = f"{save_name}_{timestamp}_{file_type}"
         new_filename = f"{FileUtils.clean_filename(new_filename)}.{file_extension}"
-        new_file_path = os.path.join(save_dir, new_filename)
-        shutil.copyfile(origin_file_path, new_file_path)
-        return new_file_path
+        return os.path.join(save_dir, new_filename)
 
     @staticmethod
-    def rename_and_move_file(
-        original_file_path,
-        file_type,
-        file_dialog_prompt,
-        timestamp,
-        app,
-        file_extension="bin",
-    ):
+    def export_entry(app, source_path, destination_path, file_format):
+        """Export job entry of a file, compressed if the "Compressed" export option is checked."""
+        if app.export_compressed:
+            return (source_path, destination_path, file_format)
+        return (source_path, destination_path)
+
+    @staticmethod
+    def ask_save_path(app, file_dialog_prompt):
+        """
+        Returns:
+            tuple: (directory, file name) chosen by the user, (None, None) if the dialog was cancelled
+        """
         dialog = QFileDialog()
         save_path, _ = dialog.getSaveFileName(
             app,
@@ -524,13 +510,6 @@ class ExportData:
             "All Files (*);;Binary Files (*.bin)",
             options=QFileDialog.Option.DontUseNativeDialog,
         )
-        if save_path:
-            save_dir = os.path.dirname(save_path)
-            save_name = os.path.basename(save_path)
-            new_filename = f"{save_name}_{timestamp}_{file_type}"
-            new_filename = f"{FileUtils.clean_filename(new_filename)}.{file_extension}"
-            new_file_path = os.path.join(save_dir, new_filename)
-            shutil.copyfile(original_file_path, new_file_path)
-            return new_file_path, save_dir, save_name
-        else:
-            return None, None, None
+        if not save_path:
+            return None, None
+        return os.path.dirname(save_path), os.path.basename(save_path)
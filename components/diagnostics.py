@@ -0,0 +1,235 @@
+from bisect import bisect_left
+from contextlib import nullcontext
+from datetime import datetime
+import functools
+import json
+import os
+import threading
+import time
+import pyqtgraph as pg
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QKeySequence, QShortcut
+from PyQt6.QtWidgets import QLabel
+
+from components.file_utilities import FileUtils
+from components.settings import (
+    DIAGNOSTICS_FOLDER,
+    DIAGNOSTICS_OVERLAY,
+    DIAGNOSTICS_REFRESH_MS,
+    DIAGNOSTICS_SHORTCUT,
+    SETTINGS_DIAGNOSTICS,
+)
+
+# Upper edges (s) of the histogram buckets: 10 per decade from 1 µs to 100 s
+BUCKET_EDGES = [10 ** (exponent / 10) for exponent in range(-60, 21)]
+DISABLED_PROBE = nullcontext()
+
+
+class StageHistogram:
+    """Durations of one stage, in logarithmic buckets (about 26% wide)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = [0] * (len(BUCKET_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        index = bisect_left(BUCKET_EDGES, seconds)
+        with self.lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        # Upper edge of the bucket holding the q-th duration, at most the longest one
+        rank = q / 100 * self.count
+        cumulative = 0
+        for index, bucket in enumerate(self.buckets):
+            cumulative += bucket
+            if bucket and cumulative >= rank:
+                return min(BUCKET_EDGES[index] if index < len(BUCKET_EDGES) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        with self.lock:
+            return {
+                "count": self.count,
+                "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+                "p50_ms": self.percentile(50) * 1000,
+                "p90_ms": self.percentile(90) * 1000,
+                "p99_ms": self.percentile(99) * 1000,
+                "max_ms": self.max * 1000,
+                "total_s": self.total,
+                "buckets": {
+                    f"{BUCKET_EDGES[index] * 1000:.6g}" if index < len(BUCKET_EDGES) else "inf": bucket
+                    for index, bucket in enumerate(self.buckets)
+                    if bucket
+                },
+            }
+
+
+class StageProbe:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        Diagnostics.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Diagnostics:
+    """
+    Timing probes around the stages of the live pipeline (queue pull, render tick, data processing,
+    CPS, plots refresh and painting), the FCS workers and the exports, each feeding a histogram.
+    Shown in an overlay toggled with DIAGNOSTICS_SHORTCUT and dumped to the diagnostics folder when
+    the application is closed. When disabled, a probe is a flag check returning a shared no-op context.
+    """
+
+    enabled = False
+    histograms = {}
+    session_start = None
+    histograms_lock = threading.Lock()
+
+    @staticmethod
+    def probe(stage):
+        """Usage: with Diagnostics.probe("stage"): ..."""
+        if not Diagnostics.enabled:
+            return DISABLED_PROBE
+        return StageProbe(stage)
+
+    @staticmethod
+    def timed(stage):
+        """Decorator timing each call of the function (thread run methods, export tasks)."""
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not Diagnostics.enabled:
+                    return function(*args, **kwargs)
+                with StageProbe(stage):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    def record(stage, seconds):
+        histogram = Diagnostics.histograms.get(stage)
+        if histogram is None:
+            with Diagnostics.histograms_lock:
+                histogram = Diagnostics.histograms.setdefault(stage, StageHistogram())
+        histogram.record(seconds)
+
+    @staticmethod
+    def summary():
+        return {stage: histogram.summary() for stage, histogram in list(Diagnostics.histograms.items())}
+
+    @staticmethod
+    def init(app):
+        Diagnostics.session_start = datetime.now()
+        overlay = DiagnosticsOverlay(app)
+        app.widgets[DIAGNOSTICS_OVERLAY] = overlay
+        app.diagnostics_shortcut = QShortcut(QKeySequence(DIAGNOSTICS_SHORTCUT), app)
+        app.diagnostics_shortcut.activated.connect(lambda: Diagnostics.toggle(app))
+        Diagnostics.set_enabled(app, app.diagnostics_enabled)
+
+    @staticmethod
+    def toggle(app):
+        Diagnostics.set_enabled(app, not app.diagnostics_enabled)
+        app.settings.setValue(SETTINGS_DIAGNOSTICS, app.diagnostics_enabled)
+
+    @staticmethod
+    def set_enabled(app, enabled):
+        app.diagnostics_enabled = enabled
+        Diagnostics.enabled = enabled
+        app.widgets[DIAGNOSTICS_OVERLAY].set_active(enabled)
+
+    @staticmethod
+    def dump():
+        """
+        Write the histograms of the session (if any stage was timed) to a JSON file in the
+        diagnostics folder of the flim-labs data folder.
+
+        Returns:
+            str: path of the file, None if there was nothing to write
+        """
+        if not Diagnostics.histograms:
+            return None
+        session_start = Diagnostics.session_start or datetime.now()
+        folder = os.path.join(FileUtils.data_folder(), DIAGNOSTICS_FOLDER)
+        file_path = os.path.join(folder, f"diagnostics_{session_start.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with open(file_path, "w") as f:
+                json.dump(
+                    {
+                        "session_start": session_start.isoformat(timespec="seconds"),
+                        "session_end": datetime.now().isoformat(timespec="seconds"),
+                        "stages": Diagnostics.summary(),
+                    },
+                    f,
+                    indent=2,
+                )
+        except OSError as e:
+            print(f"Diagnostics not saved: {e}")
+            return None
+        print(f"Diagnostics written in: {file_path}")
+        return file_path
+
+
+class DiagnosticsOverlay(QLabel):
+    """Table of the stage timings drawn over the top right corner of the window."""
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.app_window = window
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setStyleSheet(
+            "background-color: rgba(20, 20, 20, 210); color: #e0e0e0; padding: 8px;"
+            "font-family: Consolas, 'Courier New', monospace; font-size: 12px;"
+        )
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def set_active(self, active):
+        if active:
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.timer.start(DIAGNOSTICS_REFRESH_MS)
+        else:
+            self.timer.stop()
+            self.hide()
+
+    def refresh(self):
+        rows = [f"{'stage':<18}{'n':>8}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)"]
+        for stage, summary in sorted(Diagnostics.summary().items()):
+            rows.append(
+                f"{stage:<18}{summary['count']:>8}{summary['mean_ms']:>9.2f}{summary['p50_ms']:>9.2f}"
+                f"{summary['p90_ms']:>9.2f}{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}"
+            )
+        if len(rows) == 1:
+            rows.append("No stage timed yet")
+        rows.append(f"{DIAGNOSTICS_SHORTCUT} to hide")
+        self.setText("<pre>" + "\n".join(rows) + "</pre>")
+        self.adjustSize()
+        self.move(max(self.app_window.width() - self.width() - 20, 0), 20)
+        self.raise_()
+
+
+class TimedPlotWidget(pg.PlotWidget):
+    """pg.PlotWidget whose painting is timed as the "paint_plots" stage."""
+
+    def paintEvent(self, event):
+        with Diagnostics.probe("paint_plots"):
+            super().paintEvent(event)
@@ -0,0 +1,238 @@
+import json
+import os
+import shutil
+import uuid
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+from components.compressed_export import CompressedExport
+from components.diagnostics import Diagnostics
+from components.file_utilities import FileUtils
+from components.settings import EXPORT_MAX_WORKERS, EXPORT_PROGRESS_BAR, EXPORT_QUEUE_FILE
+from export_data_scripts.script_files_utils import ScriptFileUtils
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportJobSignals(QObject):
+    progress = pyqtSignal(str, object, object)
+    success = pyqtSignal(str)
+    cancelled = pyqtSignal(str)
+    error = pyqtSignal(str, str)
+
+
+class ExportJobTask(QRunnable):
+    """
+    Write the files of an export job (see ExportQueue.create_job) with FileUtils.export_file,
+    then its scripts. Progress is reported in bytes over all the files of the job.
+    """
+
+    def __init__(self, job, signals):
+        super().__init__()
+        self.job = job
+        self.signals = signals
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    @pyqtSlot()
+    @Diagnostics.timed("export_job")
+    def run(self):
+        job_id = self.job["id"]
+        exported = []
+        try:
+            files = [entry for entry in self.job["files"] if entry[0]]
+            total = max(sum(os.path.getsize(entry[0]) for entry in files if os.path.exists(entry[0])), 1)
+            done = 0
+            for source, destination, *file_format in files:
+                if self.is_cancelled:
+                    raise ExportCancelled()
+                if not os.path.exists(source) and os.path.exists(destination):
+                    # Already exported (moved) before the queue was restored
+                    continue
+                size = os.path.getsize(source)
+
+                def on_copy_progress(copied, _, done=done):
+                    if self.is_cancelled:
+                        raise ExportCancelled()
+                    self.signals.progress.emit(job_id, done + copied, total)
+
+                try:
+                    if file_format:
+                        CompressedExport.write(file_format[0], source, destination, on_copy_progress)
+                    else:
+                        FileUtils.export_file(source, destination, self.job["strategy"], on_copy_progress)
+                except ExportCancelled:
+                    # Partially copied file
+                    if os.path.exists(source) and os.path.exists(destination):
+                        os.remove(destination)
+                    raise
+                exported.append((source, destination))
+                done += size
+                self.signals.progress.emit(job_id, done, total)
+            for script in self.job["scripts"]:
+                if script["kind"] == "intensity_tracing":
+                    ScriptFileUtils.export_intensity_tracing_script(**script["args"])
+                else:
+                    ScriptFileUtils.write_scripts(**script["args"])
+            self.signals.success.emit(job_id)
+        except ExportCancelled:
+            ExportJobTask.undo(exported)
+            self.signals.cancelled.emit(job_id)
+        except Exception as e:
+            self.signals.error.emit(job_id, str(e))
+
+    @staticmethod
+    def undo(exported):
+        for source, destination in exported:
+            try:
+                if not os.path.exists(source):
+                    # Moved: put it back
+                    shutil.move(destination, source)
+                elif os.path.exists(destination):
+                    os.remove(destination)
+            except OSError:
+                pass
+
+
+class ExportQueue:
+    """
+    Exports run one after the other on a dedicated thread pool, so the next acquisition can start
+    while the previous one is being exported. Pending jobs are saved to EXPORT_QUEUE_FILE in the
+    flim-labs data folder and restored at startup.
+    """
+
+    @staticmethod
+    def init(app):
+        app.export_jobs = []
+        app.export_tasks = {}
+        app.export_closing = False
+        app.export_thread_pool = QThreadPool()
+        app.export_thread_pool.setMaxThreadCount(EXPORT_MAX_WORKERS)
+
+    @staticmethod
+    def create_job(name, files, strategy, scripts=None):
+        """
+        Args:
+            name: name shown in the progress bar and in the messages
+            files: list of (source path, destination path) or, for a compressed copy,
+                (source path, destination path, "intensity_tracing" | "time_tagger")
+            strategy: export strategy (see FileUtils.export_file)
+            scripts: list of {"kind": "fcs" | "intensity_tracing", "args": ScriptFileUtils arguments}
+
+        Returns:
+            dict: JSON serializable job
+        """
+        return {
+            "id": uuid.uuid4().hex,
+            "name": name,
+            "files": [list(entry) for entry in files],
+            "strategy": strategy,
+            "scripts": scripts or [],
+        }
+
+    @staticmethod
+    def enqueue(app, job):
+        app.export_jobs.append(job)
+        ExportQueue.save(app)
+        signals = ExportJobSignals()
+        signals.progress.connect(lambda job_id, done, total: ExportQueue.on_progress(app, job_id, done, total))
+        signals.success.connect(lambda job_id: ExportQueue.on_success(app, job_id))
+        signals.cancelled.connect(lambda job_id: ExportQueue.on_done(app, job_id))
+        signals.error.connect(lambda job_id, error: ExportQueue.on_error(app, job_id, error))
+        task = ExportJobTask(job, signals)
+        # Keep the signals alive as long as the task
+        app.export_tasks[job["id"]] = (task, signals)
+        app.export_thread_pool.start(task)
+        ExportQueue.update_progress_bar(app, 0, 1)
+
+    @staticmethod
+    def cancel(app):
+        """Cancel the export in progress (the oldest job of the queue)."""
+        if app.export_jobs:
+            task, _ = app.export_tasks[app.export_jobs[0]["id"]]
+            task.cancel()
+
+    @staticmethod
+    def shutdown(app):
+        """
+        Stop the exports when the application is closed: the partially written files are removed
+        and the jobs stay in the saved queue, to be exported again at the next startup.
+        """
+        app.export_closing = True
+        app.export_thread_pool.clear()
+        for task, _ in app.export_tasks.values():
+            task.cancel()
+        app.export_thread_pool.waitForDone()
+
+    @staticmethod
+    def on_progress(app, job_id, done, total):
+        if app.export_jobs and app.export_jobs[0]["id"] == job_id:
+            ExportQueue.update_progress_bar(app, done, total)
+
+    @staticmethod
+    def on_success(app, job_id):
+        job = ExportQueue.on_done(app, job_id)
+        if job is not None:
+            ScriptFileUtils.show_success_message(job["name"])
+
+    @staticmethod
+    def on_error(app, job_id, error):
+        ExportQueue.on_done(app, job_id)
+        ScriptFileUtils.show_error_message(error)
+
+    @staticmethod
+    def on_done(app, job_id):
+        if app.export_closing:
+            return None
+        job = next((job for job in app.export_jobs if job["id"] == job_id), None)
+        if job is not None:
+            app.export_jobs.remove(job)
+        app.export_tasks.pop(job_id, None)
+        ExportQueue.save(app)
+        ExportQueue.update_progress_bar(app, 0, 1)
+        return job
+
+    @staticmethod
+    def update_progress_bar(app, done, total):
+        progress_bar = app.widgets.get(EXPORT_PROGRESS_BAR)
+        if progress_bar is None:
+            return
+        if not app.export_jobs:
+            progress_bar.set_visible(False)
+            return
+        queued = len(app.export_jobs) - 1
+        label = f"Exporting {app.export_jobs[0]['name']}: {done / 1e6:.0f}/{total / 1e6:.0f} MB"
+        if queued > 0:
+            label += f" ({queued} queued)"
+        if progress_bar.isHidden():
+            progress_bar.set_visible(True)
+        progress_bar.update_progress(done, total, label)
+
+    @staticmethod
+    def queue_file_path():
+        return os.path.join(FileUtils.data_folder(), EXPORT_QUEUE_FILE)
+
+    @staticmethod
+    def save(app):
+        file_path = ExportQueue.queue_file_path()
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path + ".tmp", "w") as f:
+                json.dump(app.export_jobs, f)
+            os.replace(file_path + ".tmp", file_path)
+        except OSError as e:
+            print(f"Export queue not saved: {e}")
+
+    @staticmethod
+    def restore(app):
+        """Start again the exports left pending when the application was closed."""
+        try:
+            with open(ExportQueue.queue_file_path()) as f:
+                jobs = json.load(f)
+        except (OSError, ValueError, KeyError):
+            return
+        for job in jobs:
+            ExportQueue.enqueue(app, job)
@@ -1,3 +1,5 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import partial
 from components.box_message import BoxMessage
 from components.gui_styles import GUIStyles
@@ -5,26 +7,36 @@ from components.layout_utilities import create_gt_layout, create_gt_aborted_layo
 from components.channel_name_utils import get_channel_name
 from components.settings import (
     ABORT_BUTTON,
+    DEFAULT_FCS_ENGINE,
+    DEFAULT_FCS_WORKERS,
     GT_PLOTS_GRID,
     GT_PROGRESS_BAR_WIDGET,
     GT_WIDGET_WRAPPER,
     PLOT_GRIDS_CONTAINER,
+    REALTIME_GT_MAX_TAU_SECONDS,
+    REALTIME_GT_REFRESH_MS,
     TIME_TAGGER_PROGRESS_BAR,
     UNICODE_SUP,
 )
 import numpy as np
 import pyqtgraph as pg
-import flim_labs 
+from components.flim_labs_backend import flim_labs
 from PyQt6.QtCore import QThread, pyqtSignal, QTimer
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from PyQt6.QtGui import QFont
 
 from components.time_tagger import TimeTaggerController
+from components.diagnostics import Diagnostics
+from components.correlator import RunningG2Average, StreamingMultiTauCorrelator, correlate_pair, lag_index_bins
+from components.fcs_file import FCSFile
+from components.file_utilities import FileUtils
+from components.intensity_tracing_file import IntensityTracingFile
 
 
 class FCSPostProcessingSingleCalcWorker(QThread):
     finished = pyqtSignal()
     single_step_finished = pyqtSignal(object)
+    partial_result = pyqtSignal(object)
 
     def __init__(
         self,
@@ -38,7 +50,10 @@ class FCSPostProcessingSingleCalcWorker(QThread):
         export_intensity_tracing,
         notes,
         tau_high_density,
-        fcs_algorithm
+        fcs_algorithm,
+        fcs_engine=DEFAULT_FCS_ENGINE,
+        fcs_workers=DEFAULT_FCS_WORKERS,
+        acquisition_id=None,
     ):
         super().__init__()
         self.active_correlations = active_correlations
@@ -53,9 +68,32 @@ class FCSPostProcessingSingleCalcWorker(QThread):
         self.notes = notes
         self.is_running = True
         self.use_fft_correlation = (fcs_algorithm == "FFT-based correlation")
+        self.fcs_engine = fcs_engine
+        self.max_workers = fcs_workers if fcs_workers > 0 else (os.cpu_count() or 1)
+        self.acquisition_id = acquisition_id
+        # Set when the G(τ) was computed here and no flim_labs averaging is needed
+        self.result = None
 
+    @Diagnostics.timed("fcs_single_calc")
     def run(self):
         self.single_step_finished.emit(0)
+        if self.fcs_engine == "numpy":
+            intensity_files = FileUtils.get_recent_n_intensity_tracing_files(
+                self.num_acquisitions, self.acquisition_id
+            )
+            if len(intensity_files) == self.num_acquisitions:
+                try:
+                    # Oldest acquisition first, as in the flim_labs result
+                    self.run_parallel(intensity_files[::-1])
+                    self.finished.emit()
+                    return
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Parallel FCS calculation failed, using flim_labs: {e}")
+        self.run_serial()
+        self.finished.emit()
+
+    def run_serial(self):
+        # flim_labs keeps the acquisitions state internally, so these calls can't overlap
         for num in range(self.num_acquisitions):
             if not self.is_running:
                 break
@@ -74,7 +112,53 @@ class FCSPostProcessingSingleCalcWorker(QThread):
             if not self.is_running:
                 break
             self.single_step_finished.emit(num + 1)
-        self.finished.emit()
+
+    def run_parallel(self, intensity_files):
+        # Multiple-τ jobs read the memory-mapped files in chunks (FCS_CHUNK_BINS), FFT jobs need
+        # whole acquisitions in memory: those run one at a time
+        max_workers = 1 if self.use_fft_correlation else self.max_workers
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            intensities = [counts for _, _, counts in executor.map(IntensityTracingFile.read, intensity_files)]
+            data_length = min(len(counts) for acquisition in intensities for counts in acquisition.values())
+            lag_index, lags = lag_index_bins(self.bin_width, self.tau_high_density, data_length)
+            # One job per (acquisition, channel pair), NumPy releases the GIL while correlating
+            jobs = {
+                executor.submit(
+                    correlate_pair, acquisition[ch1], acquisition[ch2], lags, self.use_fft_correlation
+                ): (num, pair_index)
+                for num, acquisition in enumerate(intensities)
+                for pair_index, (ch1, ch2) in enumerate(self.active_correlations)
+            }
+            running_average = RunningG2Average(self.active_correlations)
+            pending_pairs = [len(self.active_correlations)] * self.num_acquisitions
+            completed_acquisitions = 0
+            for job in as_completed(jobs):
+                if not self.is_running:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return
+                num, pair_index = jobs[job]
+                running_average.update(self.active_correlations[pair_index], num, job.result())
+                pending_pairs[num] -= 1
+                if pending_pairs[num] == 0:
+                    completed_acquisitions += 1
+                    self.single_step_finished.emit(completed_acquisitions)
+                    if completed_acquisitions < self.num_acquisitions:
+                        self.partial_result.emit(running_average.result(lag_index))
+        result = running_average.result(lag_index)
+        if self.export_fcs and self.write_data:
+            result.file_paths = FCSFile.write(
+                {
+                    "enabled_channels": self.enabled_channels,
+                    "bin_width": self.bin_width,
+                    "acquisition_time": self.acquisition_time,
+                    "correlations": [list(pair) for pair in self.active_correlations],
+                    "num_acquisitions": self.num_acquisitions,
+                    "notes": self.notes,
+                },
+                result.lag_index,
+                result.g2_correlations,
+            )
+        self.result = result
 
     def stop(self):
         self.is_running = False
@@ -89,13 +173,14 @@ class FCSPostProcessingAverageCalcWorker(QThread):
         self.num_acquisitions = num_acquisitions
         self.is_running = True
 
+    @Diagnostics.timed("fcs_average_calc")
     def run(self):
         try:
             result = flim_labs.average_fluorescence_correlation_spectroscopy(
                 num_acquisitions=self.num_acquisitions,
             )
             if self.is_running:
-                self.success.emit(result)
+                self.success.emit(RunningG2Average.of_result(result))
         except ValueError as e:  
             self.error.emit(str(e)) 
 
@@ -151,7 +236,10 @@ class FCSPostProcessing:
             export_intensity_tracing,
             notes,
             tau_high_density,
-            fcs_algorithm
+            fcs_algorithm,
+            app.fcs_engine,
+            app.fcs_workers,
+            app.acquisition_id,
         )
         QApplication.processEvents()
         app.fcs_single_worker = worker
@@ -160,6 +248,9 @@ class FCSPostProcessing:
                 iteration, app, worker
             )
         )
+        worker.partial_result.connect(
+            lambda gt_results: FCSPostProcessing.show_partial_average(gt_results, app)
+        )
         worker.finished.connect(lambda: FCSPostProcessing.gt_averages_calc(app, worker))
         worker.start()
 
@@ -174,6 +265,9 @@ class FCSPostProcessing:
         worker.stop()
         if getattr(app, "gt_aborted", False):
             return
+        if worker.result is not None:
+            FCSPostProcessing.handle_fcs_post_processing_result(worker.result, app, worker)
+            return
         num_acquisitions = app.selected_average if app.free_running_acquisition_time == False else 1
         worker = FCSPostProcessingAverageCalcWorker(num_acquisitions)
         app.fcs_avg_worker = worker
@@ -210,6 +304,23 @@ class FCSPostProcessing:
             insert_widget(app.layouts[PLOT_GRIDS_CONTAINER], gt_widget, 1)
             QApplication.processEvents()
 
+    @staticmethod
+    def show_partial_average(gt_results, app):
+        if getattr(app, "gt_aborted", False):
+            return
+        FCSPostProcessingPlot.plot_results(app, gt_results)
+
+    @staticmethod
+    def register_fcs_files(app, gt_results):
+        # The FCS files written by the post-processing: the numpy engine result lists them,
+        # for the flim_labs result they are looked up in the data folder
+        return FileUtils.register_written_files(
+            app.acquisition_id,
+            ("fcs", "fcs_txt"),
+            getattr(gt_results, "file_paths", []),
+            app.acquisition_start_time,
+        )
+
     @staticmethod
     def handle_fcs_post_processing_result(gt_results, app, worker):
         from components.data_export_controls import ExportData
@@ -218,6 +329,115 @@ class FCSPostProcessing:
             return
         worker.stop()
         app.acquisition_stopped = True
+        FCSPostProcessingPlot.plot_results(app, gt_results)
+        FCSPostProcessing.register_fcs_files(app, gt_results)
+        if app.write_data:    
+            QTimer.singleShot(
+                300,
+                partial(ExportData.save_fcs_data, app),
+            )
+            
+        if ABORT_BUTTON in app.control_inputs:    
+            app.control_inputs[ABORT_BUTTON].setEnabled(False)      
+        # if app.write_data and app.time_tagger:
+            # app.widgets[TIME_TAGGER_PROGRESS_BAR].set_visible(True)
+            #TimeTaggerController.init_time_tagger_processing(app)            
+            
+
+class FCSRealtime:
+    @staticmethod
+    def start(app):
+        if app.selected_gt_calc_mode != "realtime":
+            return
+        correlations = [
+            tuple(item[:2]) for item in app.ch_correlations if item[2]
+        ]
+        if len(correlations) == 0:
+            return
+        from components.intensity_tracing_controller import IntensityTracing
+        # Queue items are sums over a window of bins (not single bins): the window is the
+        # correlator bin width, so the lags are labeled with the real spacing of the items
+        item_width_micros = max(
+            IntensityTracing.get_realtime_adjustment_value(app.enabled_channels), app.bin_width_micros
+        )
+        app.realtime_correlator = StreamingMultiTauCorrelator(
+            correlations, item_width_micros, REALTIME_GT_MAX_TAU_SECONDS
+        )
+        gt_plot_to_show = [
+            tuple(item) if isinstance(item, list) else item
+            for item in app.gt_plots_to_show
+        ]
+        app.realtime_gt_plots = [
+            correlation for correlation in correlations if correlation in gt_plot_to_show
+        ]
+        remove_widget(app.layouts[PLOT_GRIDS_CONTAINER], app.widgets[GT_WIDGET_WRAPPER])
+        gt_widget = create_gt_layout(app)
+        insert_widget(app.layouts[PLOT_GRIDS_CONTAINER], gt_widget, 1)
+        app.gt_lines.clear()
+        app.gt_charts.clear()
+        lag_index = np.sort(app.realtime_correlator.lag_bins()) * app.realtime_correlator.bin_width
+        for index, correlation in enumerate(app.realtime_gt_plots):
+            FCSPostProcessingPlot.generate_chart(
+                correlation, index, app, lag_index, np.zeros(len(lag_index))
+            )
+        app.realtime_gt_timer.start(REALTIME_GT_REFRESH_MS)
+
+    @staticmethod
+    def resume(app):
+        if app.realtime_correlator is None:
+            return
+        app.realtime_correlator.new_segment()
+        app.realtime_gt_timer.start(REALTIME_GT_REFRESH_MS)
+
+    @staticmethod
+    def update(app, counts):
+        if app.realtime_correlator is not None:
+            app.realtime_correlator.update(counts)
+
+    @staticmethod
+    def refresh_plots(app):
+        if app.realtime_correlator is None:
+            return
+        result = app.realtime_correlator.result()
+        if len(result.lag_index) == 0:
+            return
+        log_values = FCSPostProcessingPlot.lag_index_log_values(result.lag_index)
+        g2_correlations = dict(result.g2_correlations)
+        for index, correlation in enumerate(app.realtime_gt_plots):
+            if index >= len(app.gt_lines):
+                break
+            gt_values = g2_correlations[correlation][0]
+            app.gt_lines[index].setData(log_values, gt_values, connect="finite")
+            ch1_name = get_channel_name(correlation[0], app.channel_names, truncate_len=5)
+            ch2_name = get_channel_name(correlation[1], app.channel_names, truncate_len=5)
+            app.gt_charts[index].setTitle(
+                f"{ch1_name} - {ch2_name}; G(0) = {{:.6f}}".format(gt_values[0])
+            )
+
+    @staticmethod
+    def pause(app):
+        if app.realtime_correlator is None:
+            return
+        app.realtime_gt_timer.stop()
+        FCSRealtime.refresh_plots(app)
+
+    @staticmethod
+    def stop(app):
+        if app.realtime_correlator is None:
+            return
+        FCSRealtime.pause(app)
+        app.realtime_correlator = None
+        app.realtime_gt_plots = []
+        app.gt_lines.clear()
+        app.gt_charts.clear()
+
+
+class FCSPostProcessingPlot:
+    @staticmethod
+    def plot_results(app, gt_results):
+        FCSRealtime.stop(app)
+        app.gt_lines.clear()
+        app.gt_charts.clear()
         remove_widget(app.layouts[PLOT_GRIDS_CONTAINER], app.widgets[GT_WIDGET_WRAPPER])
         gt_widget = create_gt_layout(app)
         insert_widget(app.layouts[PLOT_GRIDS_CONTAINER], gt_widget, 1)
@@ -229,37 +449,40 @@ class FCSPostProcessing:
         filtered_gt_results = [
             res for res in gt_results.g2_correlations if res[0] in gt_plot_to_show
         ]
+        standard_errors = getattr(gt_results, "standard_errors", {})
         for index, res in enumerate(filtered_gt_results):
             correlation = res[0]
             gt_values = res[1][0]
             FCSPostProcessingPlot.generate_chart(
-                correlation, index, app, lag_index, gt_values
+                correlation, index, app, lag_index, gt_values, standard_errors.get(correlation)
             )
-        if app.write_data:    
-            QTimer.singleShot(
-                300,
-                partial(ExportData.save_fcs_data, app),
-            )
-            
-        if ABORT_BUTTON in app.control_inputs:    
-            app.control_inputs[ABORT_BUTTON].setEnabled(False)      
-        # if app.write_data and app.time_tagger:
-            # app.widgets[TIME_TAGGER_PROGRESS_BAR].set_visible(True)
-            #TimeTaggerController.init_time_tagger_processing(app)            
-            
 
-class FCSPostProcessingPlot:
+    @staticmethod
+    def lag_index_log_values(lag_index):
+        values = np.array(lag_index, dtype=np.float64)
+        positive = values > 0
+        log_values = np.full(len(values), -0.1)
+        log_values[positive] = np.log10(values[positive])
+        if np.any(positive):
+            # τ = 0 just before the shortest lag (1 μs, or less for time tagger correlations)
+            log_values[~positive] = min(log_values[positive].min(), 0) - 0.1
+        return log_values
+
+    @staticmethod
+    def lag_index_tick_exponents(lag_index):
+        values = np.array(lag_index, dtype=np.float64)
+        positive = values[values > 0]
+        if len(positive) == 0:
+            return np.zeros(len(values), dtype=int)
+        lowest = min(int(np.floor(np.log10(positive.min()))), 0)
+        highest = int(np.log10(positive.max()))
+        return np.linspace(lowest, highest, len(values)).astype(int)
+
     @staticmethod
     def generate_chart_with_custom_names(correlation, index, app, lag_index, gt_values, channel_names):
         """Generate chart using channel_names from file instead of app settings"""
-        values = np.array(lag_index)
-        values = np.where(values <= 0, 1e-9, values)
-        log_values = np.log10(values)
-        log_values = np.where(log_values < 0, -0.1, log_values)
-        exponents_int = log_values.astype(int)
-        exponents_lin_space_int = np.linspace(
-            0, max(exponents_int), len(exponents_int)
-        ).astype(int)        
+        log_values = FCSPostProcessingPlot.lag_index_log_values(lag_index)
+        exponents_lin_space_int = FCSPostProcessingPlot.lag_index_tick_exponents(lag_index)
         gt_widget = pg.PlotWidget()
         gt_widget.setLabel("left", "G(τ)", units="")
         gt_widget.setLabel("bottom", "τ (μs)", units="")
@@ -278,10 +501,7 @@ class FCSPostProcessingPlot:
         gt_widget.plotItem.getAxis("left").enableAutoSIPrefix(False)
         gt_widget.plotItem.getAxis("bottom").enableAutoSIPrefix(False)
         def format_power_of_ten(i):
-            if i < 0:
-                return "0"
-            else:
-                return "10" + "".join([UNICODE_SUP[c] for c in str(i)])
+            return "10" + "".join([UNICODE_SUP[c] for c in str(i)])
         ticks = [(i, format_power_of_ten(i)) for i in exponents_lin_space_int]
         gt_widget.plotItem.getAxis("bottom").setTicks([ticks])
         gt_widget.setStyleSheet("border: 1px solid #3b3b3b")
@@ -294,15 +514,9 @@ class FCSPostProcessingPlot:
         app.gt_lines.append(fcs_plot)
 
     @staticmethod
-    def generate_chart(correlation, index, app, lag_index, gt_values):
-        values = np.array(lag_index)
-        values = np.where(values <= 0, 1e-9, values)
-        log_values = np.log10(values)
-        log_values = np.where(log_values < 0, -0.1, log_values)
-        exponents_int = log_values.astype(int)
-        exponents_lin_space_int = np.linspace(
-            0, max(exponents_int), len(exponents_int)
-        ).astype(int)        
+    def generate_chart(correlation, index, app, lag_index, gt_values, gt_errors=None):
+        log_values = FCSPostProcessingPlot.lag_index_log_values(lag_index)
+        exponents_lin_space_int = FCSPostProcessingPlot.lag_index_tick_exponents(lag_index)
         gt_widget = pg.PlotWidget()
         gt_widget.setLabel("left", "G(τ)", units="")
         gt_widget.setLabel("bottom", "τ (μs)", units="")
@@ -315,20 +529,23 @@ class FCSPostProcessingPlot:
             f"{ch1_name} - {ch2_name}; G(0) = {{:.6f}}".format(gt_values[0])
         )
         gt_widget.plotItem.layout.setContentsMargins(10, 10, 10, 10)
+        if gt_errors is not None and np.any(gt_errors > 0):
+            # Standard error of the mean across acquisitions
+            upper = pg.PlotDataItem(log_values, gt_values + gt_errors, pen=None)
+            lower = pg.PlotDataItem(log_values, gt_values - gt_errors, pen=None)
+            gt_widget.addItem(pg.FillBetweenItem(upper, lower, brush=pg.mkBrush(49, 201, 20, 60)))
         fcs_plot = gt_widget.plot(
             log_values, gt_values, pen=pg.mkPen(color="#31c914", width=2)
         )
         gt_widget.plotItem.getAxis("left").enableAutoSIPrefix(False)
         gt_widget.plotItem.getAxis("bottom").enableAutoSIPrefix(False)
         def format_power_of_ten(i):
-            if i < 0:
-                return "0"
-            else:
-                return "10" + "".join([UNICODE_SUP[c] for c in str(i)])
+            return "10" + "".join([UNICODE_SUP[c] for c in str(i)])
         ticks = [(i, format_power_of_ten(i)) for i in exponents_lin_space_int]
         axis = gt_widget.getAxis("bottom")
         axis.setTicks([ticks])
         gt_widget.setBackground("#141414")
+        app.gt_charts.append(gt_widget)
         app.gt_lines.append(fcs_plot)
         row, col = divmod(index, 2)
         app.layouts[GT_PLOTS_GRID].addWidget(gt_widget, row, col)
@@ -0,0 +1,235 @@
+import json
+import mmap
+import os
+import re
+import struct
+import numpy as np
+
+from components.helpers import calc_timestamp
+
+FCS2_ALIGNMENT = 8
+# Innermost JSON array (no nested brackets), e.g. the lag index or one G(τ) curve
+FCS1_LEAF_ARRAY = re.compile(rb"\[([^\[\]]*)\]")
+
+
+class FCSFile:
+    """
+    FCS2 layout: magic bytes "FCS2", the JSON header length (u32 LE) and the JSON header,
+    padded with spaces so that the arrays start 8-byte aligned. The header holds the usual
+    metadata plus a "layout" entry with the channel pairs, num_lags, num_curves and the
+    absolute byte offsets of:
+        - lag_index: u64 LE [num_lags], lags in μs (f64 LE when "lag_index_dtype" is "<f8",
+          e.g. the sub-μs lags of the time tagger correlations)
+        - g2: f64 LE [pairs, num_curves, num_lags], curve 0 is the mean, then one curve per acquisition
+    """
+
+    @staticmethod
+    def data_folder():
+        return os.path.join(os.environ["USERPROFILE"], ".flim-labs", "data")
+
+    @staticmethod
+    def write(metadata, lag_index, g2_correlations):
+        """
+        Write a G(τ) result as FCS2 (plus its .txt export) to the flim-labs data folder,
+        where the export actions pick up the most recent FCS file.
+
+        Args:
+            metadata: dict with enabled_channels, bin_width, acquisition_time, correlations, num_acquisitions, notes
+            lag_index: list of lags (μs)
+            g2_correlations: list of ((ch1, ch2), [mean, G1, G2...])
+
+        Returns:
+            list: paths of the .bin and .txt files
+        """
+        data_folder = FCSFile.data_folder()
+        os.makedirs(data_folder, exist_ok=True)
+        file_path = os.path.join(data_folder, f"fcs_{calc_timestamp()}.bin")
+        txt_file_path = file_path.replace(".bin", ".txt")
+        FCSFile.write_fcs2(file_path, metadata, lag_index, g2_correlations)
+        FCSFile.write_txt(txt_file_path, lag_index, g2_correlations)
+        return [file_path, txt_file_path]
+
+    @staticmethod
+    def write_fcs2(file_path, metadata, lag_index, g2_correlations):
+        lags = np.asarray(lag_index, dtype=np.float64)
+        lags = lags.astype("<u8") if np.all(lags == np.round(lags)) else lags.astype("<f8")
+        g2 = np.array(
+            [np.asarray(curves, dtype=np.float64) for _, curves in g2_correlations], dtype="<f8"
+        ).reshape(len(g2_correlations), -1, len(lags))
+        data_start = 0
+        while True:
+            header = dict(metadata)
+            header["layout"] = {
+                "pairs": [[int(ch) for ch in pair] for pair, _ in g2_correlations],
+                "num_lags": len(lags),
+                "lag_index_dtype": lags.dtype.str,
+                "num_curves": g2.shape[1],
+                "lag_index_offset": data_start,
+                "g2_offset": data_start + lags.nbytes,
+            }
+            header_bytes = json.dumps(header).encode("utf-8")
+            aligned_start = -(-(8 + len(header_bytes)) // FCS2_ALIGNMENT) * FCS2_ALIGNMENT
+            if aligned_start == data_start:
+                break
+            data_start = aligned_start
+        header_bytes = header_bytes.ljust(data_start - 8)
+        with open(file_path, "wb") as f:
+            f.write(b"FCS2")
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            f.write(lags.tobytes())
+            f.write(g2.tobytes())
+
+    @staticmethod
+    def read(file_path):
+        """
+        Read an FCS1 or FCS2 file.
+
+        Returns:
+            tuple: (metadata, lag_index, g2_correlations as [[ch1, ch2], [mean, G1, G2...]])
+        """
+        with open(file_path, "rb") as f:
+            magic = f.read(4)
+        if magic == b"FCS2":
+            return FCSFile.read_fcs2(file_path)
+        if magic == b"FCS1":
+            return FCSFile.read_fcs1(file_path)
+        raise ValueError(f"{file_path} is not an FCS file")
+
+    @staticmethod
+    def open(file_path):
+        """
+        Open an FCS1 or FCS2 file lazily: the curves of each pair are only decoded
+        (FCS1) or paged in (FCS2) when they are accessed.
+
+        Returns:
+            tuple: (metadata, lag_index, g2_correlations as [[ch1, ch2], [mean, G1, G2...]])
+        """
+        with open(file_path, "rb") as f:
+            magic = f.read(4)
+        if magic == b"FCS2":
+            return FCSFile.read_fcs2(file_path)
+        if magic == b"FCS1":
+            return FCSFile.read_fcs1(file_path, lazy=True)
+        raise ValueError(f"{file_path} is not an FCS file")
+
+    @staticmethod
+    def read_fcs1(file_path, lazy=False):
+        with open(file_path, "rb") as f:
+            f.seek(4)
+            (json_length,) = struct.unpack("I", f.read(4))
+            metadata = json.loads(f.read(json_length).decode("utf-8"))
+            (g2_json_length,) = struct.unpack("I", f.read(4))
+            g2_json_start = f.tell()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                skeleton, spans = FCSFile.index_fcs1_g2(mm, g2_json_start, g2_json_start + g2_json_length)
+                lag_index = FCSFile.parse_leaf_array(mm[slice(*spans[skeleton["lag_index"]])])
+                pairs = [
+                    FCSFile.parse_leaf_array(mm[slice(*spans[pair])]).astype(int).tolist()
+                    for pair, _ in skeleton["g2_correlations"]
+                ]
+                if not lazy:
+                    curves = [
+                        [FCSFile.parse_leaf_array(mm[slice(*spans[curve])]) for curve in pair_curves]
+                        for _, pair_curves in skeleton["g2_correlations"]
+                    ]
+        if lazy:
+            curves = [
+                FCSPairCurves(file_path, [spans[curve] for curve in pair_curves])
+                for _, pair_curves in skeleton["g2_correlations"]
+            ]
+        g2_correlations = [[pair, pair_curves] for pair, pair_curves in zip(pairs, curves)]
+        return metadata, lag_index.astype(np.int64).tolist(), g2_correlations
+
+    @staticmethod
+    def index_fcs1_g2(buffer, start, end):
+        """
+        Index the FCS1 g2 JSON without parsing any float: only the small skeleton
+        (nesting and keys) goes through json, with every innermost [...] array
+        replaced by its number.
+
+        Args:
+            buffer: bytes-like object (e.g. an mmap of the file)
+            start, end: byte range of the g2 JSON in buffer
+
+        Returns:
+            tuple: (skeleton, list of (start, end) byte ranges of the innermost arrays' values)
+        """
+        spans = []
+        skeleton = []
+        position = start
+        for match in FCS1_LEAF_ARRAY.finditer(buffer, start, end):
+            skeleton.append(buffer[position:match.start()])
+            skeleton.append(str(len(spans)).encode())
+            spans.append(match.span(1))
+            position = match.end()
+        skeleton.append(buffer[position:end])
+        return json.loads(b"".join(skeleton)), spans
+
+    @staticmethod
+    def parse_leaf_array(values):
+        # Missing values are written as null
+        values = values.replace(b"null", b"nan")
+        if not values.strip():
+            return np.empty(0)
+        return np.fromstring(values, dtype=np.float64, sep=",")
+
+    @staticmethod
+    def read_fcs2(file_path):
+        with open(file_path, "rb") as f:
+            f.seek(4)
+            (header_length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_length).decode("utf-8"))
+        layout = header.pop("layout")
+        pairs, num_lags, num_curves = layout["pairs"], layout["num_lags"], layout["num_curves"]
+        lag_index = np.memmap(
+            file_path, dtype=layout.get("lag_index_dtype", "<u8"), mode="r",
+            offset=layout["lag_index_offset"], shape=(num_lags,)
+        )
+        g2 = np.memmap(
+            file_path, dtype="<f8", mode="r", offset=layout["g2_offset"],
+            shape=(len(pairs), num_curves, num_lags),
+        )
+        g2_correlations = [[pair, g2[i]] for i, pair in enumerate(pairs)]
+        return header, lag_index.tolist(), g2_correlations
+
+    @staticmethod
+    def write_txt(file_path, lag_index, g2_correlations):
+        with open(file_path, "w") as f:
+            for pair, curves in g2_correlations:
+                f.write(f"Correlation {pair[0] + 1}-{pair[1] + 1}\n")
+                f.write("tau (us)\tG(tau)\n")
+                for lag, value in zip(lag_index, np.asarray(curves[0]).tolist()):
+                    f.write(f"{lag}\t{value}\n")
+                f.write("\n")
+
+
+class FCSPairCurves:
+    """
+    Curves of one channel pair of an FCS1 file ([mean, G1, G2...]), decoded from
+    their byte ranges the first time they are accessed.
+    """
+
+    def __init__(self, file_path, spans):
+        self.file_path = file_path
+        self.spans = spans
+        self._curves = {}
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index not in self._curves:
+            start, end = self.spans[index]
+            with open(self.file_path, "rb") as f:
+                f.seek(start)
+                self._curves[index] = FCSFile.parse_leaf_array(f.read(end - start))
+        return self._curves[index]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
@@ -1,11 +1,151 @@
+import json
 import os
 import re
+import shutil
+import sys
+import uuid
+
+from components.settings import (
+    ACQUISITION_FILES_MANIFEST,
+    DEFAULT_EXPORT_STRATEGY,
+    EXPORT_COPY_CHUNK_BYTES,
+)
+
+# Linux ioctl cloning a whole file (copy-on-write, e.g. Btrfs, XFS)
+FICLONE = 0x40049409
 current_path = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_path, '..'))
 
 class FileUtils:
+    # Append-only manifest of the files written by each acquisition (see register_acquisition_files),
+    # loaded once into {(type, acquisition_id): [paths]} and {type: last acquisition_id}
+    _manifest_index = None
+    _last_acquisitions = {}
+
+    @staticmethod
+    def data_folder():
+        return os.path.join(os.environ["USERPROFILE"], ".flim-labs", "data")
+
+    @staticmethod
+    def new_acquisition_id():
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def acquisition_file_type(file_path):
+        name = os.path.basename(file_path)
+        if name.startswith("intensity-tracing"):
+            return "intensity_tracing"
+        if name.startswith("time_tagger_intensity"):
+            return "time_tagger"
+        if name.startswith("fcs") and not ("calc" in name) and not ("intensity" in name):
+            if name.endswith(".bin"):
+                return "fcs"
+            if name.endswith(".txt"):
+                return "fcs_txt"
+        return None
+
+    @staticmethod
+    def files_written_since(file_types, since):
+        """
+        Files of file_types (see acquisition_file_type) in the data folder modified at or after
+        the since timestamp (time.time()), oldest first.
+        """
+        data_folder = FileUtils.data_folder()
+        files = []
+        for folder in (data_folder, os.path.join(data_folder, "fcs-intensity")):
+            if not os.path.exists(folder):
+                continue
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not entry.is_file() or FileUtils.acquisition_file_type(entry.name) not in file_types:
+                        continue
+                    mtime = entry.stat().st_mtime
+                    if mtime >= since:
+                        files.append((mtime, entry.path))
+        return [path for _, path in sorted(files)]
+
+    @staticmethod
+    def register_written_files(acquisition_id, file_types, file_paths, since):
+        """
+        Register the files an acquisition wrote: file_paths when the backend returned them,
+        otherwise the files of file_types written since the acquisition started (the flim_labs
+        results don't always carry the paths of the files written).
+        """
+        file_paths = [f for f in file_paths if f]
+        if not file_paths and since is not None:
+            file_paths = FileUtils.files_written_since(file_types, since)
+        return FileUtils.register_acquisition_files(acquisition_id, file_paths)
+
+    @staticmethod
+    def register_acquisition_files(acquisition_id, file_paths):
+        """
+        Append the files written by an acquisition (the paths returned by flim_labs or by the
+        post-processing) to the manifest, under acquisition_id. Files already registered are skipped.
+
+        Returns:
+            list: the registered entries
+        """
+        index = FileUtils.manifest_index()
+        entries = []
+        for f in file_paths:
+            file_type = FileUtils.acquisition_file_type(f) if f else None
+            if file_type is None or f in index.get((file_type, acquisition_id), []):
+                continue
+            entries.append({"acquisition_id": acquisition_id, "type": file_type, "path": f})
+        if not entries:
+            return entries
+        manifest_path = os.path.join(FileUtils.data_folder(), ACQUISITION_FILES_MANIFEST)
+        os.makedirs(FileUtils.data_folder(), exist_ok=True)
+        with open(manifest_path, "ab+") as f:
+            # Don't glue the new entries to a line cut by a crash while appending
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            for entry in entries:
+                f.write((json.dumps(entry) + "\n").encode("utf-8"))
+                FileUtils.index_entry(entry)
+        return entries
+
+    @staticmethod
+    def index_entry(entry):
+        key = (entry["type"], entry["acquisition_id"])
+        FileUtils._manifest_index.setdefault(key, []).append(entry["path"])
+        FileUtils._last_acquisitions[entry["type"]] = entry["acquisition_id"]
+
+    @staticmethod
+    def manifest_index():
+        if FileUtils._manifest_index is None:
+            FileUtils._manifest_index = {}
+            FileUtils._last_acquisitions = {}
+            manifest_path = os.path.join(FileUtils.data_folder(), ACQUISITION_FILES_MANIFEST)
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    for line in f:
+                        try:
+                            FileUtils.index_entry(json.loads(line))
+                        except (ValueError, KeyError):
+                            # Line cut by a crash while appending
+                            continue
+        return FileUtils._manifest_index
+
+    @staticmethod
+    def get_indexed_files(file_type, acquisition_id=None):
+        """
+        Files of file_type registered for acquisition_id (default: the last acquisition which wrote one),
+        oldest first. Files removed since then are skipped.
+        """
+        index = FileUtils.manifest_index()
+        if acquisition_id is None:
+            acquisition_id = FileUtils._last_acquisitions.get(file_type)
+        paths = index.get((file_type, acquisition_id), [])
+        return [path for path in paths if os.path.exists(path)]
+
     @staticmethod
-    def get_recent_n_intensity_tracing_files(num):
+    def get_recent_n_intensity_tracing_files(num, acquisition_id=None):
+        indexed_files = FileUtils.get_indexed_files("intensity_tracing", acquisition_id)
+        if indexed_files or acquisition_id is not None:
+            return indexed_files[::-1][:num]
         data_folder = os.path.join(os.environ["USERPROFILE"], ".flim-labs", "data", "fcs-intensity")
         if not os.path.exists(data_folder):
             return []
@@ -14,7 +154,10 @@ class FileUtils:
         return [os.path.join(data_folder, f) for f in files[:num]]
     
     @staticmethod
-    def get_recent_fcs_file(extension=".bin"):
+    def get_recent_fcs_file(extension=".bin", acquisition_id=None):
+        indexed_files = FileUtils.get_indexed_files("fcs" if extension == ".bin" else "fcs_txt", acquisition_id)
+        if indexed_files or acquisition_id is not None:
+            return indexed_files[-1] if indexed_files else None
         data_folder = os.path.join(os.environ["USERPROFILE"], ".flim-labs", "data")
         files = [
             f
@@ -29,7 +172,10 @@ class FileUtils:
     
     
     @staticmethod   
-    def get_recent_time_tagger_file():
+    def get_recent_time_tagger_file(acquisition_id=None):
+        indexed_files = FileUtils.get_indexed_files("time_tagger", acquisition_id)
+        if indexed_files or acquisition_id is not None:
+            return indexed_files[-1] if indexed_files else None
         data_folder = os.path.join(os.environ["USERPROFILE"], ".flim-labs", "data")
         files = [
             f
@@ -41,6 +187,85 @@ class FileUtils:
         )
         return os.path.join(data_folder, files[0])       
     
+    @staticmethod
+    def export_file(source_path, destination_path, strategy=DEFAULT_EXPORT_STRATEGY, progress_callback=None):
+        """
+        Write source_path to destination_path without copying the data when possible.
+
+        Args:
+            strategy: "auto" (reflink, else copy), "reflink", "hardlink" (both paths share the
+                same data), "move" (the source file is removed) or "copy"
+            progress_callback: called with (bytes copied, total bytes) when the data is copied
+
+        Returns:
+            str: the method actually used
+        """
+        if os.path.exists(destination_path):
+            os.remove(destination_path)
+        if strategy == "move":
+            try:
+                os.replace(source_path, destination_path)
+                return "move"
+            except OSError:
+                # Another filesystem: copy, then remove the source
+                FileUtils.copy_file_chunked(source_path, destination_path, progress_callback)
+                os.remove(source_path)
+                return "copy"
+        if strategy in ("auto", "reflink") and FileUtils.reflink(source_path, destination_path):
+            return "reflink"
+        if strategy == "hardlink" and FileUtils.same_filesystem(source_path, destination_path):
+            try:
+                os.link(source_path, destination_path)
+                return "hardlink"
+            except OSError:
+                pass
+        FileUtils.copy_file_chunked(source_path, destination_path, progress_callback)
+        return "copy"
+
+    @staticmethod
+    def same_filesystem(source_path, destination_path):
+        destination_dir = os.path.dirname(os.path.abspath(destination_path))
+        return os.stat(source_path).st_dev == os.stat(destination_dir).st_dev
+
+    @staticmethod
+    def reflink(source_path, destination_path):
+        """Clone the file (copy-on-write) where the OS and filesystem support it."""
+        try:
+            if sys.platform.startswith("linux"):
+                import fcntl
+
+                with open(source_path, "rb") as source, open(destination_path, "wb") as destination:
+                    fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+                return True
+            if sys.platform == "darwin":
+                import ctypes
+
+                libc = ctypes.CDLL("libc.dylib", use_errno=True)
+                return libc.clonefile(os.fsencode(source_path), os.fsencode(destination_path), 0) == 0
+        except (OSError, AttributeError):
+            if os.path.exists(destination_path):
+                os.remove(destination_path)
+        return False
+
+    @staticmethod
+    def copy_file_chunked(source_path, destination_path, progress_callback=None):
+        if progress_callback is None:
+            # Uses the OS fast copy (sendfile, fcopyfile, CopyFile2)
+            shutil.copyfile(source_path, destination_path)
+            return
+        total = os.path.getsize(source_path)
+        copied = 0
+        buffer = bytearray(EXPORT_COPY_CHUNK_BYTES)
+        view = memoryview(buffer)
+        with open(source_path, "rb") as source, open(destination_path, "wb") as destination:
+            while True:
+                size = source.readinto(buffer)
+                if not size:
+                    break
+                destination.write(view[:size])
+                copied += size
+                progress_callback(copied, total)
+
     @staticmethod
     def clean_filename(filename):
         # Keep only letters, numbers and underscores
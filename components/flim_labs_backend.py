@@ -0,0 +1,34 @@
+import os
+from PyQt6.QtCore import QSettings
+
+from components.settings import (
+    DEFAULT_FLIM_LABS_BACKEND,
+    FLIM_LABS_BACKEND_ENV,
+    SETTINGS_FLIM_LABS_BACKEND,
+)
+
+
+def selected_backend():
+    backend = os.environ.get(FLIM_LABS_BACKEND_ENV)
+    if not backend:
+        settings = QSettings("settings.ini", QSettings.Format.IniFormat)
+        backend = settings.value(SETTINGS_FLIM_LABS_BACKEND, DEFAULT_FLIM_LABS_BACKEND)
+    return str(backend).lower()
+
+
+def load_backend():
+    """
+    Returns:
+        module: the flim_labs extension, or the simulated card when the "simulated" backend is selected
+    """
+    if selected_backend() == "simulated":
+        from components import flim_labs_simulator
+
+        return flim_labs_simulator
+    import flim_labs
+
+    return flim_labs
+
+
+# Import flim_labs from here: "from components.flim_labs_backend import flim_labs"
+flim_labs = load_backend()
@@ -0,0 +1,334 @@
+"""
+Simulated flim_labs card, with the same functions as the flim_labs extension used by the app:
+intensity tracing with the live queue, the files written to the flim-labs data folder
+(intensity tracing, time tagger and FCS files) and the FCS calculation.
+Photon counts are Poisson distributed around an intensity fluctuating like molecules diffusing
+through the focal volume (see SimulatedAcquisition), or replayed from a recorded intensity
+tracing file ("replay_file" of the configuration). Select it with FLIM_LABS_BACKEND=simulated.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+from types import SimpleNamespace
+import numpy as np
+
+from components.correlator import CorrelationResult, RunningG2Average, correlate_pair, lag_index_bins
+from components.fcs_file import FCSFile
+from components.helpers import calc_timestamp
+from components.intensity_tracing_file import IntensityTracingFile
+from components.settings import FLIM_LABS_SIMULATOR_ENV, SIMULATOR_DEFAULT_CONFIG
+from components.time_tagger_file import TimeTaggerFile
+
+# Number of exponentials approximating each diffusion correlation curve
+DIFFUSION_QUADRATURE_POINTS = 6
+# Bins generated per time tagger chunk
+TIME_TAGGER_CHUNK_BINS = 1_000_000
+
+
+def simulator_config():
+    config = dict(SIMULATOR_DEFAULT_CONFIG)
+    config.update(json.loads(os.environ.get(FLIM_LABS_SIMULATOR_ENV) or "{}"))
+    return config
+
+
+def data_folder():
+    return os.path.join(os.environ["USERPROFILE"], ".flim-labs", "data")
+
+
+def realtime_window_micros(num_channels):
+    # Bins summed in each queue item, as by the card (see IntensityTracing.get_realtime_adjustment_value)
+    return 50_000 * min(max(num_channels, 1), 4)
+
+
+class SimulatedAcquisition(threading.Thread):
+    """
+    Generates the bins of one intensity tracing acquisition, pushes them to the queue (summed
+    over the same windows as the card) and writes them to an IT02 file.
+    The intensity seen by all channels is rate * (1 + x(t)), where x is a sum of AR(1)
+    (exponentially correlated) processes: with the weights and rates of a Gauss-Laguerre
+    quadrature, each species gives G(τ) ≈ amplitude / (1 + τ / diffusion time) (2D diffusion).
+    """
+
+    def __init__(self, enabled_channels, bin_width_micros, acquisition_time_millis, file_path, config):
+        super().__init__(daemon=True)
+        self.enabled_channels = list(enabled_channels)
+        self.bin_width_micros = max(int(bin_width_micros), 1)
+        self.acquisition_time_millis = acquisition_time_millis
+        self.file_path = file_path
+        self.speed = float(config["speed"])
+        self.rates = np.broadcast_to(
+            np.asarray(config["count_rate_cps"], dtype=np.float64), (len(self.enabled_channels),)
+        )
+        self.rng = np.random.default_rng(config["seed"])
+        self.items = []
+        self.lock = threading.Lock()
+        self.stop_requested = False
+        nodes, weights = np.polynomial.laguerre.laggauss(DIFFUSION_QUADRATURE_POINTS)
+        bin_width_s = self.bin_width_micros / 1e6
+        self.decays = []
+        self.scales = []
+        for species in config["diffusion"]:
+            decay_times_s = species["diffusion_time_us"] / 1e6 / nodes
+            self.decays.extend(np.exp(-bin_width_s / decay_times_s))
+            self.scales.extend(np.sqrt(species["amplitude"] * weights))
+        self.state = np.zeros(len(self.decays))
+        # Counts replayed from a recorded intensity tracing file instead of the diffusion model
+        self.replay_counts = None
+        self.replay_position = 0
+        if config.get("replay_file"):
+            replay_counts = IntensityTracingFile(config["replay_file"]).records["counts"]
+            if len(replay_counts) > 0:
+                self.replay_counts = replay_counts
+
+    def pull(self):
+        with self.lock:
+            items, self.items = self.items, []
+        return items
+
+    def run(self):
+        window_bins = max(realtime_window_micros(len(self.enabled_channels)) // self.bin_width_micros, 1)
+        total_bins = (
+            None
+            if self.acquisition_time_millis is None
+            else int(self.acquisition_time_millis * 1000 // self.bin_width_micros)
+        )
+        dtype = IntensityTracingFile.record_dtype(len(self.enabled_channels))
+        header = json.dumps(
+            {"channels": self.enabled_channels, "bin_width_micros": self.bin_width_micros}
+        ).encode("utf-8")
+        start_wall_time = time.perf_counter()
+        first_bin = 0
+        with open(self.file_path, "wb") as f:
+            f.write(b"IT02")
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            while not self.stop_requested and (total_bins is None or first_bin < total_bins):
+                num_bins = window_bins if total_bins is None else min(window_bins, total_bins - first_bin)
+                counts = self.generate_counts(num_bins)
+                records = np.empty(num_bins, dtype=dtype)
+                records["time"] = (first_bin + 1 + np.arange(num_bins)) * self.bin_width_micros * 1000.0
+                records["counts"] = counts
+                f.write(records.tobytes())
+                first_bin += num_bins
+                item_counts = np.zeros(max(max(self.enabled_channels) + 1, 8))
+                item_counts[self.enabled_channels] = counts.sum(axis=0)
+                with self.lock:
+                    self.items.append(((records["time"][-1],), tuple(item_counts)))
+                if self.speed > 0:
+                    elapsed_s = first_bin * self.bin_width_micros / 1e6 / self.speed
+                    delay = start_wall_time + elapsed_s - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+        with self.lock:
+            self.items.append(("end",))
+
+    def generate_counts(self, num_bins):
+        if self.replay_counts is not None:
+            return self.replay_next(num_bins)
+        fluctuation = np.zeros(num_bins)
+        for i, (decay, scale) in enumerate(zip(self.decays, self.scales)):
+            process = ar1_process(self.rng.standard_normal(num_bins), decay, self.state[i])
+            self.state[i] = process[-1]
+            fluctuation += scale * process
+        intensity = np.maximum(1 + fluctuation, 0)
+        expected = np.outer(intensity, self.rates * self.bin_width_micros / 1e6)
+        return self.rng.poisson(expected).astype(np.uint32)
+
+
+    def replay_next(self, num_bins):
+        # Recorded bins in a loop; enabled channel i gets column i of the file (modulo its channels)
+        rows = (self.replay_position + np.arange(num_bins)) % len(self.replay_counts)
+        self.replay_position = (self.replay_position + num_bins) % len(self.replay_counts)
+        columns = np.arange(len(self.enabled_channels)) % self.replay_counts.shape[1]
+        return np.asarray(self.replay_counts[rows][:, columns], dtype=np.uint32)
+
+
+def ar1_process(noise, decay, initial):
+    """
+    x[k] = decay * x[k - 1] + sqrt(1 - decay²) * noise[k], vectorized by blocks short enough
+    for the powers of decay not to overflow.
+    """
+    if decay <= 0:
+        return noise.copy()
+    block = int(max(1, min(len(noise), 30 / max(-np.log(decay), 1e-12))))
+    gain = np.sqrt(1 - decay**2)
+    result = np.empty_like(noise)
+    previous = initial
+    for start in range(0, len(noise), block):
+        chunk = noise[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        result[start:start + len(chunk)] = powers * (previous + gain * np.cumsum(chunk / powers))
+        previous = result[start + len(chunk) - 1]
+    return result
+
+
+class SimulatedCard:
+    def __init__(self):
+        self.acquisition = None
+        self.intensity_files = []
+        self.fcs_stop_requested = False
+        self.fcs_average = None
+        self.fcs_lag_index = None
+        self.fcs_metadata = None
+        self.fcs_calls = 0
+
+
+_card = SimulatedCard()
+
+
+def get_version():
+    return "simulated"
+
+
+def check_card():
+    return "SIMULATED"
+
+
+def detect_channels_connections():
+    channels = list(range(simulator_config()["num_channels"]))
+    return SimpleNamespace(
+        sma_channels=[],
+        usb_channels=channels,
+        sma_frame=False,
+        usb_frame=False,
+        sma_line=False,
+        usb_line=False,
+        sma_pixel=False,
+        usb_pixel=False,
+        sma_laser_sync_in=False,
+        usb_laser_sync_in=False,
+        usb_laser_sync_out=False,
+    )
+
+
+def start_intensity_tracing(
+    enabled_channels,
+    bin_width_micros,
+    write_bin=False,
+    time_tagger=False,
+    write_data=True,
+    acquisition_time_millis=None,
+    firmware_file=None,
+):
+    if len(enabled_channels) == 0:
+        raise ValueError("No channels enabled")
+    if _card.acquisition is not None and _card.acquisition.is_alive():
+        _card.acquisition.stop_requested = True
+        _card.acquisition.join()
+    folder = os.path.join(data_folder(), "fcs-intensity")
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, f"intensity-tracing_{calc_timestamp()}_{len(_card.intensity_files)}.bin")
+    config = simulator_config()
+    if config["seed"] is not None:
+        # Reproducible, but a different sample for each acquisition
+        config["seed"] += len(_card.intensity_files)
+    _card.acquisition = SimulatedAcquisition(
+        enabled_channels, bin_width_micros, acquisition_time_millis, file_path, config
+    )
+    _card.intensity_files.append(file_path)
+    _card.acquisition.start()
+    return SimpleNamespace(bin_file="", data_file=file_path)
+
+
+def pull_from_queue():
+    if _card.acquisition is None:
+        return []
+    return _card.acquisition.pull()
+
+
+def request_stop():
+    if _card.acquisition is not None:
+        _card.acquisition.stop_requested = True
+        _card.acquisition.join()
+
+
+def intensity_time_tagger(bin_width_micros, enabled_channels):
+    """Writes the photon arrival times of the last acquisition as a time tagger (ITT1) file."""
+    if not _card.intensity_files:
+        raise ValueError("No acquisition to process")
+    intensity_file = IntensityTracingFile(_card.intensity_files[-1])
+    rng = np.random.default_rng(simulator_config()["seed"])
+    header = json.dumps(
+        {"channels": intensity_file.channels, "laser_period_ns": simulator_config()["laser_period_ns"]}
+    ).encode("utf-8")
+    bin_width_ns = intensity_file.header["bin_width_micros"] * 1000.0
+    file_path = os.path.join(data_folder(), f"time_tagger_intensity_{calc_timestamp()}.bin")
+    with open(file_path, "wb") as f:
+        f.write(b"ITT1")
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for start in range(0, len(intensity_file), TIME_TAGGER_CHUNK_BINS):
+            records = np.asarray(intensity_file.records[start:start + TIME_TAGGER_CHUNK_BINS])
+            counts = records["counts"]
+            # One event per photon, uniformly placed in its bin (bin times are bin ends)
+            photons = np.repeat(np.arange(counts.size), counts.ravel())
+            bin_index, channel_index = np.divmod(photons, counts.shape[1])
+            events = np.empty(len(photons), dtype=TimeTaggerFile.RECORD_DTYPE)
+            events["event"] = np.asarray(intensity_file.channels)[channel_index]
+            events["time"] = records["time"][bin_index] - bin_width_ns * rng.random(len(photons))
+            # Bins follow each other, so sorting the chunk keeps every channel time ordered
+            f.write(events[np.argsort(events["time"], kind="stable")].tobytes())
+    return file_path
+
+
+def reset_fcs_stop():
+    _card.fcs_stop_requested = False
+
+
+def request_fcs_stop():
+    _card.fcs_stop_requested = True
+
+
+def fluorescence_correlation_spectroscopy(
+    num_acquisitions,
+    correlations,
+    enabled_channels,
+    bin_width,
+    acquisition_time,
+    export_fcs=True,
+    export_intensity_tracing=True,
+    notes="",
+    tau_high_density=False,
+    use_fft_correlation=False,
+):
+    """Correlates the next of the last num_acquisitions acquisitions (oldest first), as the card does."""
+    if _card.fcs_average is None or _card.fcs_calls >= num_acquisitions:
+        _card.fcs_average = RunningG2Average(correlations)
+        _card.fcs_calls = 0
+        _card.fcs_metadata = {
+            "enabled_channels": enabled_channels,
+            "bin_width": bin_width,
+            "acquisition_time": acquisition_time,
+            "correlations": [list(pair) for pair in correlations],
+            "num_acquisitions": num_acquisitions,
+            "notes": notes,
+            "export_fcs": export_fcs,
+        }
+    files = _card.intensity_files[-num_acquisitions:]
+    if _card.fcs_calls >= len(files):
+        raise ValueError("Not enough acquisitions")
+    _, _, intensities = IntensityTracingFile.read(files[_card.fcs_calls])
+    data_length = min(len(counts) for counts in intensities.values())
+    lag_index, lags = lag_index_bins(bin_width, tau_high_density, data_length)
+    for ch1, ch2 in correlations:
+        if _card.fcs_stop_requested:
+            return
+        curve = correlate_pair(intensities[ch1], intensities[ch2], lags, use_fft_correlation)
+        _card.fcs_average.update((ch1, ch2), _card.fcs_calls, curve)
+    _card.fcs_lag_index = lag_index
+    _card.fcs_calls += 1
+
+
+def average_fluorescence_correlation_spectroscopy(num_acquisitions):
+    if _card.fcs_average is None or _card.fcs_calls < num_acquisitions:
+        raise ValueError("FCS not computed for all the acquisitions")
+    result = _card.fcs_average.result(_card.fcs_lag_index)
+    metadata = dict(_card.fcs_metadata)
+    file_paths = []
+    if metadata.pop("export_fcs"):
+        file_paths = FCSFile.write(metadata, result.lag_index, result.g2_correlations)
+    _card.fcs_average = None
+    return CorrelationResult(result.lag_index, result.g2_correlations, file_paths=file_paths)
@@ -11,16 +11,36 @@ def calculate_lag_index_length(bin_width=10, tau_high_density=False):
     Returns:
         int: The length of the lag index vector
     """
-    bin_width_rounded = int(bin_width)
+    return len(calculate_lag_index(bin_width, tau_high_density))
+
+
+def calculate_lag_index(bin_width=10, tau_high_density=False):
+    """
+    Calculate the lag index (tau values in microseconds) based on backend Rust implementation.
+    
+    Args:
+        bin_width: The bin width in microseconds (schedules of the backend for 1, 10, 100 and 1000,
+            the 1 µs schedule rounded to multiples of the bin width otherwise)
+        tau_high_density: True for high density, False for low density
     
+    Returns:
+        list: The sorted lag index vector
+    """
+    bin_width_rounded = max(int(bin_width), 1)
+
+    if bin_width_rounded not in (1, 10, 100, 1000):
+        # Other widths (e.g. rebinned data): the 1 µs schedule mapped to multiples of the bin width
+        lag_index = calculate_lag_index(1, tau_high_density)
+        return sorted({(x // bin_width_rounded) * bin_width_rounded for x in lag_index})
+
     if tau_high_density:
-        return _calculate_dense_lag_index_length(bin_width_rounded)
+        return sorted(_dense_lag_index_values(bin_width_rounded))
     else:
-        return _calculate_standard_lag_index_length(bin_width_rounded)
+        return sorted(_standard_lag_index_values(bin_width_rounded))
 
 
-def _calculate_standard_lag_index_length(bin_width):
-    """Calculate length for standard (low density) lag index - matches Rust backend exactly"""
+def _standard_lag_index_values(bin_width):
+    """Standard (low density) lag index values - matches Rust backend exactly"""
     values = set()  # Use set to automatically handle duplicates
     
     if bin_width == 1:
@@ -71,14 +91,12 @@ def _calculate_standard_lag_index_length(bin_width):
         # logspace(1_000_000, 60_000_000, 99) mapped to multiples of 1000
         log_values = _logspace(1_000_000, 60_000_000, 99)
         values.update((x // 1000) * 1000 for x in log_values)
-    else:
-        values.update(range(0, 120))
-    
-    return len(values)
 
+    return values
 
-def _calculate_dense_lag_index_length(bin_width):
-    """Calculate length for dense (high density) lag index - matches Rust backend exactly"""
+
+def _dense_lag_index_values(bin_width):
+    """Dense (high density) lag index values - matches Rust backend exactly"""
     values = set()  # Use set to automatically handle duplicates
     
     if bin_width == 1:
@@ -131,10 +149,8 @@ def _calculate_dense_lag_index_length(bin_width):
         # logspace(1_000_000, 60_000_000, 99) mapped to multiples of 1000
         log_values = _logspace(1_000_000, 60_000_000, 99)
         values.update((x // 1000) * 1000 for x in log_values)
-    else:
-        values.update(range(0, 120))
-    
-    return len(values)
+
+    return values
 
 
 def _linspace(start, end, num):
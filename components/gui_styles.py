@@ -438,6 +438,8 @@ class GUIStyles:
             QPushButton:checked {{
                 background-color: transparent;
                 color: white;
+                border-bottom: 1px solid #FB8C00;
+                border-radius: 0;
             }}
 
             QPushButton#realtime_btn{{
@@ -445,12 +447,7 @@ class GUIStyles:
 
             }}
             QPushButton#post_processing_btn{{ 
-                border-bottom: 1px solid #FB8C00;
-                border-radius: 0;
                 min-width: 120px; 
-                background-color: transparent;
-                color: white;  
-                
             }}
         """
 
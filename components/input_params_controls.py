@@ -17,6 +17,7 @@ class InputParamsControls(QWidget):
         self.create_bin_width_control(layout)
         self.create_tau_scale_control(layout)
         self.create_fcs_algorithm_control(layout)
+        self.create_fcs_engine_control(layout)
         running_mode_control = self.create_running_mode_control()
         layout.addLayout(running_mode_control)
         layout.addSpacing(15)
@@ -154,6 +155,15 @@ class InputParamsControls(QWidget):
             options,
         )
         self.app.control_inputs["fcs_algorithm"] = inp 
+
+    def create_fcs_engine_control(self, layout):
+        inp = ControlsBarBuilder.create_fcs_engine_control(
+            layout,
+            FCS_ENGINE_LABELS.get(self.app.fcs_engine, self.app.fcs_engine),
+            self.fcs_engine_value_change,
+            [FCS_ENGINE_LABELS[engine] for engine in FCS_ENGINES],
+        )
+        self.app.control_inputs[SETTINGS_FCS_ENGINE] = inp
         
 
     def tau_scale_value_change(self, idx):
@@ -167,5 +177,9 @@ class InputParamsControls(QWidget):
         options = self.app.fcs_algorithms
         self.app.fcs_algorithm = options[idx]
         self.app.settings.setValue(SETTINGS_FCS_ALGORITHM, self.app.fcs_algorithm)
+
+    def fcs_engine_value_change(self, idx):
+        self.app.fcs_engine = FCS_ENGINES[idx]
+        self.app.settings.setValue(SETTINGS_FCS_ENGINE, self.app.fcs_engine)
           
         # DataExportActions.calc_exported_file_size(self.app)
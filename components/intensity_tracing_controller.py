@@ -1,16 +1,21 @@
 import time
 import numpy as np
 import pyqtgraph as pg
-from flim_labs import flim_labs
+from components.flim_labs_backend import flim_labs
 from components.animations import VibrantAnimation
 from components.check_card import CheckCard
-from components.fcs_controller import FCSPostProcessing
+from components.fcs_controller import FCSPostProcessing, FCSRealtime
+from components.file_utilities import FileUtils
 from components.box_message import BoxMessage
 from components.format_utilities import FormatUtils
 from components.layout_utilities import create_gt_loading_layout, create_gt_wait_layout, insert_widget, remove_widget
 from components.messages_utilities import MessagesUtilities
 from components.gui_styles import GUIStyles
 from components.channel_name_utils import get_channel_name
+from components.cps_engine import CPSEngine
+from components.diagnostics import Diagnostics, TimedPlotWidget
+from components.ring_buffer import IntensityRingBuffer
+from components.acquisition_consumer import AcquisitionConsumer, AcquisitionStore
 from components.settings import *
 from PyQt6.QtWidgets import (
     QApplication,
@@ -78,8 +83,10 @@ class IntensityTracing:
             file_bin = result.bin_file
             if file_bin != "":
                 print("File bin written in: " + str(file_bin))
+            app.intensity_data_file = getattr(result, "data_file", "")
             app.blank_space.hide()
-            app.pull_from_queue_timer.start(1)
+            IntensityTracing.start_queue_consumer(app)
+            app.pull_from_queue_timer.start(int(1000 / app.live_plots_fps))
         except Exception as e:
             CheckCard.check_card_connection(app)
             error_title, error_msg = MessagesUtilities.error_handler(str(e))
@@ -93,24 +100,57 @@ class IntensityTracing:
 
 
     @staticmethod
+    def start_queue_consumer(app):
+        app.acquisition_store = AcquisitionStore()
+        app.acquisition_consumer = AcquisitionConsumer(app.acquisition_store)
+        app.acquisition_consumer.start()
+
+    @staticmethod
+    def stop_queue_consumer(app):
+        app.pull_from_queue_timer.stop()
+        consumer = app.acquisition_consumer
+        if consumer is not None:
+            consumer.stop()
+            consumer.wait()
+            app.acquisition_consumer = None
+            # Items drained after the last render tick still count for CPS and the realtime G(τ)
+            IntensityTracing.drain_store(app, force_refresh=True)
+        FCSRealtime.pause(app)
+
+    @staticmethod
+    def drain_store(app, force_refresh=False):
+        """
+        Process everything the consumer thread drained since the last call.
+
+        Returns:
+            bool: True if the end of the acquisition was reached
+        """
+        if app.acquisition_store is None:
+            return False
+        times_ns, counts, ended = app.acquisition_store.swap()
+        if times_ns is not None:
+            IntensityTracing.process_data(app, times_ns, counts)
+            FCSRealtime.update(app, counts)
+            IntensityTracing.update_acquisition_countdowns(app, times_ns[-1])
+            app.last_acquisition_ns = times_ns[-1]
+            IntensityTracingPlot.refresh_plots(app, force=force_refresh or ended)
+        return ended
+
+    @staticmethod
+    @Diagnostics.timed("render_frame")
     def pull_from_queue(app):
-        val = flim_labs.pull_from_queue()
-        if len(val) > 0:
-            for v in val:
-                if v == ('end',):  # End of acquisition
-                    print("Got end of acquisition, stopping")
-                    IntensityTracing.stop_button_pressed(app)
-                    if app.acquisitions_count < app.selected_average:
-                        time.sleep(0.20)
-                        IntensityTracingButtonsActions.start_button_pressed(app)
-                    else:
-                        app.control_inputs[START_BUTTON].setEnabled(len(app.enabled_channels) > 0)     
-                    break       
-                    
-                ((time_ns), (intensities)) = v
-                IntensityTracing.process_data(app, time_ns[0], intensities)
-                IntensityTracing.update_acquisition_countdowns(app, time_ns[0])
-                app.last_acquisition_ns = time_ns[0]
+        # Render tick: sample what the consumer thread drained since the last frame
+        if app.acquisition_store is None:
+            return
+        ended = IntensityTracing.drain_store(app)
+        if ended:  # End of acquisition
+            print("Got end of acquisition, stopping")
+            IntensityTracing.stop_button_pressed(app)
+            if app.acquisitions_count < app.selected_average:
+                time.sleep(0.20)
+                IntensityTracingButtonsActions.start_button_pressed(app)
+            else:
+                app.control_inputs[START_BUTTON].setEnabled(len(app.enabled_channels) > 0)
                 
                 
     @staticmethod
@@ -128,44 +168,38 @@ class IntensityTracing:
  
    
     @staticmethod
-    def process_data(app, time_ns, counts):
+    @Diagnostics.timed("process_data")
+    def process_data(app, times_ns, counts):
         enabled_channels = app.enabled_channels
         adjustment = IntensityTracing.get_realtime_adjustment_value(enabled_channels) / app.bin_width_micros
-        for channel, cps in app.cps_ch.items():
-            IntensityTracing.update_cps(app, time_ns, counts, channel)
-        for i, channel in enumerate(app.intensity_plots_to_show):
-            intensity = counts[channel] / adjustment
-            IntensityTracingPlot.update_plots2(channel, i, time_ns, intensity, app) 
+        IntensityTracing.update_cps(app, times_ns, counts)
+        times_s = times_ns / 1_000_000_000
+        for channel in app.intensity_plots_to_show:
+            if channel in app.intensity_lines:
+                intensity_buffer = IntensityTracingPlot.get_intensity_buffer(app, channel)
+                intensity_buffer.extend(times_s, counts[:, channel] / adjustment)
             
 
     @staticmethod
-    def update_cps(app, time_ns, counts, channel_index):
-        if not (channel_index in app.cps_counts):
+    @Diagnostics.timed("update_cps")
+    def update_cps(app, times_ns, counts):
+        engine = app.cps_engine
+        if engine is None or not engine.update(times_ns, counts):
             return
-        cps = app.cps_counts[channel_index]
-        if cps["last_time_ns"] == 0:
-            cps["last_time_ns"] = time_ns
-            cps["last_count"] = counts[channel_index]
-            cps["current_count"] = counts[channel_index]
-            return
-        cps["current_count"] = cps["current_count"] + + counts[channel_index]
-        time_elapsed = time_ns - cps["last_time_ns"]
-        if time_elapsed > 330_000_000:
-            cps_value = (cps["current_count"] - cps["last_count"]) / (
-                time_elapsed / 1_000_000_000
-            )
-            humanized_number = FormatUtils.format_cps(cps_value) + " CPS"
-            app.cps_ch[channel_index].setText(humanized_number)
-            cps_threshold = app.control_inputs[SETTINGS_CPS_THRESHOLD].value()
-            if cps_threshold > 0:
-                if cps_value > cps_threshold:
-                    if channel_index in app.cps_widgets_animation:
-                        app.cps_widgets_animation[channel_index].start()
-                else:
-                    if channel_index in app.cps_widgets_animation:
-                        app.cps_widgets_animation[channel_index].stop()
-            cps["last_time_ns"] = time_ns
-            cps["last_count"] = cps["current_count"] 
+        for channel_index, cps_value in zip(engine.channels, engine.window_rates):
+            if channel_index in app.cps_ch:
+                humanized_number = FormatUtils.format_cps(cps_value) + " CPS"
+                if app.cps_ch[channel_index].text() != humanized_number:
+                    app.cps_ch[channel_index].setText(humanized_number)
+        changed, above = engine.threshold_changes(app.cps_threshold)
+        for index, is_above in zip(changed, above):
+            animation = app.cps_widgets_animation.get(engine.channels[index])
+            if animation is None:
+                continue
+            if is_above:
+                animation.start()
+            else:
+                animation.stop()
             
             
     @staticmethod        
@@ -186,11 +220,15 @@ class IntensityTracing:
 
     @staticmethod    
     def stop_button_pressed(app, app_close = False):
-        app.pull_from_queue_timer.stop() 
+        IntensityTracing.stop_queue_consumer(app) 
         try:
             flim_labs.request_stop()
         except Exception as e:
             pass 
+        # The intensity tracing file of the acquisition which just ended
+        FileUtils.register_written_files(
+            app.acquisition_id, ("intensity_tracing",), [app.intensity_data_file], app.acquisition_start_time
+        )
         def clear_cps_and_countdown_widgets():
                 for _, animation in app.cps_widgets_animation.items():
                     if animation:
@@ -202,16 +240,20 @@ class IntensityTracing:
             app.acquisitions_count = app.acquisitions_count + 1
         app.widgets[ACQUISITION_PROGRESS_BAR_WIDGET].update_acquisitions_count()
         app.control_inputs[STOP_BUTTON].setEnabled(False)
-        app.cps_counts.clear()
+        app.cps_engine = None
         free_running = app.free_running_acquisition_time
         if not app_close and ((app.acquisitions_count == app.selected_average) or free_running): 
             QTimer.singleShot(400, clear_cps_and_countdown_widgets)
-            app.cps_widgets_animation.clear()                 
-            remove_widget(app.layouts[PLOT_GRIDS_CONTAINER], app.widgets[GT_WIDGET_WRAPPER])
-            gt_widget = create_gt_loading_layout(app)
-            insert_widget(app.layouts[PLOT_GRIDS_CONTAINER], gt_widget, 1)  
+            app.cps_widgets_animation.clear()
+            # Realtime G(τ) plots stay visible until the post-processing results replace them
+            if app.realtime_correlator is None:
+                remove_widget(app.layouts[PLOT_GRIDS_CONTAINER], app.widgets[GT_WIDGET_WRAPPER])
+                gt_widget = create_gt_loading_layout(app)
+                insert_widget(app.layouts[PLOT_GRIDS_CONTAINER], gt_widget, 1)
+            FCSRealtime.stop(app)  
         QApplication.processEvents()
         app.intensity_lines.clear()
+        app.intensity_buffers.clear()
         if not app_close:
             if app.acquisitions_count == app.selected_average:
                 if ABORT_BUTTON in app.control_inputs:
@@ -253,16 +295,25 @@ class IntensityTracingButtonsActions:
         if ABORT_BUTTON in app.control_inputs:
             app.control_inputs[ABORT_BUTTON].setEnabled(not free_running)
         app.last_acquisition_ns = 0
-        app.gt_charts.clear()
-        if app.acquisitions_count == app.selected_average or app.acquisitions_count == 0:    
+        first_acquisition = app.acquisitions_count == app.selected_average or app.acquisitions_count == 0
+        if first_acquisition:    
+            app.acquisition_id = FileUtils.new_acquisition_id()
+            app.acquisition_start_time = time.time()
+            FCSRealtime.stop(app)
             remove_widget(app.layouts[PLOT_GRIDS_CONTAINER], app.widgets[GT_WIDGET_WRAPPER])      
             gt_widget = create_gt_wait_layout(app)
             insert_widget(app.layouts[PLOT_GRIDS_CONTAINER], gt_widget, 1)    
-        app.gt_lines.clear()    
+        if app.realtime_correlator is None:
+            app.gt_charts.clear()
+            app.gt_lines.clear()    
         QApplication.processEvents()     
         IntensityTracingButtonsActions.intensity_tracing_start(app)
         if not app.widgets[GT_WIDGET_WRAPPER].isVisible():
             IntensityTracingButtonsActions.show_gt_widget(app, True) 
+        if first_acquisition:
+            FCSRealtime.start(app)
+        else:
+            FCSRealtime.resume(app)
         IntensityTracing.start_photons_tracing(app)
         
     
@@ -274,12 +325,7 @@ class IntensityTracingButtonsActions:
             else:    
                 only_cps_widgets = [item for item in app.enabled_channels if item not in app.intensity_plots_to_show]
             only_cps_widgets.sort()
-            for ch in app.enabled_channels:
-                app.cps_counts[ch] = {
-                    "last_time_ns": 0,
-                    "last_count": 0,
-                    "current_count": 0,
-                }    
+            app.cps_engine = CPSEngine(app.enabled_channels)
             if len(only_cps_widgets) > 0:        
                 for index, channel in enumerate(only_cps_widgets):
                     IntensityTracingOnlyCPS.create_only_cps_widget(app, index, channel)  
@@ -294,7 +340,7 @@ class IntensityTracingButtonsActions:
                    
     @staticmethod    
     def stop_button_pressed(app):
-        app.pull_from_queue_timer.stop()   
+        IntensityTracing.stop_queue_consumer(app)   
         try:     
             flim_labs.request_stop()
         except:
@@ -312,17 +358,21 @@ class IntensityTracingButtonsActions:
         free_running = app.free_running_acquisition_time
         if ((app.acquisitions_count == app.selected_average) or free_running): 
             QTimer.singleShot(400, clear_cps_and_countdown_widgets)
-            app.cps_widgets_animation.clear()                 
-            remove_widget(app.layouts[PLOT_GRIDS_CONTAINER], app.widgets[GT_WIDGET_WRAPPER])
-            gt_widget = create_gt_loading_layout(app)
-            insert_widget(app.layouts[PLOT_GRIDS_CONTAINER], gt_widget, 1)              
+            app.cps_widgets_animation.clear()
+            # Realtime G(τ) plots stay visible until the post-processing results replace them
+            if app.realtime_correlator is None:
+                remove_widget(app.layouts[PLOT_GRIDS_CONTAINER], app.widgets[GT_WIDGET_WRAPPER])
+                gt_widget = create_gt_loading_layout(app)
+                insert_widget(app.layouts[PLOT_GRIDS_CONTAINER], gt_widget, 1)
+            FCSRealtime.stop(app)              
         QApplication.processEvents()
-        app.intensity_lines.clear()            
+        app.intensity_lines.clear()
+        app.intensity_buffers.clear()            
         FCSPostProcessing.get_input(app) 
 
     @staticmethod
     def abort_button_pressed(app):
-        app.pull_from_queue_timer.stop()
+        IntensityTracing.stop_queue_consumer(app)
         try:
             flim_labs.request_stop()
         except Exception:
@@ -336,21 +386,23 @@ class IntensityTracingButtonsActions:
 
         app.widgets[ACQUISITION_PROGRESS_BAR_WIDGET].clear_acquisition_timer(app)
         app.acquisitions_count = 0
-        app.cps_counts.clear()
+        app.cps_engine = None
         QTimer.singleShot(400, clear_cps_and_countdown_widgets)
         app.cps_widgets_animation.clear()
         QApplication.processEvents()
         app.intensity_lines.clear()
+        app.intensity_buffers.clear()
         app.control_inputs[START_BUTTON].setEnabled(len(app.enabled_channels) > 0)
         app.control_inputs[STOP_BUTTON].setEnabled(False)
         if ABORT_BUTTON in app.control_inputs:
             app.control_inputs[ABORT_BUTTON].setEnabled(False)
+        FCSRealtime.stop(app)
         FCSPostProcessing.abort(app)
         
                
     @staticmethod    
     def reset_button_pressed(app):
-        app.pull_from_queue_timer.stop()
+        IntensityTracing.stop_queue_consumer(app)
         time.sleep(0.1)
         try:
             flim_labs.request_stop()
@@ -362,6 +414,7 @@ class IntensityTracingButtonsActions:
         app.control_inputs[START_BUTTON].setEnabled(len(app.enabled_channels) > 0)
         app.control_inputs[STOP_BUTTON].setEnabled(False)
         app.control_inputs[ABORT_BUTTON].setEnabled(False)
+        FCSRealtime.stop(app)
         IntensityTracingButtonsActions.clear_plots(app)
         QApplication.processEvents()  
         
@@ -372,7 +425,8 @@ class IntensityTracingButtonsActions:
     
     @staticmethod    
     def clear_intensity_widgets(app):
-        app.intensity_lines.clear()             
+        app.intensity_lines.clear()
+        app.intensity_buffers.clear()             
         app.intensity_charts.clear()
         app.cps_ch.clear()
         app.only_cps_widgets.clear()
@@ -410,31 +464,36 @@ class IntensityTracingButtonsActions:
 class IntensityTracingPlot:
         
     @staticmethod
-    def update_plots2(channel_index, plots_to_show_index, time_ns, intensity, app):
-        if plots_to_show_index < len(app.intensity_lines):
-            intensity_line = app.intensity_lines[channel_index]
-            x, y = intensity_line.getData()
-            if x is None or (len(x) == 1 and x[0] == 0):
-                x = np.array([time_ns / 1_000_000_000])
-                y = np.array([np.sum(intensity)])
-            else:
-                x = np.append(x, time_ns / 1_000_000_000)
-                y = np.append(y, np.sum(intensity))
-            if len(x) > 2:
-                while x[-1] - x[0] > app.cached_time_span_seconds:
-                    x = x[1:]
-                    y = y[1:]
-            intensity_line.setData(x, y)
-            QApplication.processEvents()
-            time.sleep(0.01)
+    def refresh_plots(app, force=False):
+        # Repaint at most once per display frame, whatever the queue rate
+        now = time.perf_counter()
+        if not force and now - app.last_plots_refresh < 1 / app.live_plots_fps:
+            return
+        app.last_plots_refresh = now
+        with Diagnostics.probe("refresh_plots"):
+            for channel_index, intensity_line in app.intensity_lines.items():
+                if channel_index in app.intensity_buffers:
+                    x, y = app.intensity_buffers[channel_index].decimated_view(
+                        app.cached_time_span_seconds, intensity_line.getViewBox().width()
+                    )
+                    intensity_line.setData(x, y)
 
-                       
+
+    @staticmethod
+    def get_intensity_buffer(app, channel_index):
+        if channel_index not in app.intensity_buffers:
+            item_interval_micros = max(
+                IntensityTracing.get_realtime_adjustment_value(app.enabled_channels), app.bin_width_micros
+            )
+            capacity = IntensityRingBuffer.capacity_for(app.cached_time_span_seconds, item_interval_micros)
+            app.intensity_buffers[channel_index] = IntensityRingBuffer(capacity)
+        return app.intensity_buffers[channel_index]
     
     @staticmethod 
     def generate_chart(channel_index, app):
         x = np.arange(1)
         y = x * 0
-        intensity_widget = pg.PlotWidget()
+        intensity_widget = TimedPlotWidget()
         intensity_widget.setLabel('left', 'AVG. Photon counts', units='')
         intensity_widget.setLabel('bottom', 'Time', units='s')
         channel_title = get_channel_name(channel_index, app.channel_names, truncate_len=30)
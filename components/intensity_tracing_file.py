@@ -0,0 +1,81 @@
+import json
+from bisect import bisect_left
+import struct
+import numpy as np
+
+
+class IntensityTracingFile:
+    """
+    Memory-mapped reader for the intensity tracing .bin files written by flim_labs:
+    magic bytes "IT02", a JSON header (enabled channels, bin width...) and one record
+    per bin made of the time (f64, ns) and the photon counts (u32) of each enabled channel.
+    Records are never loaded as a whole: counts and times are views over the file.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            if f.read(4) != b"IT02":
+                raise ValueError(f"{file_path} is not an intensity tracing file")
+            (header_length,) = struct.unpack("<I", f.read(4))
+            self.header = json.loads(f.read(header_length).decode("utf-8"))
+            f.seek(0, 2)
+            file_size = f.tell()
+        self.channels = self.header["channels"]
+        self.dtype = IntensityTracingFile.record_dtype(len(self.channels))
+        data_offset = 8 + header_length
+        num_records = (file_size - data_offset) // self.dtype.itemsize
+        if num_records > 0:
+            self.records = np.memmap(
+                file_path, dtype=self.dtype, mode="r", offset=data_offset, shape=(num_records,)
+            )
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+
+    @staticmethod
+    def record_dtype(num_channels):
+        return np.dtype([("time", "<f8"), ("counts", "<u4", (num_channels,))])
+
+    @staticmethod
+    def read(file_path):
+        """
+        Args:
+            file_path: path of the intensity tracing .bin file
+
+        Returns:
+            tuple: (header, times_ns, {channel: photon counts}), all views over the file
+        """
+        intensity_file = IntensityTracingFile(file_path)
+        return intensity_file.header, intensity_file.times_ns, intensity_file.all_counts()
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def times_ns(self):
+        return self.records["time"]
+
+    def counts(self, channel):
+        return self.records["counts"][:, self.channels.index(channel)]
+
+    def all_counts(self):
+        return {channel: self.counts(channel) for channel in self.channels}
+
+    def time_range(self, start_s=None, end_s=None):
+        """
+        Slice the records by time, with a binary search on the (sorted) timestamps.
+
+        Args:
+            start_s: start of the range in seconds (None = from the beginning)
+            end_s: end of the range in seconds, excluded (None = until the end)
+
+        Returns:
+            tuple: (times_ns, {channel: photon counts}) views of the range
+        """
+        times = self.times_ns
+        # bisect only touches log2(n) records, np.searchsorted would copy the strided column
+        start = 0 if start_s is None else bisect_left(times, start_s * 1e9)
+        end = len(times) if end_s is None else bisect_left(times, end_s * 1e9)
+        records = self.records[start:end]
+        counts = {channel: records["counts"][:, i] for i, channel in enumerate(self.channels)}
+        return records["time"], counts
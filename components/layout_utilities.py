@@ -1,5 +1,5 @@
 import os
-import flim_labs
+from components.flim_labs_backend import flim_labs
 from components.acquisitions_progress_bar import AcquisitionsProgressBar, GtProgressBar
 current_path = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_path, ".."))
@@ -2,7 +2,6 @@ from functools import partial
 import json
 import os
 import re
-import struct
 from PyQt6.QtWidgets import (
     QFileDialog,
     QMessageBox,
@@ -21,6 +20,7 @@ from matplotlib import pyplot as plt
 
 from components.box_message import BoxMessage
 from components.fcs_controller import FCSPostProcessingPlot
+from components.fcs_file import FCSFile
 from components.gui_styles import GUIStyles
 from components.channel_name_utils import get_channel_name
 from components.input_text_control import InputTextControl
@@ -32,6 +32,7 @@ from components.layout_utilities import (
 )
 from components.logo_utilities import TitlebarIcon
 from components.messages_utilities import MessagesUtilities
+from components.reprocess import ReprocessPopup
 from components.resource_path import resource_path
 from components.settings import (
     ABORT_BUTTON,
@@ -68,6 +69,10 @@ class ReadData:
         result = ReadData.read_fcs_bin(window, app)
         if not result:
             return
+        ReadData.set_fcs_reader_data(app, result)
+
+    @staticmethod
+    def set_fcs_reader_data(app, result):
         file_name, lag_index, g2_correlations, metadata = result
         app.reader_data["fcs"]["files"]["fcs"] = file_name
         app.reader_data["fcs"]["plots"] = []
@@ -117,13 +122,13 @@ class ReadData:
 
         try:
             with open(file_name, "rb") as f:
-                if f.read(4) != b"FCS1":
+                if f.read(4) not in (b"FCS1", b"FCS2"):
                     ReadData.show_warning_message(
                         "Invalid file",
                         f"Invalid file. The file is not a valid FCS file file.",
                     )
                     return None
-                return ReadData.read_fcs_data(f, file_name)
+            return ReadData.read_fcs_data(file_name)
         except Exception:
             ReadData.show_warning_message(
                 "Error reading file", f"Error reading FCS file"
@@ -131,17 +136,9 @@ class ReadData:
             return None
 
     @staticmethod
-    def read_fcs_data(file, file_name):
+    def read_fcs_data(file_name):
         try:
-            json_length = struct.unpack("I", file.read(4))[0]
-            metadata = json.loads(file.read(json_length).decode("utf-8"))
-            (g2_correlations_json_length,) = struct.unpack("I", file.read(4))
-            g2_correlations_json_string = file.read(g2_correlations_json_length).decode(
-                "utf-8"
-            )
-            g2_correlations_json = eval(g2_correlations_json_string)
-            lag_index = g2_correlations_json["lag_index"]
-            g2_correlations = g2_correlations_json["g2_correlations"]
+            metadata, lag_index, g2_correlations = FCSFile.open(file_name)
             return file_name, lag_index, g2_correlations, metadata
         except Exception as e:
             ReadData.show_warning_message(
@@ -149,6 +146,15 @@ class ReadData:
             )
             return None
 
+    @staticmethod
+    def load_correlation(app, correlation):
+        # Only the selected pairs of the file are decoded
+        g2_correlations = app.reader_data["fcs"]["data"].get("g2_correlations", [])
+        for res in g2_correlations:
+            if tuple(int(x) for x in res[0]) == tuple(correlation):
+                return res[1][0]
+        return None
+
     @staticmethod
     def plot_fcs_data(app):
         from components.intensity_tracing_controller import (
@@ -390,6 +396,14 @@ class ReaderPopup(QWidget):
         plot_btn.setEnabled(len(plots_to_show) > 0)
         plot_btn.clicked.connect(self.on_plot_data_btn_clicked)
         self.widgets["plot_btn"] = plot_btn
+        # REPROCESS BTN
+        reprocess_btn = QPushButton("REPROCESS INTENSITY FILES")
+        reprocess_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        reprocess_btn.setObjectName("btn")
+        GUIStyles.set_start_btn_style(reprocess_btn)
+        reprocess_btn.setFixedHeight(40)
+        reprocess_btn.clicked.connect(self.on_reprocess_btn_clicked)
+        row_btn.addWidget(reprocess_btn)
         row_btn.addStretch(1)
         row_btn.addWidget(plot_btn)
         return row_btn
@@ -425,6 +439,7 @@ class ReaderPopup(QWidget):
         if state:
             if corr_tuple not in gt_plot_to_show:
                 gt_plot_to_show.append(corr_tuple)
+            ReadData.load_correlation(self.app, corr_tuple)
         else:
             if corr_tuple in gt_plot_to_show:
                 gt_plot_to_show.remove(corr_tuple)
@@ -459,6 +474,9 @@ class ReaderPopup(QWidget):
 
     def on_load_file_btn_clicked(self):
         ReadData.read_bin_data(self, self.app)
+        self.refresh_loaded_file()
+
+    def refresh_loaded_file(self):
         file_name = self.app.reader_data["fcs"]["files"]["fcs"]
         if file_name is not None and len(file_name) > 0:
             bin_metadata_btn_visible = ReadDataControls.read_bin_metadata_enabled(
@@ -481,6 +499,10 @@ class ReaderPopup(QWidget):
         ReadData.plot_fcs_data(self.app)
         self.close()
 
+    def on_reprocess_btn_clicked(self):
+        popup = ReprocessPopup(self.app)
+        popup.show()
+
     def center_window(self):
         self.setMinimumWidth(500)
         window_geometry = self.frameGeometry()
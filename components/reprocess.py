@@ -0,0 +1,378 @@
+import json
+import os
+import shutil
+import tempfile
+from PyQt6.QtCore import QThread, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QIcon
+from PyQt6.QtWidgets import (
+    QApplication,
+    QCheckBox,
+    QFileDialog,
+    QGridLayout,
+    QHBoxLayout,
+    QLabel,
+    QMessageBox,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+
+from components.box_message import BoxMessage
+from components.channel_name_utils import get_channel_name
+from components.correlator import RebinnedCounts, fluorescence_correlation_spectroscopy
+from components.fcs_file import FCSFile
+from components.gui_styles import GUIStyles
+from components.intensity_tracing_file import IntensityTracingFile
+from components.logo_utilities import TitlebarIcon
+from components.resource_path import resource_path
+from components.select_control import SelectControl
+from components.settings import (
+    FCS_ALGORITHMS,
+    READER_POPUP,
+    REPROCESS_ARRIVAL_TIMES,
+    REPROCESS_POPUP,
+    REPROCESS_REBIN_FACTORS,
+    REPROCESS_TIME_TAGGER_BIN_WIDTHS,
+    TAU_AXIS_SCALES,
+    TTTR_RESOLUTION_NS,
+)
+from components.time_tagger_file import TimeTaggerFile
+from components.tttr_correlator import time_tagger_correlation_spectroscopy
+
+
+class ReprocessWorker(QThread):
+    success = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(
+        self,
+        intensity_files,
+        correlations,
+        rebin_factor,
+        tau_high_density,
+        use_fft_correlation,
+        notes,
+        output_path,
+        time_tagger=False,
+        time_tagger_bin_width=None,
+    ):
+        super().__init__()
+        self.intensity_files = intensity_files
+        self.time_tagger = time_tagger
+        self.time_tagger_bin_width = time_tagger_bin_width
+        self.correlations = correlations
+        self.rebin_factor = rebin_factor
+        self.tau_high_density = tau_high_density
+        self.use_fft_correlation = use_fft_correlation
+        self.notes = notes
+        self.output_path = output_path
+
+    def run(self):
+        converted_folder = None
+        try:
+            if self.time_tagger and self.time_tagger_bin_width is None:
+                result, bin_width, acquisition_times = self.correlate_time_tagger_files()
+            else:
+                if self.time_tagger:
+                    converted_folder = tempfile.mkdtemp(prefix="fcs-reprocess-")
+                    self.intensity_files = self.convert_time_tagger_files(converted_folder)
+                result, bin_width, acquisition_times = self.correlate_intensity_files()
+            metadata = {
+                "enabled_channels": sorted({ch for pair in self.correlations for ch in pair}),
+                "bin_width": bin_width,
+                # Duration of a single acquisition, as in the acquired FCS files
+                "acquisition_time": max(acquisition_times) if acquisition_times else None,
+                "correlations": [list(pair) for pair in self.correlations],
+                "num_acquisitions": len(self.intensity_files),
+                "notes": self.notes,
+            }
+            FCSFile.write_fcs2(self.output_path, metadata, result.lag_index, result.g2_correlations)
+            self.success.emit(self.output_path)
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            if converted_folder is not None:
+                shutil.rmtree(converted_folder, ignore_errors=True)
+
+    def correlate_intensity_files(self):
+        channels = sorted({ch for pair in self.correlations for ch in pair})
+        intensities = []
+        acquisition_times = []
+        for file_path in self.intensity_files:
+            intensity_file = IntensityTracingFile(file_path)
+            # Rebinned chunk by chunk from the memory-mapped file while correlating
+            intensities.append(
+                {ch: RebinnedCounts(intensity_file.counts(ch), self.rebin_factor) for ch in channels}
+            )
+            times_ns = intensity_file.times_ns
+            if len(times_ns) > 0:
+                acquisition_times.append(int((times_ns[-1] - times_ns[0]) / 1_000_000))
+            bin_width = int(intensity_file.header["bin_width_micros"]) * self.rebin_factor
+        result = fluorescence_correlation_spectroscopy(
+            intensities,
+            self.correlations,
+            bin_width,
+            self.tau_high_density,
+            self.use_fft_correlation,
+        )
+        return result, bin_width, acquisition_times
+
+    def convert_time_tagger_files(self, folder):
+        # Temporary intensity tracing files (removed once correlated), then correlated as usual
+        intensity_files = []
+        for index, file_path in enumerate(self.intensity_files):
+            intensity_file_path = os.path.join(
+                folder,
+                f"{index}_{os.path.splitext(os.path.basename(file_path))[0]}"
+                f"_intensity-tracing_{self.time_tagger_bin_width}us.bin",
+            )
+            TimeTaggerFile(file_path).write_intensity_tracing(intensity_file_path, self.time_tagger_bin_width)
+            intensity_files.append(intensity_file_path)
+        return intensity_files
+
+    def correlate_time_tagger_files(self):
+        # Correlated from the photon arrival times, the lags start at the time tagger resolution
+        acquisition_times = []
+        for file_path in self.intensity_files:
+            times_ns = TimeTaggerFile(file_path).records["time"]
+            if len(times_ns) > 0:
+                acquisition_times.append(int((times_ns[-1] - times_ns[0]) / 1_000_000))
+        result = time_tagger_correlation_spectroscopy(
+            self.intensity_files, self.correlations, max_workers=os.cpu_count() or 1
+        )
+        return result, TTTR_RESOLUTION_NS / 1000, acquisition_times
+
+
+class ReprocessPopup(QWidget):
+    """
+    Re-correlate saved intensity tracing files with a larger bin width (integer multiple
+    of the original one), another τ density or algorithm, and write a new FCS file.
+    Time tagger files are either correlated from the photon arrival times (sub-μs lags)
+    or converted to intensity tracing files at a chosen bin width first.
+    """
+
+    def __init__(self, window):
+        super().__init__()
+        self.app = window
+        self.intensity_files = []
+        self.channels = []
+        self.bin_width = None
+        self.time_tagger = False
+        self.pairs_checkboxes = []
+        self.worker = None
+        self.setWindowTitle("Reprocess intensity files")
+        TitlebarIcon.setup(self)
+        GUIStyles.customize_theme(self, bg=QColor(20, 20, 20))
+        self.layout = QVBoxLayout()
+        self.layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        self.layout.addLayout(self.init_files_ui())
+        self.layout.addSpacing(20)
+        self.layout.addLayout(self.init_params_ui())
+        self.layout.addSpacing(20)
+        self.pairs_grid = QGridLayout()
+        self.pairs_desc = QLabel("CHOOSE THE CORRELATIONS TO COMPUTE:")
+        self.pairs_desc.setStyleSheet("font-size: 16px; font-family: 'Montserrat'")
+        self.pairs_desc.setVisible(False)
+        self.layout.addWidget(self.pairs_desc)
+        self.layout.addSpacing(10)
+        self.layout.addLayout(self.pairs_grid)
+        self.layout.addSpacing(20)
+        self.layout.addLayout(self.init_reprocess_btn_ui())
+        self.setLayout(self.layout)
+        self.setStyleSheet(GUIStyles.plots_config_popup_style())
+        self.app.widgets[REPROCESS_POPUP] = self
+        self.center_window()
+
+    def init_files_ui(self):
+        v_box = QVBoxLayout()
+        desc = QLabel("LOAD INTENSITY TRACING OR TIME TAGGER FILES (ONE PER ACQUISITION):")
+        desc.setStyleSheet("font-size: 16px; font-family: 'Montserrat'")
+        row = QHBoxLayout()
+        self.files_label = QLabel("No files selected")
+        self.files_label.setWordWrap(True)
+        load_files_btn = QPushButton()
+        load_files_btn.setIcon(QIcon(resource_path("assets/folder-white.png")))
+        load_files_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        GUIStyles.set_start_btn_style(load_files_btn)
+        load_files_btn.setFixedHeight(36)
+        load_files_btn.clicked.connect(self.on_load_files_btn_clicked)
+        row.addWidget(self.files_label, 1)
+        row.addWidget(load_files_btn)
+        v_box.addWidget(desc)
+        v_box.addSpacing(10)
+        v_box.addLayout(row)
+        return v_box
+
+    def init_params_ui(self):
+        row = QHBoxLayout()
+        rebin_control, self.rebin_input = SelectControl.setup(
+            "Bin width multiple:", 1, row, REPROCESS_REBIN_FACTORS, self.update_bin_width_label
+        )
+        self.rebin_label = rebin_control.itemAt(0).widget()
+        _, self.tau_axis_scale_input = SelectControl.setup(
+            "Tau axis scale:", self.app.tau_axis_scale, row, TAU_AXIS_SCALES, lambda _: None
+        )
+        _, self.algorithm_input = SelectControl.setup(
+            "Algorithm:", self.app.fcs_algorithm, row, FCS_ALGORITHMS, lambda _: None
+        )
+        self.bin_width_label = QLabel("")
+        row.addWidget(self.bin_width_label)
+        return row
+
+    def init_reprocess_btn_ui(self):
+        row = QHBoxLayout()
+        self.reprocess_btn = QPushButton("REPROCESS")
+        self.reprocess_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.reprocess_btn.setObjectName("btn")
+        GUIStyles.set_stop_btn_style(self.reprocess_btn)
+        self.reprocess_btn.setFixedHeight(40)
+        self.reprocess_btn.setFixedWidth(150)
+        self.reprocess_btn.setEnabled(False)
+        self.reprocess_btn.clicked.connect(self.on_reprocess_btn_clicked)
+        row.addStretch(1)
+        row.addWidget(self.reprocess_btn)
+        return row
+
+    def on_load_files_btn_clicked(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Load intensity tracing files",
+            "",
+            "Bin files (*.bin)",
+            options=QFileDialog.Option.DontUseNativeDialog,
+        )
+        if not file_paths:
+            return
+        try:
+            with open(file_paths[0], "rb") as f:
+                time_tagger = f.read(4) == b"ITT1"
+            reader = TimeTaggerFile if time_tagger else IntensityTracingFile
+            headers = [reader(file_path).header for file_path in file_paths]
+        except Exception:
+            self.show_message("Invalid file", "The files are not valid intensity tracing or time tagger files.", QMessageBox.Icon.Warning)
+            return
+        if not time_tagger and len({int(header["bin_width_micros"]) for header in headers}) > 1:
+            self.show_message("Invalid files", "All the files must have the same bin width.", QMessageBox.Icon.Warning)
+            return
+        self.intensity_files = file_paths
+        self.time_tagger = time_tagger
+        self.bin_width = None if time_tagger else int(headers[0]["bin_width_micros"])
+        self.channels = sorted(set.intersection(*[set(header["channels"]) for header in headers]))
+        self.files_label.setText("\n".join(os.path.basename(file_path) for file_path in file_paths))
+        # Time tagger files are binned at a bin width instead of a multiple of the original one
+        self.rebin_label.setText("Bin width (μs):" if time_tagger else "Bin width multiple:")
+        self.rebin_input.blockSignals(True)
+        self.rebin_input.clear()
+        options = REPROCESS_TIME_TAGGER_BIN_WIDTHS if time_tagger else REPROCESS_REBIN_FACTORS
+        self.rebin_input.addItems([str(option) for option in options])
+        self.rebin_input.blockSignals(False)
+        self.update_bin_width_label()
+        self.init_pairs_grid()
+
+    def init_pairs_grid(self):
+        for checkbox in self.pairs_checkboxes:
+            self.pairs_grid.removeWidget(checkbox)
+            checkbox.deleteLater()
+        self.pairs_checkboxes.clear()
+        channel_names = self.app.channel_names
+        pairs = [(ch1, ch2) for ch1 in self.channels for ch2 in self.channels]
+        for index, pair in enumerate(pairs):
+            ch1_name = get_channel_name(pair[0], channel_names, truncate_len=15)
+            ch2_name = get_channel_name(pair[1], channel_names, truncate_len=15)
+            checkbox = QCheckBox(f"{ch1_name} - {ch2_name}")
+            checkbox.setStyleSheet(GUIStyles.set_simple_checkbox_style(color="#ffff00"))
+            checkbox.setCursor(Qt.CursorShape.PointingHandCursor)
+            checkbox.setProperty("value", pair)
+            checkbox.toggled.connect(self.update_reprocess_btn)
+            row, col = divmod(index, 4)
+            self.pairs_grid.addWidget(checkbox, row, col)
+            self.pairs_checkboxes.append(checkbox)
+        self.pairs_desc.setVisible(len(pairs) > 0)
+        self.update_reprocess_btn()
+
+    def update_bin_width_label(self, _=None):
+        arrival_times = self.time_tagger and self.time_tagger_bin_width() is None
+        # The τ density and algorithm only apply to binned intensities
+        self.tau_axis_scale_input.setEnabled(not arrival_times)
+        self.algorithm_input.setEnabled(not arrival_times)
+        if arrival_times:
+            self.bin_width_label.setText(f"Photon arrival times (resolution {TTTR_RESOLUTION_NS} ns)")
+        elif self.time_tagger:
+            self.bin_width_label.setText(f"New bin width: {self.time_tagger_bin_width()} μs")
+        elif self.bin_width is not None:
+            self.bin_width_label.setText(f"New bin width: {self.bin_width * self.rebin_factor()} μs")
+
+    def update_reprocess_btn(self):
+        self.reprocess_btn.setEnabled(len(self.selected_pairs()) > 0 and self.worker is None)
+
+    def rebin_factor(self):
+        return 1 if self.time_tagger else int(self.rebin_input.currentText())
+
+    def time_tagger_bin_width(self):
+        value = self.rebin_input.currentText()
+        return None if value == REPROCESS_ARRIVAL_TIMES else int(value)
+
+    def selected_pairs(self):
+        return [checkbox.property("value") for checkbox in self.pairs_checkboxes if checkbox.isChecked()]
+
+    def on_reprocess_btn_clicked(self):
+        output_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save FCS file",
+            "",
+            "Bin files (*.bin)",
+            options=QFileDialog.Option.DontUseNativeDialog,
+        )
+        if not output_path:
+            return
+        if not output_path.endswith(".bin"):
+            output_path += ".bin"
+        notes = json.dumps(
+            {
+                "notes": "Reprocessed from " + ", ".join(os.path.basename(f) for f in self.intensity_files),
+                "channel_names": self.app.channel_names,
+            }
+        )
+        self.worker = ReprocessWorker(
+            self.intensity_files,
+            [tuple(pair) for pair in self.selected_pairs()],
+            self.rebin_factor(),
+            self.tau_axis_scale_input.currentText() == "High density",
+            self.algorithm_input.currentText() == "FFT-based correlation",
+            notes,
+            output_path,
+            self.time_tagger,
+            self.time_tagger_bin_width() if self.time_tagger else None,
+        )
+        self.worker.success.connect(self.on_reprocess_success)
+        self.worker.error.connect(self.on_reprocess_error)
+        self.reprocess_btn.setEnabled(False)
+        self.reprocess_btn.setText("PROCESSING...")
+        self.worker.start()
+
+    def on_reprocess_success(self, output_path):
+        from components.read_data import ReadData
+
+        self.worker = None
+        result = ReadData.read_fcs_data(output_path)
+        if result:
+            ReadData.set_fcs_reader_data(self.app, result)
+            if READER_POPUP in self.app.widgets:
+                self.app.widgets[READER_POPUP].refresh_loaded_file()
+        self.close()
+
+    def on_reprocess_error(self, error_message):
+        self.worker = None
+        self.reprocess_btn.setText("REPROCESS")
+        self.update_reprocess_btn()
+        self.show_message("FCS Processing Error", error_message, QMessageBox.Icon.Critical)
+
+    def show_message(self, title, message, icon):
+        BoxMessage.setup(title, message, icon, GUIStyles.set_msg_box_style())
+
+    def center_window(self):
+        self.setMinimumWidth(700)
+        window_geometry = self.frameGeometry()
+        screen_geometry = QApplication.primaryScreen().availableGeometry().center()
+        window_geometry.moveCenter(screen_geometry)
+        self.move(window_geometry.topLeft())
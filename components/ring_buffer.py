@@ -0,0 +1,129 @@
+import numpy as np
+
+from components.settings import INTENSITY_BUFFER_MAX_POINTS
+
+
+class IntensityRingBuffer:
+    """
+    Preallocated circular buffer holding the live intensity trace of one channel.
+    Every sample is stored twice (at i and i + capacity), so the most recent
+    window is always a contiguous slice and can be passed to the plot as a view.
+    Memory and per-sample cost are constant, whatever the time span.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(int(capacity), 2)
+        self._time = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._counts = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._head = 0
+        self._size = 0
+        self.envelope = MinMaxEnvelope()
+
+    @staticmethod
+    def capacity_for(time_span_seconds, item_interval_micros):
+        # One sample per queue item, i.e. one every item_interval_micros (not one per bin)
+        items = int(np.ceil(float(time_span_seconds) * 1_000_000 / max(int(item_interval_micros), 1)))
+        return min(items + 1, INTENSITY_BUFFER_MAX_POINTS)
+
+    def __len__(self):
+        return self._size
+
+    def append(self, time_s, value):
+        head = self._head
+        self._time[head] = self._time[head + self.capacity] = time_s
+        self._counts[head] = self._counts[head + self.capacity] = value
+        self._head = (head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        if self.envelope.bucket_width is not None:
+            self.envelope.extend(np.array([time_s]), np.array([value], dtype=np.float64))
+
+    def extend(self, times_s, values):
+        times_s = np.asarray(times_s, dtype=np.float64)[-self.capacity:]
+        values = np.asarray(values, dtype=np.float64)[-self.capacity:]
+        n = len(times_s)
+        head = self._head
+        first = min(n, self.capacity - head)
+        for offset in (0, self.capacity):
+            self._time[head + offset:head + offset + first] = times_s[:first]
+            self._counts[head + offset:head + offset + first] = values[:first]
+            self._time[offset:offset + n - first] = times_s[first:]
+            self._counts[offset:offset + n - first] = values[first:]
+        self._head = (head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+        self.envelope.extend(times_s[-n:], values[-n:])
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+        self.envelope.reset()
+
+    def view(self, time_span_seconds=None):
+        end = self._head + self.capacity
+        start = end - self._size
+        if time_span_seconds is not None and self._size > 2:
+            times = self._time[start:end]
+            start += int(np.searchsorted(times, times[-1] - time_span_seconds, side="left"))
+        return self._time[start:end], self._counts[start:end]
+
+    def decimated_view(self, time_span_seconds, width_pixels):
+        """
+        Same as view, reduced to the min and max of each pixel column when there are more
+        samples than pixels: the drawing cost depends on the plot width, and spikes stay visible.
+        """
+        times, values = self.view(time_span_seconds)
+        width_pixels = max(int(width_pixels), 1)
+        if len(times) <= 2 * width_pixels:
+            return times, values
+        span = time_span_seconds if time_span_seconds is not None else times[-1] - times[0]
+        bucket_width = float(span) / width_pixels
+        if self.envelope.bucket_width != bucket_width:
+            # New plot width or time span: rebuild once from the buffer
+            self.envelope.reset(bucket_width, 2 * width_pixels)
+            self.envelope.extend(times, values)
+        return self.envelope.view(times[0])
+
+
+class MinMaxEnvelope:
+    """
+    Min and max of the samples falling in each bucket of bucket_width seconds (one bucket per
+    pixel column), for the last max_buckets buckets. Only the new samples are reduced at each
+    update, the last bucket is merged with them while it is still filling.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, bucket_width=None, max_buckets=0):
+        self.bucket_width = bucket_width
+        self.max_buckets = max_buckets
+        self._buckets = np.zeros(0, dtype=np.int64)
+        self._mins = np.zeros(0, dtype=np.float64)
+        self._maxs = np.zeros(0, dtype=np.float64)
+
+    def extend(self, times_s, values):
+        if self.bucket_width is None or len(times_s) == 0:
+            return
+        buckets = np.floor(times_s / self.bucket_width).astype(np.int64)
+        starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        buckets = buckets[starts]
+        if len(self._buckets) > 0 and buckets[0] == self._buckets[-1]:
+            self._mins[-1] = min(self._mins[-1], mins[0])
+            self._maxs[-1] = max(self._maxs[-1], maxs[0])
+            buckets, mins, maxs = buckets[1:], mins[1:], maxs[1:]
+        keep = self.max_buckets
+        self._buckets = np.concatenate((self._buckets, buckets))[-keep:]
+        self._mins = np.concatenate((self._mins, mins))[-keep:]
+        self._maxs = np.concatenate((self._maxs, maxs))[-keep:]
+
+    def view(self, start_time_s):
+        """
+        Returns:
+            tuple: (times, values) with the min then the max of each bucket from start_time_s,
+            both at the start time of the bucket
+        """
+        first = np.searchsorted(self._buckets, np.floor(start_time_s / self.bucket_width))
+        times = np.repeat(self._buckets[first:] * self.bucket_width, 2)
+        values = np.column_stack((self._mins[first:], self._maxs[first:])).ravel()
+        return times, values
@@ -29,8 +29,73 @@ SETTINGS_FCS_ALGORITHM = "fcs_algorithm"
 DEFAULT_FCS_ALGORITHM = "Multiple-τ correlation"
 FCS_ALGORITHMS = ["Multiple-τ correlation", "FFT-based correlation"]
 
+# "numpy" correlates the saved intensity files in parallel and shows the running average,
+# "flim_labs" uses the serial extension calls (see tests/test_fcs_engines.py for the parity check)
+SETTINGS_FCS_ENGINE = "fcs_engine"
+DEFAULT_FCS_ENGINE = "numpy"
+FCS_ENGINES = ["numpy", "flim_labs"]
+FCS_ENGINE_LABELS = {"numpy": "Parallel (NumPy)", "flim_labs": "Serial (flim_labs)"}
+
+# Bins read at a time by the multiple-τ correlation of saved intensity files (bounds the memory of each worker)
+FCS_CHUNK_BINS = 1_048_576
+
+# Post-processing worker threads, 0 = one per CPU core
+SETTINGS_FCS_WORKERS = "fcs_workers"
+DEFAULT_FCS_WORKERS = 0
+
+# How exported files are written next to the user's file name:
+# "auto" = reflink (copy-on-write clone) where the filesystem supports it (e.g. Btrfs, XFS, APFS),
+# else copy: on Windows (NTFS) exports are plain copies. "hardlink" is only used when set explicitly
+# in settings.ini: the exported file then shares its data with the one in the data folder, so editing
+# one changes the other. "move" removes the file from the data folder
+SETTINGS_EXPORT_STRATEGY = "export_strategy"
+DEFAULT_EXPORT_STRATEGY = "auto"
+EXPORT_STRATEGIES = ["auto", "reflink", "hardlink", "move", "copy"]
+EXPORT_COPY_CHUNK_BYTES = 16 * 1024 * 1024
+# Exports run in the background one at a time, the pending ones are saved in the data folder
+EXPORT_MAX_WORKERS = 1
+EXPORT_QUEUE_FILE = "export_queue.json"
+# Intensity tracing and time tagger files exported delta encoded and compressed (zstd, else zlib)
+SETTINGS_EXPORT_COMPRESSED = "export_compressed"
+DEFAULT_EXPORT_COMPRESSED = False
+EXPORT_COMPRESSION_BLOCK_RECORDS = 1_000_000
+EXPORT_COMPRESSION_LEVEL = 3
+
+# flim_labs backend: "hardware" (the flim_labs extension and card) or "simulated" (see
+# components/flim_labs_simulator.py). The FLIM_LABS_BACKEND environment variable overrides the setting
+SETTINGS_FLIM_LABS_BACKEND = "flim_labs_backend"
+DEFAULT_FLIM_LABS_BACKEND = "hardware"
+FLIM_LABS_BACKENDS = ["hardware", "simulated"]
+FLIM_LABS_BACKEND_ENV = "FLIM_LABS_BACKEND"
+# Simulated card, overridden by the JSON of the FLIM_LABS_SIMULATOR environment variable:
+# count rate per channel, fluorescent species (amplitude = 1 / N molecules in the focus,
+# 2D diffusion time), speed (1 = real time, 10 = ten times faster, 0 = as fast as possible)
+FLIM_LABS_SIMULATOR_ENV = "FLIM_LABS_SIMULATOR"
+SIMULATOR_DEFAULT_CONFIG = {
+    "num_channels": 8,
+    "count_rate_cps": 200_000,
+    "diffusion": [{"amplitude": 0.1, "diffusion_time_us": 100}],
+    "speed": 1,
+    "laser_period_ns": 12.5,
+    "seed": None,
+    # Intensity tracing (IT02) file whose counts are replayed instead of simulated
+    "replay_file": None,
+}
+
+# Timing probes of the live pipeline, FCS workers and exports (see components/diagnostics.py)
+SETTINGS_DIAGNOSTICS = "diagnostics"
+DEFAULT_DIAGNOSTICS = False
+DIAGNOSTICS_SHORTCUT = "Ctrl+Shift+D"
+DIAGNOSTICS_REFRESH_MS = 500
+DIAGNOSTICS_FOLDER = "diagnostics"
+DIAGNOSTICS_OVERLAY = "diagnostics_overlay"
+
 SETTINGS_CPS_THRESHOLD = "cps_threshold"
 DEFAULT_CPS_THRESHOLD = 0
+# CPS labels: sliding-window rate, smoothed (EWMA) rate for the threshold, UI update interval
+CPS_WINDOW_SECONDS = 0.33
+CPS_EWMA_SECONDS = 1.0
+CPS_UI_INTERVAL_SECONDS = 0.33
 
 AVERAGES_INPUTS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
 SETTINGS_AVERAGES = "averages"
@@ -95,6 +160,9 @@ DEFAULT_ENABLED_CHANNELS = "[0]"
 SETTINGS_CHANNEL_NAMES = "channel_names"
 DEFAULT_CHANNEL_NAMES = "{}"
 
+SETTINGS_LIVE_PLOTS_FPS = "live_plots_fps"
+DEFAULT_LIVE_PLOTS_FPS = 30
+
 SETTINGS_SHOW_CPS = "show_cps"
 DEFAULT_SHOW_CPS = True
 
@@ -133,6 +201,8 @@ ACQUISITION_PROGRESS_BAR_WIDGET = "acquisition_progress_bar_widget"
 GT_PROGRESS_BAR_WIDGET = "gt_progress_bar_widget"
 
 TIME_TAGGER_PROGRESS_BAR = "time_tagger_progress_bar"
+EXPORT_PROGRESS_BAR = "export_progress_bar"
+EXPORT_CANCEL_BUTTON = "export_cancel_button"
 TIME_TAGGER_WIDGET = "time_tagger_widget"
 EXPORT_OPTIONS_WIDGET = "export_options_widget"
 
@@ -157,6 +227,19 @@ REALTIME_SECS = REALTIME_MS / 1000
 
 NS_IN_S = 1_000_000_000
 
+# Realtime G(τ): refresh period of the live plots and longest correlated lag
+REALTIME_GT_REFRESH_MS = 500
+REALTIME_GT_MAX_TAU_SECONDS = 10
+# Photon arrival time (time tagger) correlation
+TTTR_RESOLUTION_NS = 1
+TTTR_MAX_TAU_SECONDS = 1
+TTTR_CHUNK_RECORDS = 1_000_000
+# How far behind the latest photon a photon of another channel can be written in a time tagger file (ns)
+TTTR_MAX_REORDER_NS = 100_000_000
+
+# Upper bound for the live intensity ring buffers (points per channel)
+INTENSITY_BUFFER_MAX_POINTS = 2_000_000
+
 EXPORTED_DATA_BYTES_UNIT = 12083.2
 
 
@@ -171,6 +254,7 @@ UNICODE_SUP = {
     "7": "\u2077",
     "8": "\u2078",
     "9": "\u2079",
+    "-": "\u207B",
 }
 
 COMMENT_FILE_DIMENSION_KB = {
@@ -250,7 +334,16 @@ CORRELATIONS_FILE_DIMENSION_KB = {
 
 
 
+# Append-only index (JSON lines) of the files written by each acquisition, in the flim-labs data folder
+ACQUISITION_FILES_MANIFEST = "acquisition_files.jsonl"
+
 READER_POPUP = "reader_popup"
+REPROCESS_POPUP = "reprocess_popup"
+# Integer multiples of the original bin width offered when reprocessing intensity files
+REPROCESS_REBIN_FACTORS = [1, 2, 5, 10, 20, 50, 100]
+# Time tagger files: correlate the photon arrival times or histogram them at a bin width (μs)
+REPROCESS_ARRIVAL_TIMES = "Arrival times"
+REPROCESS_TIME_TAGGER_BIN_WIDTHS = [REPROCESS_ARRIVAL_TIMES, 1, 2, 5, 10, 20, 50, 100, 1000]
 READER_METADATA_POPUP = "reader_metadata_popup"
 SETTINGS_ACQUIRE_READ_MODE = "acquire_read_mode"
 DEFAULT_ACQUIRE_READ_MODE = "acquire"
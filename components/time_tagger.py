@@ -8,15 +8,16 @@ from PyQt6.QtCore import (
     QTimer,
 )
 from PyQt6.QtWidgets import QMessageBox
-import flim_labs
+from components.flim_labs_backend import flim_labs
 from components.box_message import BoxMessage
 from components.data_export_controls import ExportData
+from components.file_utilities import FileUtils
 from components.gui_styles import GUIStyles
 from components.settings import TIME_TAGGER_PROGRESS_BAR
 
 
 class TimeTaggerWorkerSignals(QObject):
-    success = pyqtSignal()
+    success = pyqtSignal(object)
     error = pyqtSignal(str)
 
 
@@ -30,11 +31,11 @@ class TimeTaggerProcessingTask(QRunnable):
     @pyqtSlot()
     def run(self):
         try:
-            flim_labs.intensity_time_tagger(
+            file_path = flim_labs.intensity_time_tagger(
                 bin_width_micros=self.bin_width_micros,
                 enabled_channels=self.enabled_channels,
             )
-            self.signals.success.emit()
+            self.signals.success.emit(file_path)
         except Exception as e:
             self.signals.error.emit(f"Error processing time tagger: {str(e)}")
 
@@ -46,7 +47,7 @@ class TimeTaggerController:
         enabled_channels = app.enabled_channels
         signals = TimeTaggerWorkerSignals()
         signals.success.connect(
-            lambda: TimeTaggerController.handle_success_processing(app)
+            lambda file_path: TimeTaggerController.handle_success_processing(app, file_path)
         )
         signals.error.connect(
             lambda error: TimeTaggerController.show_error_message(app, error)
@@ -64,8 +65,15 @@ class TimeTaggerController:
         )
 
     @staticmethod
-    def handle_success_processing(app):
+    def handle_success_processing(app, file_path):
         app.widgets[TIME_TAGGER_PROGRESS_BAR].set_visible(False)
+        # The time tagger file written by flim_labs
+        FileUtils.register_written_files(
+            app.acquisition_id,
+            ("time_tagger",),
+            [file_path] if isinstance(file_path, str) else [],
+            app.acquisition_start_time,
+        )
         QTimer.singleShot(
             300,
             partial(ExportData.save_fcs_data, app),
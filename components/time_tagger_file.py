@@ -0,0 +1,150 @@
+import json
+import os
+import struct
+import numpy as np
+
+from components.intensity_tracing_file import IntensityTracingFile
+from components.settings import TTTR_CHUNK_RECORDS, TTTR_MAX_REORDER_NS
+
+# Marker events (Frame, Line, Pixel), any other event code is a channel id
+TIME_TAGGER_MARKERS = {70: "F", 76: "L", 80: "P"}
+
+
+class TimeTaggerFile:
+    """
+    Memory-mapped reader for the time tagger .bin files written by flim_labs:
+    magic bytes "ITT1", a JSON header (enabled channels, laser period) and one packed
+    9-byte record per event made of the event code (u8) and the time (f64, ns).
+    The events of each code are time ordered, the streams of different codes are interleaved.
+    """
+
+    RECORD_DTYPE = np.dtype([("event", "u1"), ("time", "<f8")])
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            if f.read(4) != b"ITT1":
+                raise ValueError(f"{file_path} is not a time tagger file")
+            (header_length,) = struct.unpack("<I", f.read(4))
+            self.header = json.loads(f.read(header_length).decode("utf-8"))
+            f.seek(0, 2)
+            file_size = f.tell()
+        self.channels = self.header.get("channels") or []
+        data_offset = 8 + header_length
+        num_records = (file_size - data_offset) // self.RECORD_DTYPE.itemsize
+        if num_records > 0:
+            self.records = np.memmap(
+                file_path, dtype=self.RECORD_DTYPE, mode="r", offset=data_offset, shape=(num_records,)
+            )
+        else:
+            self.records = np.empty(0, dtype=self.RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def photon_chunks(self, chunk_size=TTTR_CHUNK_RECORDS, channels=None):
+        """
+        Yields the photon arrival times of each chunk of records, one sorted array per channel.
+
+        Args:
+            chunk_size: number of records read at a time
+            max_reorder_ns: how far behind the latest photon a photon of another channel can be
+            channels: channel ids to extract (None = the enabled channels of the header)
+
+        Yields:
+            dict: {channel: float64 arrival times (ns)}
+        """
+        channels = self.channels if channels is None else channels
+        for start in range(0, len(self.records), chunk_size):
+            records = np.asarray(self.records[start:start + chunk_size])
+            events = records["event"]
+            times = records["time"]
+            yield {channel: times[events == channel] for channel in channels}
+
+    def write_intensity_tracing(
+        self, output_path, bin_width_micros, chunk_size=TTTR_CHUNK_RECORDS, max_reorder_ns=TTTR_MAX_REORDER_NS
+    ):
+        """
+        Histogram the photons of each channel in bins of bin_width_micros and write them as an
+        intensity tracing (IT02) file, so they can be correlated and plotted like an acquired one.
+        The file is converted one chunk of records at a time: a bin is written once every channel
+        has a photon past it (channels missing from a chunk keep the last bin they reached), or once
+        it is more than max_reorder_ns behind the latest photon (a channel may have no photons).
+
+        Args:
+            output_path: path of the intensity tracing .bin file to write
+            bin_width_micros: bin width in μs
+            chunk_size: number of records read at a time
+            max_reorder_ns: how far behind the latest photon a photon of another channel can be
+
+        Returns:
+            int: number of bins written
+        """
+        bin_width_ns = bin_width_micros * 1000
+        reorder_bins = int(np.ceil(max_reorder_ns / bin_width_ns))
+        dtype = IntensityTracingFile.record_dtype(len(self.channels))
+        header = json.dumps(
+            {
+                "channels": self.channels,
+                "bin_width_micros": bin_width_micros,
+                "time_tagger_file": os.path.basename(self.file_path),
+            }
+        ).encode("utf-8")
+        # Counts of the bins not written yet, the first one is first_bin
+        pending = np.zeros((0, len(self.channels)), dtype=np.uint32)
+        first_bin = None
+        # Bin of the last photon of each channel so far (-1: none yet)
+        last_bins = np.full(len(self.channels), -1, dtype=np.int64)
+        num_bins = 0
+        with open(output_path, "wb") as f:
+            f.write(b"IT02")
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for photons in self.photon_chunks(chunk_size):
+                bins = [(photons[ch] // bin_width_ns).astype(np.int64) for ch in self.channels]
+                present = [channel_bins for channel_bins in bins if len(channel_bins) > 0]
+                if not present:
+                    continue
+                start_bin = min(channel_bins[0] for channel_bins in present)
+                if first_bin is None:
+                    first_bin = start_bin
+                elif start_bin < first_bin:
+                    # Earlier photons of a channel not seen so far: nothing was written yet
+                    if num_bins > 0:
+                        raise ValueError(f"{self.file_path}: events are not time ordered")
+                    earlier = np.zeros((first_bin - start_bin, len(self.channels)), dtype=np.uint32)
+                    pending = np.concatenate((earlier, pending))
+                    first_bin = start_bin
+                end_bin = max(channel_bins[-1] for channel_bins in present) + 1
+                if end_bin - first_bin > len(pending):
+                    extended = np.zeros((end_bin - first_bin, len(self.channels)), dtype=np.uint32)
+                    extended[: len(pending)] = pending
+                    pending = extended
+                for i, channel_bins in enumerate(bins):
+                    if len(channel_bins) == 0:
+                        continue
+                    pending[:, i] += np.bincount(channel_bins - first_bin, minlength=len(pending)).astype(
+                        np.uint32
+                    )
+                    last_bins[i] = channel_bins[-1]
+                # Each channel is time ordered: the bins before the lowest last bin are complete,
+                # as are the bins more than reorder_bins before the latest one
+                complete_until = int(last_bins.max()) - reorder_bins
+                if np.all(last_bins >= 0):
+                    complete_until = max(complete_until, int(last_bins.min()))
+                complete = max(complete_until - first_bin, 0)
+                num_bins += self._write_bins(f, dtype, first_bin, pending[:complete], bin_width_ns)
+                pending = pending[complete:]
+                first_bin += complete
+            if first_bin is not None:
+                num_bins += self._write_bins(f, dtype, first_bin, pending, bin_width_ns)
+        return num_bins
+
+    @staticmethod
+    def _write_bins(f, dtype, first_bin, counts, bin_width_ns):
+        records = np.empty(len(counts), dtype=dtype)
+        # Time of the end of each bin, as in the acquired intensity tracing files
+        records["time"] = (first_bin + 1 + np.arange(len(counts))) * float(bin_width_ns)
+        records["counts"] = counts
+        f.write(records.tobytes())
+        return len(counts)
@@ -0,0 +1,225 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from components.correlator import MULTI_TAU_POINTS_PER_LEVEL, CorrelationResult
+from components.settings import (
+    TTTR_CHUNK_RECORDS,
+    TTTR_MAX_REORDER_NS,
+    TTTR_MAX_TAU_SECONDS,
+    TTTR_RESOLUTION_NS,
+)
+from components.time_tagger_file import TimeTaggerFile
+
+
+class TTTRCorrelator:
+    """
+    Multiple-τ correlator working directly on photon arrival times (Laurence et al., 2006),
+    so lags go down to the time tagger resolution without binning the whole acquisition.
+    At each level the arrival times are halved (with the weights of the photons falling in the
+    same time summed) and the pairs at each lag are counted with binary searches.
+    Photons are fed in chunks: only the photons within the longest lag of the current
+    position are kept. A channel without photons holds the position back by max_reorder_ns at most.
+    """
+
+    def __init__(
+        self,
+        correlations,
+        resolution_ns=TTTR_RESOLUTION_NS,
+        max_tau_seconds=TTTR_MAX_TAU_SECONDS,
+        points_per_level=MULTI_TAU_POINTS_PER_LEVEL,
+        max_workers=1,
+        max_reorder_ns=TTTR_MAX_REORDER_NS,
+    ):
+        self.correlations = [tuple(pair) for pair in correlations]
+        self.channels = sorted({ch for pair in self.correlations for ch in pair})
+        self.resolution_ns = resolution_ns
+        self.max_workers = max_workers
+        self.max_reorder = int(max_reorder_ns / resolution_ns)
+        max_lag = max_tau_seconds * 1e9 / resolution_ns
+        self.num_levels = max(1, int(np.ceil(np.log2(max(max_lag / (points_per_level - 1), 1)))) + 1)
+        # Same lags as the binned multiple-τ, without lag 0 (a photon with itself)
+        self.level_lags = [np.arange(1, points_per_level)] + [
+            np.arange(points_per_level // 2, points_per_level)
+            for _ in range(1, self.num_levels)
+        ]
+        # A pair is complete once the photons up to this distance have been read
+        self.window = points_per_level * 2 ** (self.num_levels - 1)
+        self._counts = np.zeros((len(self.correlations), sum(len(lags) for lags in self.level_lags)))
+        self._buffers = {ch: np.zeros(0, dtype=np.int64) for ch in self.channels}
+        self._photons = {ch: 0 for ch in self.channels}
+        # Last arrival time read for each channel, kept across chunks
+        self._last_seen = {ch: None for ch in self.channels}
+        # Photons before this time have been counted and dropped
+        self._limit = None
+        self._first = None
+        self._last = None
+
+    def lag_units(self):
+        return np.concatenate([lags * 2**level for level, lags in enumerate(self.level_lags)])
+
+    def lag_widths(self):
+        return np.concatenate([np.full(len(lags), 2**level) for level, lags in enumerate(self.level_lags)])
+
+    def update(self, photons):
+        """photons: {channel: sorted arrival times (ns)} of the next chunk."""
+        for ch in self.channels:
+            times = np.floor(np.asarray(photons.get(ch, ())) / self.resolution_ns).astype(np.int64)
+            if len(times) == 0:
+                continue
+            if self._limit is not None and times[0] < self._limit + self.window:
+                raise ValueError(
+                    f"Channel {ch} photons more than {self.max_reorder * self.resolution_ns} ns out of order"
+                )
+            self._buffers[ch] = np.concatenate((self._buffers[ch], times))
+            self._photons[ch] += len(times)
+            self._first = times[0] if self._first is None else min(self._first, times[0])
+            self._last = times[-1] if self._last is None else max(self._last, times[-1])
+            self._last_seen[ch] = times[-1]
+        # Channels are time ordered, only their interleaving is not: a channel missing from
+        # the chunk may still have photons after its last one read, but not before, nor more
+        # than max_reorder before the latest photon (a channel may never fire)
+        seen = [last for last in self._last_seen.values() if last is not None]
+        if not seen:
+            return
+        earliest = min(seen) if len(seen) == len(self.channels) else max(seen) - self.max_reorder
+        limit = max(earliest, max(seen) - self.max_reorder) - self.window
+        if self._limit is None or limit > self._limit:
+            self._process(limit)
+
+    def finish(self):
+        """Count the pairs of the photons still buffered, once the whole file has been read."""
+        if self._last is not None:
+            self._process(self._last + 1)
+
+    def _process(self, limit):
+        blocks = []
+        for ch1, ch2 in self.correlations:
+            a = self._buffers[ch1]
+            b = self._buffers[ch2]
+            a = a[: np.searchsorted(a, limit)]
+            b = b[: np.searchsorted(b, limit + self.window)]
+            blocks.append((a, b))
+        if self.max_workers > 1 and len(blocks) > 1:
+            # NumPy releases the GIL in searchsorted and the reductions
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                counts = list(executor.map(lambda block: self._count_pairs(*block), blocks))
+        else:
+            counts = [self._count_pairs(a, b) for a, b in blocks]
+        self._counts += np.asarray(counts)
+        for ch in self.channels:
+            self._buffers[ch] = self._buffers[ch][np.searchsorted(self._buffers[ch], limit):]
+        self._limit = limit
+
+    def _count_pairs(self, a, b):
+        counts = []
+        if len(a) == 0 or len(b) == 0:
+            return np.zeros(self._counts.shape[1])
+        a, weights_a = merge_arrival_times(a, np.ones(len(a)))
+        b, weights_b = merge_arrival_times(b, np.ones(len(b)))
+        for level, lags in enumerate(self.level_lags):
+            if level > 0:
+                a, weights_a = merge_arrival_times(a >> 1, weights_a)
+                b, weights_b = merge_arrival_times(b >> 1, weights_b)
+            counts.append(count_lags(a, weights_a, b, weights_b, lags[0], lags[-1]))
+        return np.concatenate(counts)
+
+    def result(self):
+        """
+        Returns:
+            CorrelationResult: lag index (μs, sub-μs lags included) and G(τ) per pair
+        """
+        lag_units = self.lag_units()
+        duration = 0 if self._first is None else self._last - self._first
+        keep = lag_units < duration
+        g2_correlations = []
+        for pair_index, (ch1, ch2) in enumerate(self.correlations):
+            # Pairs expected at each lag for uncorrelated photons with the same rates
+            expected = (
+                self._photons[ch1] * self._photons[ch2] / duration**2
+                * (duration - lag_units[keep]) * self.lag_widths()[keep]
+                if duration > 0
+                else np.zeros(np.count_nonzero(keep))
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                g = self._counts[pair_index][keep] / expected - 1
+            g2_correlations.append(((ch1, ch2), [g]))
+        lag_index = (lag_units[keep] * self.resolution_ns / 1000).tolist()
+        return CorrelationResult(lag_index, g2_correlations)
+
+
+def count_lags(a, weights_a, b, weights_b, first_lag, last_lag):
+    """
+    Weighted number of pairs with b - a equal to each lag from first_lag to last_lag.
+    Times are distinct within a and b (merged), so each photon of a has at most
+    last_lag - first_lag + 1 partners: they are gathered one rank at a time.
+    """
+    counts = np.zeros(last_lag - first_lag + 1)
+    lo = np.searchsorted(b, a + first_lag, side="left")
+    hi = np.searchsorted(b, a + last_lag, side="right")
+    active = np.flatnonzero(hi > lo)
+    rank = 0
+    while len(active) > 0:
+        partners = lo[active] + rank
+        counts += np.bincount(
+            b[partners] - a[active] - first_lag,
+            weights=weights_a[active] * weights_b[partners],
+            minlength=len(counts),
+        )
+        rank += 1
+        active = active[hi[active] > lo[active] + rank]
+    return counts
+
+
+def merge_arrival_times(times, weights):
+    """Merge the photons with the same (sorted) arrival time, summing their weights."""
+    starts = np.flatnonzero(np.concatenate(([True], times[1:] != times[:-1])))
+    return times[starts], np.add.reduceat(weights, starts)
+
+
+def time_tagger_correlation(
+    file_path,
+    correlations,
+    resolution_ns=TTTR_RESOLUTION_NS,
+    max_tau_seconds=TTTR_MAX_TAU_SECONDS,
+    max_workers=1,
+    chunk_size=TTTR_CHUNK_RECORDS,
+):
+    """
+    Compute G(τ) of the channel pairs from the photon arrival times of a time tagger (ITT1) file,
+    streaming the file in chunks of records.
+
+    Returns:
+        CorrelationResult: lag index (μs) and [((ch1, ch2), [G]), ...]
+    """
+    time_tagger_file = TimeTaggerFile(file_path)
+    correlator = TTTRCorrelator(correlations, resolution_ns, max_tau_seconds, max_workers=max_workers)
+    for photons in time_tagger_file.photon_chunks(chunk_size, correlator.channels):
+        correlator.update(photons)
+    correlator.finish()
+    return correlator.result()
+
+
+def time_tagger_correlation_spectroscopy(
+    file_paths,
+    correlations,
+    resolution_ns=TTTR_RESOLUTION_NS,
+    max_tau_seconds=TTTR_MAX_TAU_SECONDS,
+    max_workers=1,
+):
+    """
+    Same as fluorescence_correlation_spectroscopy, from one time tagger file per acquisition.
+
+    Returns:
+        CorrelationResult: for each pair, the mean G(τ) followed by the G(τ) of each acquisition.
+        Lags longer than the shortest acquisition are dropped.
+    """
+    results = [
+        time_tagger_correlation(file_path, correlations, resolution_ns, max_tau_seconds, max_workers)
+        for file_path in file_paths
+    ]
+    num_lags = min(len(result.lag_index) for result in results)
+    g2_correlations = []
+    for pair_index, pair in enumerate(results[0].g2_correlations):
+        curves = [result.g2_correlations[pair_index][1][0][:num_lags] for result in results]
+        g2_correlations.append((pair[0], [np.mean(curves, axis=0)] + curves))
+    return CorrelationResult(results[0].lag_index[:num_lags], g2_correlations)
@@ -7,40 +7,70 @@ channel_names = jsondecode(channel_names_json);
 % Open the file
 metadata = struct('enabled_channels', [], 'correlations', [], 'num_acquisitions', [], 'acquisition_time', [], 'bin_width', [], 'notes', []);
 
-fid = fopen(file_path, 'rb');
+fid = fopen(file_path, 'rb', 'ieee-le');
 
 if fid == -1
     error('Unable to open the file');
 end
 
 
-% First 4 bytes must be FCS1
-first_bytes = fread(fid, 4, 'char')';
+% First 4 bytes must be FCS1 (JSON encoded G(tau) data) or FCS2 (binary G(tau) arrays)
+first_bytes = char(fread(fid, 4, 'char')');
 
-if ~isequal(first_bytes, 'FCS1')
+if ~isequal(first_bytes, 'FCS1') && ~isequal(first_bytes, 'FCS2')
     fprintf('Invalid data file');
     fclose(fid);
     return;
 end
 
-% Read metadata json length
-json_metadata_length = fread(fid, 1, 'uint32');
-
-% Read metadata from file
-json_metadata_data = fread(fid, json_metadata_length, 'char')';
-json_metadata_str = char(json_metadata_data);
-metadata = jsondecode(json_metadata_str);
-
-% Read g2_correlations JSON length
-g2_correlations_json_length = fread(fid, 1, 'uint32');
-
-% Extract lag_index and g2_correlations from JSON
-g2_correlations_json_data = fread(fid, g2_correlations_json_length, 'char')';
-g2_correlations_json_str = char(g2_correlations_json_data);
-g2_correlations_json = jsondecode(g2_correlations_json_str);
-
-lag_index = g2_correlations_json.lag_index;
-g2_correlations = g2_correlations_json.g2_correlations;
+if isequal(first_bytes, 'FCS1')
+    % Read metadata json length
+    json_metadata_length = fread(fid, 1, 'uint32');
+
+    % Read metadata from file
+    json_metadata_data = fread(fid, json_metadata_length, 'char')';
+    json_metadata_str = char(json_metadata_data);
+    metadata = jsondecode(json_metadata_str);
+
+    % Read g2_correlations JSON length
+    g2_correlations_json_length = fread(fid, 1, 'uint32');
+
+    % Extract lag_index and g2_correlations from JSON
+    g2_correlations_json_data = fread(fid, g2_correlations_json_length, 'char')';
+    g2_correlations_json_str = char(g2_correlations_json_data);
+    g2_correlations_json = jsondecode(g2_correlations_json_str);
+
+    lag_index = g2_correlations_json.lag_index;
+    g2_correlations = g2_correlations_json.g2_correlations;
+else
+    % Read header (metadata + arrays layout)
+    header_length = fread(fid, 1, 'uint32');
+    header_data = fread(fid, header_length, 'char')';
+    metadata = jsondecode(char(header_data));
+    layout = metadata.layout;
+    pairs = layout.pairs;
+    num_pairs = size(pairs, 1);
+
+    % lag_index: uint64 [num_lags] (double for sub-us lags)
+    lag_index_type = 'uint64';
+    if isfield(layout, 'lag_index_dtype') && strcmp(layout.lag_index_dtype, '<f8')
+        lag_index_type = 'double';
+    end
+    fseek(fid, layout.lag_index_offset, 'bof');
+    lag_index = double(fread(fid, layout.num_lags, lag_index_type));
+
+    % g2: float64 [pairs, mean + acquisitions, num_lags], stored row-major
+    fseek(fid, layout.g2_offset, 'bof');
+    g2 = fread(fid, num_pairs * layout.num_curves * layout.num_lags, 'double');
+    g2 = reshape(g2, layout.num_lags, layout.num_curves, num_pairs);
+
+    % Same structure as the FCS1 data: {pair, [mean; G1; G2...]}
+    g2_correlations = cell(num_pairs, 1);
+    for idx = 1:num_pairs
+        g2_correlations{idx} = {pairs(idx, :)', g2(:, :, idx)'};
+    end
+end
+fclose(fid);
 
 % Function to get channel name
 function name = get_channel_name(channel_id, channel_names, truncate_len)
@@ -1,5 +1,7 @@
+import re
 import struct
 import json
+import numpy as np
 from matplotlib.gridspec import GridSpec
 import matplotlib.pyplot as plt
 
@@ -23,27 +25,90 @@ def get_channel_name(channel_id, truncate_len=5):
         return f"{custom_name} {default_part}"
     return f"Channel {channel_id + 1}"
 
+# Innermost [...] arrays of the FCS1 G(τ) JSON (lag index, channel pairs, curves)
+FCS1_LEAF_ARRAY = re.compile(rb"\[([^\[\]]*)\]")
+
+
+def index_fcs1_g2(buffer):
+    """
+    Index the FCS1 G(τ) JSON without parsing any float: only the small skeleton
+    (nesting and keys) goes through json, with every innermost [...] array
+    replaced by its number.
+    Returns the skeleton and the (start, end) byte ranges of the innermost arrays' values.
+    """
+    spans = []
+    skeleton = []
+    position = 0
+    for match in FCS1_LEAF_ARRAY.finditer(buffer):
+        skeleton.append(buffer[position:match.start()])
+        skeleton.append(str(len(spans)).encode())
+        spans.append(match.span(1))
+        position = match.end()
+    skeleton.append(buffer[position:])
+    return json.loads(b"".join(skeleton)), spans
+
+
+def parse_leaf_array(values):
+    # Decode a comma separated array straight to float64 (missing values are written as null)
+    values = values.replace(b"null", b"nan")
+    if not values.strip():
+        return np.empty(0)
+    array = np.fromstring(values, dtype=np.float64, sep=",")
+    # np.fromstring stops silently at the first value it cannot parse
+    if len(array) != values.count(b",") + 1:
+        raise ValueError("Malformed array in FCS1 file: " + values[:80].decode("utf-8", "replace"))
+    return array
+
+
 # Read bin data
 with open(file_path, "rb") as f:
-    # first 4 bytes must be FCS1
-    # 'FCS1' is an identifier for fcs bin files
-    if f.read(4) != b"FCS1":
+    # first 4 bytes must be FCS1 or FCS2
+    # 'FCS1' is an identifier for fcs bin files with JSON encoded G(τ) data
+    # 'FCS2' is an identifier for fcs bin files with binary G(τ) arrays
+    magic = f.read(4)
+    if magic not in (b"FCS1", b"FCS2"):
         print("Invalid data file")
         exit(0)
 
-    # read metadata from file
-    (json_length,) = struct.unpack("I", f.read(4))
-    null = None
-    metadata = eval(f.read(json_length).decode("utf-8"))
-
-    # Read g2_correlations JSON length
-    (g2_correlations_json_length,) = struct.unpack("I", f.read(4))
-    g2_correlations_json_string = f.read(g2_correlations_json_length).decode("utf-8")
-    g2_correlations_json = eval(g2_correlations_json_string)
-
-    # Extract lag_index and g2_correlations from JSON
-    lag_index = g2_correlations_json["lag_index"]
-    g2_correlations = g2_correlations_json["g2_correlations"]
+    if magic == b"FCS1":
+        # read metadata from file
+        (json_length,) = struct.unpack("I", f.read(4))
+        metadata = json.loads(f.read(json_length).decode("utf-8"))
+
+        # Read g2_correlations JSON length
+        (g2_correlations_json_length,) = struct.unpack("I", f.read(4))
+        g2_correlations_json = f.read(g2_correlations_json_length)
+
+        # Extract lag_index and g2_correlations from JSON, decoding the arrays with NumPy
+        skeleton, spans = index_fcs1_g2(g2_correlations_json)
+        def leaf_array(index, length=None):
+            start, end = spans[index]
+            array = parse_leaf_array(g2_correlations_json[start:end])
+            if length is not None and len(array) != length:
+                raise ValueError(f"FCS1 array has {len(array)} values, expected {length}")
+            return array
+        lag_index = leaf_array(skeleton["lag_index"]).astype(np.int64)
+        g2_correlations = [
+            [leaf_array(pair, 2).astype(int).tolist(), [leaf_array(curve, len(lag_index)) for curve in curves]]
+            for pair, curves in skeleton["g2_correlations"]
+        ]
+    else:
+        # read header (metadata + arrays layout) from file
+        (header_length,) = struct.unpack("<I", f.read(4))
+        metadata = json.loads(f.read(header_length).decode("utf-8"))
+        layout = metadata.pop("layout")
+        pairs = layout["pairs"]
+
+        # lag_index: uint64 [num_lags] (float64 for sub-μs lags), g2: float64 [pairs, mean + acquisitions, num_lags]
+        lag_index = np.memmap(
+            file_path, dtype=layout.get("lag_index_dtype", "<u8"), mode="r", offset=layout["lag_index_offset"],
+            shape=(layout["num_lags"],),
+        )
+        g2 = np.memmap(
+            file_path, dtype="<f8", mode="r", offset=layout["g2_offset"],
+            shape=(len(pairs), layout["num_curves"], layout["num_lags"]),
+        )
+        g2_correlations = [[pair, g2[i]] for i, pair in enumerate(pairs)]
 
     # ENABLED CHANNELS
     if "enabled_channels" in metadata and metadata["enabled_channels"]:
@@ -87,7 +152,7 @@ with open(file_path, "rb") as f:
         print("Bin width: " + str(metadata["bin_width"]) + "\u00B5s")
 
     # TAU
-    print("Tau (lag index):", lag_index)
+    print("Tau (lag index):", lag_index.tolist())
 
     # NOTES
     if "notes" in metadata and metadata["notes"] is not None:
@@ -0,0 +1,140 @@
+import struct
+import json
+import sys
+import zlib
+import numpy as np
+import matplotlib.pyplot as plt
+
+
+file_paths = <FILE-PATHS>
+
+# Channel custom names
+channel_names = <CHANNEL-NAMES>
+
+
+def get_channel_name(channel_id):
+    custom_name = channel_names.get(str(channel_id), None)
+    if custom_name:
+        return f"{custom_name} (Ch{channel_id + 1})"
+    return f"Channel {channel_id + 1}"
+
+
+def read_intensity_tracing_bin(file_path):
+    """
+    Maps an intensity tracing binary file (.bin) without loading it into memory
+    (compressed files are decoded into memory).
+    The first 4 bytes are the magic bytes "IT02", followed by the header length (4 bytes)
+    and a JSON header with the enabled channels and the bin width.
+    Then each record holds the time (f64, ns) and the photon counts (u32) of each enabled channel.
+
+    Parameters:
+        file_path (str): Path to the .bin file.
+
+    Returns:
+        dict: Header information.
+        np.memmap: Records with the "time" and "counts" (one column per enabled channel) fields.
+    """
+    with open(file_path, "rb") as f:
+        magic = f.read(4)
+        if magic not in (b"IT02", b"ITZ1"):
+            print("Invalid data file")
+            exit(0)
+        (header_length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_length).decode("utf-8"))
+        dtype = np.dtype([("time", "<f8"), ("counts", "<u4", (len(header["channels"]),))])
+        if magic == b"ITZ1":
+            return header, read_compressed_records(f, header["codec"], dtype)
+    records = np.memmap(file_path, dtype=dtype, mode="r", offset=8 + header_length)
+    return header, records
+
+
+def read_compressed_records(f, codec, dtype):
+    """
+    Decodes the blocks of a compressed intensity tracing file (magic bytes "ITZ1") into memory.
+    Each block is (number of records, raw size, compressed size) as u32 followed by the
+    compressed (zstd or zlib) payload: the deltas of the f64 bit patterns of the times (i64),
+    then the zigzag encoded deltas (u32) of the counts of each channel, both byte-shuffled.
+    """
+    num_channels = dtype["counts"].shape[0]
+    blocks = []
+    while True:
+        block_header = f.read(12)
+        if len(block_header) < 12:
+            break
+        n, raw_size, compressed_size = struct.unpack("<III", block_header)
+        raw = decompress(f.read(compressed_size), codec, raw_size)
+        records = np.empty(n, dtype=dtype)
+        records["time"] = np.cumsum(unshuffle(raw[: 8 * n], "<i8", n)).view("<f8")
+        zigzag = unshuffle(raw[8 * n :], "<u4", n * num_channels).reshape(n, num_channels)
+        deltas = (zigzag >> 1) ^ np.negative(zigzag & 1)
+        records["counts"] = np.cumsum(deltas, axis=0, dtype=np.uint32)
+        blocks.append(records)
+    return np.concatenate(blocks) if blocks else np.empty(0, dtype=dtype)
+
+
+def decompress(payload, codec, raw_size):
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(payload, max_output_size=raw_size)
+    return zlib.decompress(payload)
+
+
+def unshuffle(data, dtype, count):
+    """Inverse of the byte shuffle: the bytes are grouped by position within the items."""
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, count).T.copy().view(dtype).reshape(-1)
+
+
+def time_range(records, start_s, end_s):
+    """
+    Returns the records between start_s (included) and end_s (excluded), in seconds.
+    Only a few records are read to find the range (binary search on the timestamps).
+    """
+    times = records["time"]
+    bounds = []
+    for limit_ns in (start_s * 1e9, end_s * 1e9):
+        lo, hi = 0, len(times)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if times[mid] < limit_ns:
+                lo = mid + 1
+            else:
+                hi = mid
+        bounds.append(lo)
+    return records[bounds[0]:bounds[1]]
+
+
+def plot_intensity_tracing(file_path, start_s=None, end_s=None):
+    header, records = read_intensity_tracing_bin(file_path)
+    print("Using data file: " + file_path)
+    print("Enabled channels: " + ", ".join(get_channel_name(ch) for ch in header["channels"]))
+    if "bin_width_micros" in header:
+        print("Bin width: " + str(header["bin_width_micros"]) + "µs")
+    if start_s is not None or end_s is not None:
+        records = time_range(
+            records,
+            start_s if start_s is not None else 0,
+            end_s if end_s is not None else np.inf,
+        )
+    # Plot at most ~100k points per channel
+    step = max(1, len(records) // 100_000)
+    records = records[::step]
+    fig, ax = plt.subplots(figsize=(12, 4))
+    for i, channel in enumerate(header["channels"]):
+        ax.plot(records["time"] / 1e9, records["counts"][:, i], label=get_channel_name(channel))
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Photon counts")
+    ax.set_title("Intensity tracing")
+    ax.grid(True)
+    ax.legend()
+    plt.tight_layout()
+    plt.show()
+
+
+if __name__ == "__main__":
+    # Optional time range in seconds: python script.py [start] [end]
+    start_s = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    end_s = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    for file_path in file_paths:
+        plot_intensity_tracing(file_path, start_s, end_s)
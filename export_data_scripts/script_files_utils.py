@@ -15,6 +15,7 @@ project_root = os.path.abspath(os.path.join(current_path, ".."))
 fcs_py_script_path = resource_path("export_data_scripts/fcs_script.py")
 fcs_m_script_path = resource_path("export_data_scripts/fcs_script.m")
 time_tagger_py_script_path = resource_path("export_data_scripts/time_tagger_script.py")
+intensity_tracing_py_script_path = resource_path("export_data_scripts/intensity_tracing_script.py")
 
 
 class ScriptFileUtils:
@@ -22,37 +23,58 @@ class ScriptFileUtils:
     @classmethod
     def export_scripts(cls, bin_file_paths, file_name, directory, script_type, channel_names=None, time_tagger=False, time_tagger_file_path=""):
         try:
-            if channel_names is None:
-                channel_names = {}
-                
-            if time_tagger:
-                python_modifier = cls.get_time_tagger_content_modifiers()
-                cls.write_new_scripts_content(python_modifier, {"time_tagger": time_tagger_file_path}, file_name, directory, "py", "time_tagger_fcs", channel_names)  
-            
-            if script_type == "fcs":
-                python_modifier, matlab_modifier = cls.get_fcs_content_modifiers(time_tagger)
-                cls.write_new_scripts_content(
-                    python_modifier,
-                    bin_file_paths,
-                    file_name,
-                    directory,
-                    "py",
-                    script_type,
-                    channel_names,
-                )
-                cls.write_new_scripts_content(
-                    matlab_modifier,
-                    bin_file_paths,
-                    file_name,
-                    directory,
-                    "m",
-                    script_type,
-                    channel_names,
-                )
+            cls.write_scripts(bin_file_paths, file_name, directory, script_type, channel_names, time_tagger, time_tagger_file_path)
             cls.show_success_message(file_name)
         except Exception as e:
             cls.show_error_message(str(e))
 
+    @classmethod
+    def write_scripts(cls, bin_file_paths, file_name, directory, script_type, channel_names=None, time_tagger=False, time_tagger_file_path=""):
+        """Same as export_scripts without the messages, so it can run outside the GUI thread."""
+        if channel_names is None:
+            channel_names = {}
+            
+        if time_tagger:
+            python_modifier = cls.get_time_tagger_content_modifiers()
+            cls.write_new_scripts_content(python_modifier, {"time_tagger": time_tagger_file_path}, file_name, directory, "py", "time_tagger_fcs", channel_names)  
+        
+        if script_type == "fcs":
+            python_modifier, matlab_modifier = cls.get_fcs_content_modifiers(time_tagger)
+            cls.write_new_scripts_content(
+                python_modifier,
+                bin_file_paths,
+                file_name,
+                directory,
+                "py",
+                script_type,
+                channel_names,
+            )
+            cls.write_new_scripts_content(
+                matlab_modifier,
+                bin_file_paths,
+                file_name,
+                directory,
+                "m",
+                script_type,
+                channel_names,
+            )
+
+    @classmethod
+    def export_intensity_tracing_script(cls, intensity_file_paths, file_name, directory, channel_names=None, write_requirements=True):
+        if channel_names is None:
+            channel_names = {}
+        content = cls.read_file_content(intensity_tracing_py_script_path)
+        file_paths_str = json.dumps([path.replace("\\", "/") for path in intensity_file_paths])
+        new_content = [
+            line.replace("<FILE-PATHS>", file_paths_str).replace("<CHANNEL-NAMES>", json.dumps(channel_names))
+            for line in content
+        ]
+        script_file_path = os.path.join(directory, f"{file_name}_intensity_tracing_script.py")
+        cls.write_file(script_file_path, new_content)
+        if write_requirements:
+            requirements_file_path = os.path.join(directory, "requirements.txt")
+            cls.write_file(requirements_file_path, cls.create_requirements_content(["matplotlib", "numpy", "zstandard"]))
+
     @classmethod
     def write_new_scripts_content(
         cls,
@@ -88,9 +110,9 @@ class ScriptFileUtils:
             "end_pattern": "# Read bin data",
             "replace_pattern": "# Read bin data",
             "requirements": (
-                ["matplotlib", "numpy"]
+                ["matplotlib", "numpy", "zstandard"]
                 if not time_tagger
-                else ["matplotlib", "numpy", "pandas", "tqdm", "pyarrow", "colorama"]
+                else ["matplotlib", "numpy", "pandas", "tqdm", "pyarrow", "colorama", "zstandard"]
             ),
         }
         matlab_modifier = {
@@ -1,7 +1,8 @@
 import struct
-import pandas as pd
+import numpy as np
 import os
 import json
+import zlib
 from tqdm import tqdm
 import pyarrow as pa
 import pyarrow.parquet as pq
@@ -13,103 +14,269 @@ file_path = "<FILE-PATH>"
 init(autoreset=True)  
 warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
 
-def read_time_tagger_bin(file_path, chunk_size=100000):
+# Each record is 1 byte for the event type and 8 bytes for the time (ns), without padding
+RECORD_DTYPE = np.dtype([("event", "u1"), ("time", "<f8")])
+# How far behind the latest event an event of another type can be written in the file (ns)
+MAX_REORDER_LAG_NS = 100_000_000
+
+
+def event_labels():
+    """
+    Returns the event label of every possible event code (0-255):
+    70 = "F" (Frame), 76 = "L" (Line), 80 = "P" (Pixel), any other code is a channel ("ch" + code + 1).
+    """
+    labels = [f"ch{code + 1}" for code in range(256)]
+    labels[70] = "F"
+    labels[76] = "L"
+    labels[80] = "P"
+    return pa.array(labels, type=pa.string())
+
+
+EVENT_LABELS = event_labels()
+BATCH_SCHEMA = pa.schema(
+    [
+        ("Event", pa.dictionary(pa.int16(), pa.string())),
+        ("Time (ns)", pa.float64()),
+    ]
+)
+
+
+def read_header(f):
+    """
+    Reads and parses the header from the binary file.
+
+    Parameters:
+        f (file object): File object for reading the binary file.
+
+    Returns:
+        dict: Parsed header information in JSON format.
     """
-    Reads data from an FCS Time Tagger binary file (.bin) and yields data in chunks as DataFrames.
-    The .bin file consists of records with a length of 9 bytes, where 1 byte represents the event type (Channel, Pixel, Line, Frame), 
-    and 8 bytes represent the time (ns) value. 
-    The first 4 bytes are magic bytes used to uniquely identify an "FCS time tagger" .bin file. 
-    The .bin file also has a variable-length header containing information about the enabled channels and 
+    # "TTZ1" = compressed time tagger file, its header holds the "codec"
+    if f.read(4) not in (b"ITT1", b"TTZ1"):
+        print(Fore.RED + "Invalid data file")
+        exit(0)
+    header_length_bytes = f.read(4)
+    header_length = struct.unpack("<I", header_length_bytes)[0]
+    header_json = f.read(header_length).decode("utf-8")
+    header = json.loads(header_json)
+    return header
+
+
+def header_info(header):
+    enabled_channels = laser_period = None
+    if "channels" in header and header["channels"] is not None:
+        enabled_channels = ", ".join(
+            ["Channel " + str(ch + 1) for ch in header["channels"]]
+        )
+    if "laser_period_ns" in header and header["laser_period_ns"] is not None:
+        laser_period = str(header["laser_period_ns"]) + "ns"
+    return enabled_channels, laser_period
+
+
+def read_record_chunks(file_path, chunk_size=1_000_000):
+    """
+    Reads data from an FCS Time Tagger binary file (.bin) in chunks of records.
+    Each chunk is read with a single np.fromfile call into a packed
+    [("event", u1), ("time", f64)] array, so decoding runs at disk speed.
+    The .bin file consists of records with a length of 9 bytes, where 1 byte represents the event type (Channel, Pixel, Line, Frame),
+    and 8 bytes represent the time (ns) value.
+    The first 4 bytes are magic bytes used to uniquely identify an "FCS time tagger" .bin file.
+    The .bin file also has a variable-length header containing information about the enabled channels and
     the laser period of the acquisition.
 
     Parameters:
         file_path (str): Path to the .bin file.
-        chunk_size (int): Number of records per chunk (default is 100000).
+        chunk_size (int): Number of records per chunk (default is 1000000).
 
     Yields:
-        pd.DataFrame: A DataFrame containing the data (Event, Time) for each chunk.
+        np.ndarray: Records (RECORD_DTYPE) of the chunk, in file order.
         str: Enabled channels information.
         str: Laser period information.
     """
     if not os.path.exists(file_path):
         print(Fore.RED + f"File not found: {file_path}")
         return
-    record_size = 9  # 1 byte per channel, 8 bytes per time (f64), 
-
-    def read_header(f):
-        """
-        Reads and parses the header from the binary file.
-
-        Parameters:
-            f (file object): File object for reading the binary file.
-
-        Returns:
-            dict: Parsed header information in JSON format.
-        """
-        if f.read(4) != b"ITT1":
-            print(Fore.RED + "Invalid data file")
-            exit(0)
-        header_length_bytes = f.read(4)
-        header_length = struct.unpack("<I", header_length_bytes)[0]
-        header_json = f.read(header_length).decode("utf-8")
-        header = json.loads(header_json)
-        return header
-
-    def record_generator(file_path, record_size):
-        """
-        Generator that yields records from the binary file.
-
-        Parameters:
-            file_path (str): Path to the .bin file.
-            record_size (int): Size of each record in bytes.
-
-        Yields:
-            tuple: A tuple containing the unpacked record data, enabled channels, and laser period.
-        """
-        with open(file_path, "rb") as f:
-            header = read_header(f)
-            if "channels" in header and header["channels"] is not None:
-                enabled_channels = ", ".join(
-                    ["Channel " + str(ch + 1) for ch in header["channels"]]
-                )
-            if "laser_period_ns" in header and header["laser_period_ns"] is not None:
-                laser_period = str(header["laser_period_ns"]) + "ns"
-            while True:
-                record = f.read(record_size)
-                if len(record) < record_size:
-                    break
-                yield struct.unpack("<Bd", record), enabled_channels, laser_period
-
-    records = []
-    for i, (record, enabled_channels, laser_period) in enumerate(
-        record_generator(file_path, record_size)
-    ):
-        event, time = record
-        event_string = ""
-        if event == 70:
-            event_string = "F" # Frame
-        elif event == 76:
-            event_string = "L"  # Line
-        elif event == 80:
-            event_string = "P"  # Pixel
-        else:
-            event_string = f"ch{event + 1}" # Channel          
-        records.append((event_string, time))
+    with open(file_path, "rb") as f:
+        header = read_header(f)
+        enabled_channels, laser_period = header_info(header)
+        if "codec" in header:
+            for records in read_compressed_record_chunks(f, header["codec"]):
+                yield records, enabled_channels, laser_period
+            return
+        while True:
+            records = np.fromfile(f, dtype=RECORD_DTYPE, count=chunk_size)
+            if len(records) == 0:
+                break
+            yield records, enabled_channels, laser_period
+
+
+def read_compressed_record_chunks(f, codec):
+    """
+    Decodes the blocks of a compressed time tagger file (magic bytes "TTZ1"), one chunk per block.
+    Each block is (number of records, raw size, compressed size) as u32 followed by the
+    compressed (zstd or zlib) payload: the event codes (u8), then the times as deltas of their
+    f64 bit patterns (i64, byte-shuffled) from the previous event with the same code in the block.
+
+    Yields:
+        np.ndarray: Records (RECORD_DTYPE) of the block, in file order.
+    """
+    while True:
+        block_header = f.read(12)
+        if len(block_header) < 12:
+            break
+        n, raw_size, compressed_size = struct.unpack("<III", block_header)
+        raw = decompress(f.read(compressed_size), codec, raw_size)
+        events = np.frombuffer(raw[:n], dtype=np.uint8)
+        deltas = unshuffle(raw[n:], "<i8", n)
+        # Cumulative sum within the run of each event code
+        order = np.argsort(events, kind="stable")
+        sorted_events = events[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_events[1:] != sorted_events[:-1])))
+        sums = np.cumsum(deltas[order])
+        offsets = np.concatenate(([0], sums[starts[1:] - 1]))
+        sums -= np.repeat(offsets, np.diff(np.append(starts, n)))
+        time_bits = np.empty(n, dtype=np.int64)
+        time_bits[order] = sums
+        records = np.empty(n, dtype=RECORD_DTYPE)
+        records["event"] = events
+        records["time"] = time_bits.view("<f8")
+        yield records
+
+
+def decompress(payload, codec, raw_size):
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(payload, max_output_size=raw_size)
+    return zlib.decompress(payload)
+
+
+def unshuffle(data, dtype, count):
+    """Inverse of the byte shuffle: the bytes are grouped by position within the items."""
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, count).T.copy().view(dtype).reshape(-1)
+
+
+def sorted_record_chunks(file_path, chunk_size=1_000_000, max_reorder_lag_ns=MAX_REORDER_LAG_NS):
+    """
+    Same as read_record_chunks, but the records come out sorted by time across chunks.
+    The events of each type are already time ordered in the file, only the streams of the
+    different types are interleaved: this is a k-way merge of those streams. The last time of each
+    event type is kept across chunks (a type missing from a chunk, e.g. markers or a dim channel,
+    can still come later but not earlier than its last time). After each chunk, the records up to
+    the watermark (the earliest of those last times) are final and yielded, the others are kept
+    and merged with the next chunk. A type which stops (a single Frame marker, a channel without
+    photons) holds the watermark back by max_reorder_lag_ns at most, so memory stays at a few
+    chunks regardless of the file length.
+
+    Yields:
+        np.ndarray: Records (RECORD_DTYPE) sorted by time.
+        str: Enabled channels information.
+        str: Laser period information.
+    """
+    pending = np.empty(0, dtype=RECORD_DTYPE)
+    enabled_channels = laser_period = None
+    # Last time of each event type read so far
+    last_times = {}
+    yielded_until = -np.inf
+    for records, enabled_channels, laser_period in read_record_chunks(file_path, chunk_size):
+        # Last occurrence of each event type in the chunk
+        event_types, last_indices = np.unique(records["event"][::-1], return_index=True)
+        last_times.update(
+            zip(event_types.tolist(), records["time"][len(records) - 1 - last_indices].tolist())
+        )
+        if len(records) > 0 and records["time"].min() < yielded_until:
+            raise ValueError(
+                f"Events more than {max_reorder_lag_ns} ns out of order, increase max_reorder_lag_ns"
+            )
+        watermark = max(min(last_times.values()), max(last_times.values()) - max_reorder_lag_ns)
+        merged = np.concatenate([pending, records])
+        # Stable merge sort: linear on the already sorted runs
+        merged = merged[np.argsort(merged["time"], kind="stable")]
+        ready = np.searchsorted(merged["time"], watermark, side="right")
+        pending = merged[ready:]
+        if ready > 0:
+            yielded_until = merged["time"][ready - 1]
+            yield merged[:ready], enabled_channels, laser_period
+    if len(pending) > 0:
+        yield pending, enabled_channels, laser_period
+
+
+def records_to_batch(records):
+    """
+    Converts the records to a pyarrow RecordBatch with a categorical "Event" column
+    (ch1, ch2..., P, L, F) and a "Time (ns)" column.
+    """
+    events = pa.DictionaryArray.from_arrays(
+        pa.array(records["event"].astype(np.int16)), EVENT_LABELS
+    )
+    times = pa.array(np.ascontiguousarray(records["time"]))
+    return pa.RecordBatch.from_arrays([events, times], schema=BATCH_SCHEMA)
+
+
+def read_time_tagger_batches(file_path, chunk_size=1_000_000):
+    """
+    Reads the binary file in chunks (in file order) and yields them as pyarrow RecordBatches.
+
+    Parameters:
+        file_path (str): Path to the .bin file.
+        chunk_size (int): Number of records per chunk (default is 1000000).
+
+    Yields:
+        pa.RecordBatch: "Event" (categorical: ch1, ch2..., P, L, F) and "Time (ns)" columns for each chunk.
+        str: Enabled channels information.
+        str: Laser period information.
+    """
+    for records, enabled_channels, laser_period in read_record_chunks(file_path, chunk_size):
+        yield records_to_batch(records), enabled_channels, laser_period
+
 
-        if (i + 1) % chunk_size == 0:
-            yield pd.DataFrame(
-                records, columns=["Event", "Time (ns)"]
-            ), enabled_channels, laser_period
-            records = []
-    if records:
-        yield pd.DataFrame(
-            records, columns=["Event", "Time (ns)"]
-        ), enabled_channels, laser_period
+def read_time_tagger_bin(file_path, chunk_size=1_000_000):
+    """
+    Same as read_time_tagger_batches, yielding each chunk as a DataFrame
+    (the "Event" column is categorical).
+
+    Yields:
+        pd.DataFrame: A DataFrame containing the data (Event, Time) for each chunk.
+        str: Enabled channels information.
+        str: Laser period information.
+    """
+    for batch, enabled_channels, laser_period in read_time_tagger_batches(file_path, chunk_size):
+        yield batch.to_pandas(), enabled_channels, laser_period
+
+
+def read_time_tagger_table(file_path):
+    """
+    Reads the whole binary file as a pyarrow Table sorted by time.
+
+    Returns:
+        pa.Table: "Event" and "Time (ns)" columns.
+        str: Enabled channels information.
+        str: Laser period information.
+    """
+    batches = []
+    enabled_channels = laser_period = None
+
+    # Set up an indeterminate progress bar (total=None)
+    with tqdm(
+        desc="Processing chunks...",
+        unit="chunk",
+        total=None,  # Indeterminate progress bar
+    ) as pbar:
+        for records, channels, period in sorted_record_chunks(file_path):
+            batches.append(records_to_batch(records))
+            enabled_channels = channels
+            laser_period = period
+            pbar.update(1)  # Increment the progress bar for each chunk processed
+    table = pa.Table.from_batches(batches, schema=BATCH_SCHEMA)
+    return table, enabled_channels, laser_period
 
 
 def save_to_parquet(file_path, output_file):
     """
     Saves the data from the binary file to a Parquet file with optional metadata.
+    The records are sorted and written one row group at a time, so the file is never
+    loaded as a whole.
 
     Parameters:
         file_path (str): Path to the .bin file.
@@ -126,34 +293,22 @@ def save_to_parquet(file_path, output_file):
 
     print(Fore.CYAN + f"Saving data to {output_file}...")
 
-    # Initialize variables for collecting data
-    records_list = []
-    enabled_channels = laser_period = None
+    with open(file_path, "rb") as f:
+        enabled_channels, laser_period = header_info(read_header(f))
 
-    # Set up an indeterminate progress bar (total=None)
-    with tqdm(
+    # Add metadata (enabled_channels and laser_period) to the Parquet schema
+    metadata = {"enabled_channels": enabled_channels, "laser_period": laser_period}
+    schema = BATCH_SCHEMA.with_metadata(
+        {k: v.encode() for k, v in metadata.items() if v is not None}
+    )
+    with pq.ParquetWriter(output_file, schema, compression="snappy") as writer, tqdm(
         desc="Processing chunks...",
         unit="chunk",
         total=None,  # Indeterminate progress bar
     ) as pbar:
-        # Process chunks and update the progress bar
-        for chunk, channels, period in read_time_tagger_bin(file_path):
-            records_list.append(chunk)
-            enabled_channels = channels
-            laser_period = period
+        for records, _, _ in sorted_record_chunks(file_path):
+            writer.write_table(pa.Table.from_batches([records_to_batch(records)], schema=schema))
             pbar.update(1)  # Increment the progress bar for each chunk processed
-
-    # Concatenate all data and sort
-    existing_data = pd.concat(records_list, ignore_index=True)
-    existing_data.sort_values(by="Time (ns)", inplace=True)
-
-    # Save the DataFrame as Parquet and add metadata (enabled_channels and laser_period)
-    table = pa.Table.from_pandas(existing_data)
-    metadata = {"enabled_channels": enabled_channels, "laser_period": laser_period}
-    table = table.replace_schema_metadata(
-        {**table.schema.metadata, **{k: v.encode() for k, v in metadata.items()}}
-    )
-    pq.write_table(table, output_file, compression="snappy")
     print(Fore.GREEN + f"Data and metadata saved to {output_file}.")
 
 
@@ -259,25 +414,8 @@ def read_bin_and_display(file_path):
     Parameters:
         file_path (str): Path to the .bin file.
     """
-    records_list = []
-    enabled_channels = laser_period = None
-
-    # Set up an indeterminate progress bar (total=None)
-    with tqdm(
-        desc="Processing chunks...",
-        unit="chunk",
-        total=None,  # Indeterminate progress bar
-    ) as pbar:
-        # Process chunks
-        for chunk, channels, period in read_time_tagger_bin(file_path):
-            records_list.append(chunk)
-            enabled_channels = channels
-            laser_period = period
-            pbar.update(1)  # Increment the progress bar for each chunk processed
-
-    # Concatenate all data and sort
-    existing_data = pd.concat(records_list, ignore_index=True)
-    existing_data.sort_values(by="Time (ns)", inplace=True)
+    table, enabled_channels, laser_period = read_time_tagger_table(file_path)
+    existing_data = table.to_pandas()
 
     print("\n")
     print(Fore.GREEN + f"Enabled channels: {enabled_channels}")
@@ -13,9 +13,12 @@ from components.channels_control import ChannelsControl
 from components.read_data import ReadDataControls
 from components.top_bar_builder import TopBarBuilder
 from components.controls_bar_builder import ControlsBarBuilder
+from components.export_jobs import ExportQueue
+from components.diagnostics import Diagnostics
 from components.buttons import CollapseButton, ActionButtons, GTModeButtons
 from components.input_params_controls import InputParamsControls
 from components.intensity_tracing_controller import IntensityTracing
+from components.fcs_controller import FCSRealtime
 from components.settings import *
 current_path = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_path))
@@ -46,9 +49,12 @@ class FCSWindow(QWidget):
         self.acquisition_time_millis = int(default_acquisition_time_millis) if default_acquisition_time_millis is not None else DEFAULT_ACQUISITION_TIME_MILLIS
         self.free_running_acquisition_time = self.settings.value(SETTINGS_FREE_RUNNING_MODE, DEFAULT_FREE_RUNNING_MODE) in ['true', True]    
         self.show_cps = True
+        self.live_plots_fps = max(1, int(self.settings.value(SETTINGS_LIVE_PLOTS_FPS, DEFAULT_LIVE_PLOTS_FPS)))
         self.cps_threshold = int(self.settings.value(SETTINGS_CPS_THRESHOLD, DEFAULT_CPS_THRESHOLD))
+        self.diagnostics_enabled = self.settings.value(SETTINGS_DIAGNOSTICS, DEFAULT_DIAGNOSTICS) in ['true', True]
         self.write_data = self.settings.value(SETTINGS_WRITE_DATA, DEFAULT_WRITE_DATA) in ['true', True]
         self.export_intensity_tracing=self.settings.value(SETTINGS_EXPORT_INTENSITY_TRACING, DEFAULT_EXPORT_INTENSITY_TRACING) in ['true', True]
+        self.export_compressed = self.settings.value(SETTINGS_EXPORT_COMPRESSED, DEFAULT_EXPORT_COMPRESSED) in ['true', True]
         self.export_fcs=self.settings.value(SETTINGS_EXPORT_FCS, DEFAULT_EXPORT_FCS) in ['true', True]
         # Time tagger
         time_tagger = self.settings.value(SETTINGS_TIME_TAGGER, DEFAULT_TIME_TAGGER)
@@ -70,6 +76,9 @@ class FCSWindow(QWidget):
         
         self.fcs_algorithms = FCS_ALGORITHMS
         self.fcs_algorithm = self.settings.value(SETTINGS_FCS_ALGORITHM, DEFAULT_FCS_ALGORITHM)
+        self.fcs_engine = self.settings.value(SETTINGS_FCS_ENGINE, DEFAULT_FCS_ENGINE)
+        self.fcs_workers = int(self.settings.value(SETTINGS_FCS_WORKERS, DEFAULT_FCS_WORKERS))
+        self.export_strategy = self.settings.value(SETTINGS_EXPORT_STRATEGY, DEFAULT_EXPORT_STRATEGY)
         
         self.averages_inputs = AVERAGES_INPUTS
         self.selected_average = int(self.settings.value(SETTINGS_AVERAGES, DEFAULT_AVERAGES))
@@ -112,7 +121,7 @@ class FCSWindow(QWidget):
         self.acquisition_stopped = False
         
         self.cps_ch = {}
-        self.cps_counts = {}
+        self.cps_engine = None
         self.cps_widgets_animation = {}
         self.acquisition_time_countdown_widget = QWidget()
 
@@ -120,6 +129,8 @@ class FCSWindow(QWidget):
         self.intensity_charts_wrappers = []
         self.gt_charts = []
         self.intensity_lines = {}
+        self.intensity_buffers = {}
+        self.last_plots_refresh = 0
         self.gt_lines = []
         self.only_cps_widgets = []
         self.only_cps_shown = False
@@ -127,9 +138,21 @@ class FCSWindow(QWidget):
         ######
         self.gt_connectors = {}
       
+        self.acquisition_store = None
+        self.acquisition_consumer = None
         self.pull_from_queue_timer = QTimer()
         self.pull_from_queue_timer.timeout.connect(partial(IntensityTracing.pull_from_queue, self))
         
+        self.realtime_correlator = None
+        # Key of the files written by the current acquisitions in the files manifest
+        self.acquisition_id = None
+        self.acquisition_start_time = None
+        self.intensity_data_file = ""
+        ExportQueue.init(self)
+        self.realtime_gt_plots = []
+        self.realtime_gt_timer = QTimer()
+        self.realtime_gt_timer.timeout.connect(partial(FCSRealtime.refresh_plots, self))
+        
         self.fcs_serialization_calls = 0
         
         #####
@@ -141,6 +164,11 @@ class FCSWindow(QWidget):
         ReadDataControls.handle_widgets_visibility(
                 self, self.acquire_read_mode == "read")    
         
+        Diagnostics.init(self)
+
+        # Exports left pending when the application was last closed
+        ExportQueue.restore(self)
+
         # Check card connection
         CheckCard.check_card_connection(self)    
 
@@ -282,6 +310,10 @@ class FCSWindow(QWidget):
             self.widgets[READER_POPUP].close()        
         if READER_METADATA_POPUP in self.widgets:
             self.widgets[READER_METADATA_POPUP].close()                  
+        if REPROCESS_POPUP in self.widgets:
+            self.widgets[REPROCESS_POPUP].close()
+        ExportQueue.shutdown(self)
+        Diagnostics.dump()
         event.accept()         
 
 
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Tests never talk to a card
+os.environ["FLIM_LABS_BACKEND"] = "simulated"
+
+
+@pytest.fixture
+def data_folder(tmp_path, monkeypatch):
+    """Empty flim-labs data folder, with the files manifest reloaded from it."""
+    from components.file_utilities import FileUtils
+
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    monkeypatch.setattr(FileUtils, "_manifest_index", None)
+    monkeypatch.setattr(FileUtils, "_last_acquisitions", {})
+    folder = tmp_path / ".flim-labs" / "data"
+    (folder / "fcs-intensity").mkdir(parents=True)
+    return folder
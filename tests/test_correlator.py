@@ -0,0 +1,46 @@
+import numpy as np
+
+from components.correlator import (
+    MULTI_TAU_POINTS_PER_LEVEL,
+    RebinnedCounts,
+    _normalize,
+    correlate_pair,
+    lag_index_bins,
+    rebin,
+)
+
+
+def direct_correlation(a, b, lags):
+    """Reference G(τ): one dot product per lag, with the correlators' normalization."""
+    n = len(a)
+    products = np.full(len(lags), np.nan)
+    for i, lag in enumerate(lags):
+        if lag < n:
+            products[i] = np.dot(a[: n - lag], b[lag:])
+    return _normalize(products, a, b, lags)
+
+
+def test_correlators_match_the_direct_correlation():
+    rng = np.random.default_rng(1)
+    counts = rng.poisson(2, size=(5_001, 2)).astype(np.float64)
+    # below points_per_level multi-tau has not coarse-grained yet, so it is exact
+    lags = np.arange(1, MULTI_TAU_POINTS_PER_LEVEL)
+    expected = direct_correlation(counts[:, 0], counts[:, 1], lags)
+    for use_fft_correlation in (False, True):
+        np.testing.assert_allclose(
+            correlate_pair(counts[:, 0], counts[:, 1], lags, use_fft_correlation), expected, atol=1e-12
+        )
+
+
+def test_rebinned_counts_are_correlated_chunk_by_chunk(tmp_path):
+    rng = np.random.default_rng(0)
+    counts = rng.poisson(3, size=(100_003, 2)).astype(np.uint32)
+    path = tmp_path / "counts.u32"
+    counts.tofile(path)
+    column = np.memmap(path, dtype=np.uint32, mode="r", shape=counts.shape)[:, 1]
+    _, lags = lag_index_bins(30, False, len(counts) // 3)
+    for use_fft_correlation in (False, True):
+        expected = correlate_pair(rebin(counts[:, 1], 3), rebin(counts[:, 1], 3), lags, use_fft_correlation)
+        lazy = RebinnedCounts(column, 3)
+        np.testing.assert_allclose(correlate_pair(lazy, lazy, lags, use_fft_correlation), expected)
+    assert len(RebinnedCounts(column, 3)) == 33_334
@@ -0,0 +1,92 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from components.correlator import fluorescence_correlation_spectroscopy
+from components.intensity_tracing_file import IntensityTracingFile
+
+CHANNELS = [0, 1]
+BIN_WIDTH_MICROS = 10
+CORRELATIONS = [(0, 0), (0, 1), (1, 1)]
+
+
+def write_intensity_file(path, counts):
+    header = json.dumps({"channels": CHANNELS, "bin_width_micros": BIN_WIDTH_MICROS}).encode("utf-8")
+    records = np.empty(len(counts), dtype=IntensityTracingFile.record_dtype(len(CHANNELS)))
+    records["time"] = (np.arange(len(counts)) + 1) * BIN_WIDTH_MICROS * 1000.0
+    records["counts"] = counts
+    with open(path, "wb") as f:
+        f.write(b"IT02")
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(records.tobytes())
+
+
+def simulated_acquisitions(num_acquisitions, num_bins=200_000):
+    rng = np.random.default_rng(0)
+    acquisitions = []
+    for _ in range(num_acquisitions):
+        # Correlated channels: a shared slowly varying rate
+        rate = 2 + np.repeat(rng.gamma(2, 1, num_bins // 50), 50)
+        acquisitions.append(np.stack([rng.poisson(rate), rng.poisson(rate)], axis=1).astype(np.uint32))
+    return acquisitions
+
+
+@pytest.mark.parametrize("use_fft_correlation", [False, True])
+def test_numpy_engine_matches_flim_labs(data_folder, use_fft_correlation):
+    flim_labs = pytest.importorskip("flim_labs")
+    acquisitions = simulated_acquisitions(3)
+    paths = []
+    for index, counts in enumerate(acquisitions):
+        path = data_folder / "fcs-intensity" / f"intensity-tracing_{1700000000 + index}.bin"
+        write_intensity_file(path, counts)
+        paths.append(str(path))
+    acquisition_time = len(acquisitions[0]) * BIN_WIDTH_MICROS / 1000
+
+    flim_labs.reset_fcs_stop()
+    for _ in acquisitions:
+        flim_labs.fluorescence_correlation_spectroscopy(
+            num_acquisitions=len(acquisitions),
+            correlations=CORRELATIONS,
+            enabled_channels=CHANNELS,
+            bin_width=BIN_WIDTH_MICROS,
+            acquisition_time=acquisition_time,
+            export_fcs=False,
+            export_intensity_tracing=False,
+            notes="",
+            tau_high_density=False,
+            use_fft_correlation=use_fft_correlation,
+        )
+    expected = flim_labs.average_fluorescence_correlation_spectroscopy(num_acquisitions=len(acquisitions))
+    result = fluorescence_correlation_spectroscopy(
+        [IntensityTracingFile.read(path)[2] for path in paths],
+        CORRELATIONS,
+        BIN_WIDTH_MICROS,
+        use_fft_correlation=use_fft_correlation,
+    )
+
+    num_lags = min(len(expected.lag_index), len(result.lag_index))
+    np.testing.assert_array_equal(np.asarray(result.lag_index[:num_lags]), np.asarray(expected.lag_index[:num_lags]))
+    expected_curves = {tuple(pair): curves for pair, curves in expected.g2_correlations}
+    for pair, curves in result.g2_correlations:
+        for curve, expected_curve in zip(curves, expected_curves[tuple(pair)]):
+            np.testing.assert_allclose(
+                np.asarray(curve[:num_lags]), np.asarray(expected_curve[:num_lags]), rtol=1e-3, atol=1e-4
+            )
+
+
+def test_averaged_result_gets_the_running_average_standard_errors():
+    from components.correlator import CorrelationResult, RunningG2Average
+
+    rng = np.random.default_rng(1)
+    curves = [rng.normal(size=20) for _ in range(4)]
+    averaged = CorrelationResult(list(range(20)), [((0, 1), [np.mean(curves, axis=0)] + curves)])
+
+    result = RunningG2Average.of_result(averaged)
+
+    (pair, result_curves), = result.g2_correlations
+    assert pair == (0, 1)
+    np.testing.assert_allclose(result_curves[0], np.mean(curves, axis=0))
+    np.testing.assert_allclose(result.standard_errors[pair], np.std(curves, axis=0, ddof=1) / 2)
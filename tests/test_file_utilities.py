@@ -0,0 +1,65 @@
+import os
+import time
+from types import SimpleNamespace
+
+from components.file_utilities import FileUtils
+
+
+def write_file(path, mtime):
+    path.write_bytes(b"data")
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_fcs_result_without_file_paths_registers_files_written_since_start(data_folder):
+    from components.fcs_controller import FCSPostProcessing
+
+    start = time.time()
+    write_file(data_folder / "fcs_100.bin", start - 60)
+    write_file(data_folder / "fcs_100.txt", start - 60)
+    fcs_file = write_file(data_folder / "fcs_200.bin", start + 1)
+    txt_fcs_file = write_file(data_folder / "fcs_200.txt", start + 1)
+    app = SimpleNamespace(acquisition_id=FileUtils.new_acquisition_id(), acquisition_start_time=start)
+    # Same fields as the flim_labs result, no file_paths
+    gt_results = SimpleNamespace(lag_index=[1, 2], g2_correlations=[])
+
+    FCSPostProcessing.register_fcs_files(app, gt_results)
+
+    assert FileUtils.get_recent_fcs_file(acquisition_id=app.acquisition_id) == fcs_file
+    assert FileUtils.get_recent_fcs_file(extension=".txt", acquisition_id=app.acquisition_id) == txt_fcs_file
+
+
+def test_returned_paths_are_registered_instead_of_the_folder_scan(data_folder):
+    start = time.time()
+    returned = write_file(data_folder / "time_tagger_intensity_200.bin", start + 1)
+    write_file(data_folder / "time_tagger_intensity_300.bin", start + 2)
+    acquisition_id = FileUtils.new_acquisition_id()
+
+    FileUtils.register_written_files(acquisition_id, ("time_tagger",), [returned], start)
+
+    assert FileUtils.get_recent_time_tagger_file(acquisition_id=acquisition_id) == returned
+
+
+def test_intensity_files_of_an_acquisition_are_registered_once(data_folder):
+    start = time.time()
+    intensity_folder = data_folder / "fcs-intensity"
+    write_file(intensity_folder / "intensity-tracing_100.bin", start - 60)
+    first = write_file(intensity_folder / "intensity-tracing_200.bin", start + 1)
+    acquisition_id = FileUtils.new_acquisition_id()
+    FileUtils.register_written_files(acquisition_id, ("intensity_tracing",), [""], start)
+    second = write_file(intensity_folder / "intensity-tracing_300.bin", start + 2)
+    FileUtils.register_written_files(acquisition_id, ("intensity_tracing",), [""], start)
+
+    assert FileUtils.get_recent_n_intensity_tracing_files(5, acquisition_id) == [second, first]
+
+
+def test_auto_export_never_shares_the_data_folder_file(tmp_path):
+    source = tmp_path / "fcs_100.bin"
+    source.write_bytes(b"original")
+    destination = tmp_path / "exported.bin"
+
+    method = FileUtils.export_file(str(source), str(destination), "auto")
+
+    assert method in ("reflink", "copy")
+    destination.write_bytes(b"edited")
+    assert source.read_bytes() == b"original"
@@ -0,0 +1,49 @@
+import json
+import struct
+
+import numpy as np
+
+from components.intensity_tracing_file import IntensityTracingFile
+from components.time_tagger_file import TimeTaggerFile
+
+
+def write_time_tagger_file(path, channels, events, times):
+    header = json.dumps({"channels": channels}).encode("utf-8")
+    records = np.empty(len(times), dtype=TimeTaggerFile.RECORD_DTYPE)
+    records["event"] = events
+    records["time"] = times
+    with open(path, "wb") as f:
+        f.write(b"ITT1")
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(records.tobytes())
+
+
+def test_silent_channel_is_converted_chunk_by_chunk(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    times = {ch: np.sort(rng.uniform(0, 1e9, 50_000)) for ch in (0, 1)}
+    events = np.concatenate([np.full(50_000, ch, dtype=np.uint8) for ch in times])
+    all_times = np.concatenate(list(times.values()))
+    # Streams interleaved by blocks of 1 ms, as the card writes them
+    order = np.argsort(np.floor(all_times / 1e6), kind="stable")
+    path = tmp_path / "time_tagger_intensity.bin"
+    write_time_tagger_file(path, [0, 1, 2], events[order], all_times[order])
+    writes = []
+    write_bins = TimeTaggerFile._write_bins
+    monkeypatch.setattr(
+        TimeTaggerFile, "_write_bins", staticmethod(lambda *args: writes.append(len(args[3])) or write_bins(*args))
+    )
+
+    output_path = tmp_path / "intensity-tracing.bin"
+    num_bins = TimeTaggerFile(str(path)).write_intensity_tracing(
+        str(output_path), 100, chunk_size=10_000, max_reorder_ns=10_000_000
+    )
+
+    _, _, counts = IntensityTracingFile.read(str(output_path))
+    first_bin = int(min(t[0] for t in times.values()) // 100_000)
+    for ch, channel_times in times.items():
+        expected = np.bincount((channel_times // 100_000).astype(np.int64) - first_bin, minlength=num_bins)
+        np.testing.assert_array_equal(np.asarray(counts[ch]), expected)
+    assert np.asarray(counts[2]).sum() == 0
+    # Written as the file is read, not all at the end
+    assert len(writes) > 2 and max(writes) < num_bins / 2
@@ -0,0 +1,33 @@
+import numpy as np
+
+from components.tttr_correlator import TTTRCorrelator
+
+
+def photon_times(rng, rate_per_ns, duration_ns):
+    return np.sort(rng.uniform(0, duration_ns, rng.poisson(rate_per_ns * duration_ns)))
+
+
+def test_silent_channel_does_not_hold_back_the_correlation():
+    rng = np.random.default_rng(0)
+    duration_ns = 200_000_000
+    photons = {0: photon_times(rng, 1e-4, duration_ns), 1: photon_times(rng, 1e-4, duration_ns), 2: np.zeros(0)}
+    correlations = [(0, 1), (0, 2), (1, 1)]
+    options = dict(max_tau_seconds=1e-4, max_reorder_ns=1_000_000)
+
+    whole = TTTRCorrelator(correlations, **options)
+    whole.update(photons)
+    whole.finish()
+
+    chunked = TTTRCorrelator(correlations, **options)
+    max_buffered = 0
+    for start in range(0, duration_ns, 1_000_000):
+        chunk = {
+            ch: times[(times >= start) & (times < start + 1_000_000)] for ch, times in photons.items()
+        }
+        chunked.update(chunk)
+        max_buffered = max(max_buffered, max(len(buffer) for buffer in chunked._buffers.values()))
+    chunked.finish()
+
+    np.testing.assert_array_equal(chunked._counts, whole._counts)
+    # Photons within the reorder lag and the longest lag only, not the whole acquisition
+    assert max_buffered < len(photons[0]) / 10